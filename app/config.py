@@ -1,5 +1,6 @@
 import random
 import string
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, PostgresDsn
@@ -34,10 +35,17 @@ class DatabaseConfig(BaseModel):
     # hash_key: str = ''.join(random.SystemRandom().choice(string.ascii_letters + string.digits) for _ in range(64))
     # algorithm: str = "HS256"
     # access_token_expire: int = 30
-    echo: bool = False
-    echo_pool: bool = False
-    pool_size: int = 50
-    max_overflow: int = 10
+    echo: bool = False  # Логировать каждый запрос с длительностью
+    echo_pool: bool = False  # Логировать ожидание соединения в acquire()
+    # На воркер: (pool_size + max_overflow) * число воркеров должно укладываться в max_connections Postgres
+    pool_size: int = 10  # min_size пула (соединения открываются при старте)
+    max_overflow: int = 10  # max_size = pool_size + max_overflow
+    max_queries: int = 50000  # После стольких запросов соединение пересоздается
+    max_inactive_connection_lifetime: float = 300.0  # секунды простоя до закрытия соединения
+    statement_cache_size: int = 100  # 0 - без кэша prepared statements (нужно за pgbouncer в transaction mode)
+    command_timeout: float | None = None  # секунды, таймаут запроса по умолчанию
+    # DSN реплики для чтения (журналы, списки). Пул того же размера; без него все идет в основной
+    replica_dsn: str | None = None
 
 
 class HasherConfig(BaseModel):
@@ -45,6 +53,9 @@ class HasherConfig(BaseModel):
     algorithm: str = "HS256"
     access_token_expire: int = 30  # минуты
     refresh_token_expire: int = 60 * 24 * 30  # минуты (30 дней)
+    # Где считается bcrypt: process - пул процессов (все ядра), thread - пул потоков, inline - в event loop
+    executor: Literal["process", "thread", "inline"] = "process"
+    workers: int | None = None  # По умолчанию - число ядер
 
 
 class RootConfig(BaseModel):
@@ -57,10 +68,98 @@ class CVConfig(BaseModel):
     timeout: float = 10.0  # Изменено на float, значение по умолчанию
 
 
+class HttpPoolConfig(BaseModel):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0  # секунды простоя, после которых keep-alive соединение закрывается
+    per_host: int | None = None  # Лимит одновременных запросов к одному хосту (None - без лимита)
+    retries: int = 0  # Повторы только при ошибке установки соединения
+    timeout: float = 10.0
+
+
+class HttpConfig(BaseModel):
+    cv: HttpPoolConfig = Field(default_factory=HttpPoolConfig)
+    device: HttpPoolConfig = Field(default_factory=lambda: HttpPoolConfig(
+        max_connections=500, max_keepalive_connections=200, per_host=4, timeout=3.0
+    ))
+
+
 class BiometrySettings(BaseModel):  # Изменено на BaseModel для лучшей практики
     min_embedding_size: int = 128
 
 
+class BatchWriterConfig(BaseModel):
+    max_queue: int = 10000  # При заполнении очереди запись ждет (backpressure)
+    batch_size: int = 500
+    flush_interval: float = 0.5  # секунды
+
+
+class AuditLogConfig(BatchWriterConfig):
+    # strict - записи аудита пишутся в транзакции изменения (одним INSERT перед COMMIT
+    #   единицы работы), изменение без записи аудита не фиксируется;
+    # async - после COMMIT в очередь с пакетной записью (max_queue/batch_size/flush_interval),
+    #   остаток дописывается при остановке; при переполненной очереди записи отбрасываются
+    durability: Literal["strict", "async"] = "strict"
+
+
+class DeviceMonitorConfig(BaseModel):
+    enabled: bool = True
+    interval: float = 30.0  # секунды между циклами опроса /health
+    jitter: float = 0.2  # случайное смещение интервала, доля от interval
+    concurrency: int = 50  # одновременных проверок
+    timeout: float = 2.0
+
+
+class InMemoryStateConfig(BaseModel):
+    # Период полной пересинхронизации реестра устройств и индекса прав с БД (секунды).
+    # Страхует от изменений, сделанных другими воркерами.
+    resync_interval: float = 60.0
+    # Изменения прав из других воркеров приходят через LISTEN/NOTIFY (migrations/0007)
+    # сразу после COMMIT. Без него (listen_permissions=False, pgbouncer в transaction mode)
+    # и пока соединение LISTEN восстанавливается, отозванное право открывает дверь
+    # в другом воркере еще до resync_interval секунд.
+    listen_permissions: bool = True
+    listen_reconnect_delay: float = 5.0  # секунды между попытками переподключения LISTEN
+
+
+class AuthCacheConfig(BaseModel):
+    # Кэш пользователей для get_current_user. Изменения из других воркеров
+    # (деактивация, смена уровня доступа) видны не позже чем через user_ttl секунд.
+    user_ttl: float = 5.0
+    max_entries: int = 10000  # 0 - кэш выключен
+    # Кэш проверенных JWT: повторные запросы с тем же токеном не проверяют подпись заново
+    token_ttl: float = 300.0  # секунды, но не дольше exp токена
+    max_tokens: int = 10000
+
+
+class PartitionConfig(BaseModel):
+    enabled: bool = True
+    interval: Literal["day", "week", "month"] = "month"  # размер секции
+    premake: int = 3  # сколько будущих секций держать созданными
+    retention_days: int | None = None  # секции старше удаляются целиком; None - хранить все
+    check_interval: float = 3600.0  # секунды между проверками
+    lock_timeout: float = 5.0  # секунды ожидания блокировки таблицы при CREATE/DROP секции
+
+
+class PaginationConfig(BaseModel):
+    default_limit: int = 100  # если limit не передан
+    max_limit: int = 500  # больший limit обрезается до этого значения
+
+
+class ExportConfig(BaseModel):
+    chunk_size: int = 5000  # строк за одну выборку из серверного курсора при выгрузке журналов
+
+
+class BulkConfig(BaseModel):
+    max_rows: int = 10000  # строк в одной загрузке /bulk; больше - 413
+
+
+class MigrationsConfig(BaseModel):
+    # Применять init.sql и migrations/*.sql при старте. На больших таблицах
+    # CREATE INDEX CONCURRENTLY идет долго - тогда выключить и запускать python -m app.pkg.migrator
+    run_on_startup: bool = True
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=('.env', '.env.local'),  # Добавлен .env.local для переопределения
@@ -77,6 +176,17 @@ class Settings(BaseSettings):
     hasher: HasherConfig = Field(default_factory=HasherConfig)  # default_factory для генерации hash_key
     root: RootConfig
     cv: CVConfig
+    http: HttpConfig = Field(default_factory=HttpConfig)
+    in_memory: InMemoryStateConfig = Field(default_factory=InMemoryStateConfig)
+    access_log_writer: BatchWriterConfig = Field(default_factory=BatchWriterConfig)
+    audit_log: AuditLogConfig = Field(default_factory=AuditLogConfig)
+    device_monitor: DeviceMonitorConfig = Field(default_factory=DeviceMonitorConfig)
+    auth_cache: AuthCacheConfig = Field(default_factory=AuthCacheConfig)
+    access_log_partitions: PartitionConfig = Field(default_factory=PartitionConfig)
+    pagination: PaginationConfig = Field(default_factory=PaginationConfig)
+    export: ExportConfig = Field(default_factory=ExportConfig)
+    bulk: BulkConfig = Field(default_factory=BulkConfig)
+    migrations: MigrationsConfig = Field(default_factory=MigrationsConfig)
 
 
 settings = Settings()
@@ -1,26 +1,367 @@
 import asyncio
+import functools
+import logging
+import time
 from asyncio.exceptions import TimeoutError
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
 
 import asyncpg
 
+from app.config import DatabaseConfig, settings
+from app.pkg.clock import DB_TIMEZONE
+from app.pkg.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ConnectionHook = Callable[[asyncpg.Connection], Awaitable[None]]
+
+
+def _log_query(record: asyncpg.connection.LoggedQuery) -> None:
+    logger.info(f"Query {record.elapsed * 1000:.2f} ms: {record.query}")
+
+
+def _safe_dsn(dsn: str) -> str:
+    """DSN для логов: без пароля (postgresql://user@host:port/db)."""
+    parts = urlsplit(dsn)
+    if parts.password is None:
+        return dsn
+    netloc = f"{parts.username}@{parts.hostname}" + (f":{parts.port}" if parts.port else "")
+    return parts._replace(netloc=netloc).geturl()
+
+
+class _TimedAcquire:
+    """
+    Обертка над контекстом публичного Pool.acquire(): поддерживает оба способа
+    использования (async with и await) и замеряет только ожидание соединения.
+    """
+
+    def __init__(self, pool: "InstrumentedPool", acquire_context):
+        self._pool = pool
+        self._context = acquire_context
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        return await self._pool._timed(self._context.__aenter__())
+
+    async def __aexit__(self, *exc_info):
+        return await self._context.__aexit__(*exc_info)
+
+    def __await__(self):
+        return self._pool._timed(self._context).__await__()
+
+
+class InstrumentedPool:
+    """
+    Пул asyncpg с учетом ожидания свободного соединения:
+    число ждущих в acquire() и гистограмма времени ожидания "db.<name>.acquire_wait".
+
+    Обертка над пулом из публичного asyncpg.create_pool(), а не наследник asyncpg.Pool:
+    конструктор Pool - не публичный API. Запросы через пул (fetch/execute/...) берут
+    соединение через acquire() обертки, поэтому тоже попадают в замер.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, name: str = "pool", echo_pool: bool = False):
+        self._pool = pool
+        self.name = name
+        self.echo_pool = echo_pool
+        self.waiters = 0
+        self._acquire_wait_name = f"db.{name}.acquire_wait"
+
+    @classmethod
+    async def create(cls, dsn: str, name: str = "pool", echo_pool: bool = False, **pool_kwargs) -> "InstrumentedPool":
+        return cls(await asyncpg.create_pool(dsn, **pool_kwargs), name=name, echo_pool=echo_pool)
+
+    @property
+    def acquire_wait(self):
+        # По имени при каждом обращении - та же гистограмма, что отдает /metrics, даже после ее сброса
+        return metrics.histogram(self._acquire_wait_name)
+
+    def acquire(self, *, timeout=None) -> _TimedAcquire:
+        return _TimedAcquire(self, self._pool.acquire(timeout=timeout))
+
+    async def release(self, connection: asyncpg.Connection, *, timeout=None) -> None:
+        await self._pool.release(connection, timeout=timeout)
+
+    async def close(self) -> None:
+        await self._pool.close()
+
+    def terminate(self) -> None:
+        self._pool.terminate()
+
+    async def execute(self, query: str, *args, timeout=None) -> str:
+        async with self.acquire() as conn:
+            return await conn.execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command: str, args, *, timeout=None) -> None:
+        async with self.acquire() as conn:
+            await conn.executemany(command, args, timeout=timeout)
+
+    async def fetch(self, query: str, *args, timeout=None, record_class=None) -> List[asyncpg.Record]:
+        async with self.acquire() as conn:
+            return await conn.fetch(query, *args, timeout=timeout, record_class=record_class)
+
+    async def fetchrow(self, query: str, *args, timeout=None, record_class=None) -> Optional[asyncpg.Record]:
+        async with self.acquire() as conn:
+            return await conn.fetchrow(query, *args, timeout=timeout, record_class=record_class)
+
+    async def fetchval(self, query: str, *args, column: int = 0, timeout=None):
+        async with self.acquire() as conn:
+            return await conn.fetchval(query, *args, column=column, timeout=timeout)
+
+    def get_size(self) -> int:
+        return self._pool.get_size()
+
+    def get_idle_size(self) -> int:
+        return self._pool.get_idle_size()
+
+    def get_min_size(self) -> int:
+        return self._pool.get_min_size()
+
+    def get_max_size(self) -> int:
+        return self._pool.get_max_size()
+
+    async def _timed(self, acquiring: Awaitable[asyncpg.Connection]) -> asyncpg.Connection:
+        start = time.perf_counter()
+        self.waiters += 1
+        try:
+            return await acquiring
+        finally:
+            self.waiters -= 1
+            wait_ms = (time.perf_counter() - start) * 1000
+            self.acquire_wait.observe(wait_ms)
+            if self.echo_pool:
+                logger.info(f"Pool '{self.name}' acquire: waited {wait_ms:.2f} ms, in use {self.get_size() - self.get_idle_size()}/{self.get_max_size()}")
+
+
+class TransactionAbortedError(RuntimeError):
+    """Запрос внутри единицы работы упал, а ошибку перехватили - транзакция откатывается целиком."""
+
+
+def _is_db_error(exc: BaseException) -> bool:
+    # Репозитории заворачивают ошибки asyncpg в HTTPException - смотрим и на цепочку причин
+    while exc is not None:
+        if isinstance(exc, asyncpg.PostgresError):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class UnitOfWork:
+    """
+    Одно соединение и одна транзакция на все вызовы репозиториев внутри db.transaction().
+    Соединение берется из пула при первом запросе, поэтому работа до него (проверки прав,
+    bcrypt, 404 до обращения к БД) пул не занимает. Запросы идут последовательно:
+    параллельные вызовы (gather) на одном соединении asyncpg не допускает.
+    """
+
+    def __init__(self, pool: "InstrumentedPool"):
+        self._pool = pool
+        self._conn: Optional[asyncpg.Connection] = None
+        self._transaction = None
+        self._owner = asyncio.current_task()
+        self.failed = False
+        self.before_commit: List[Callable[[], Awaitable[None]]] = []  # ошибка в них - откат
+        self.after_commit: List[Callable[[], object]] = []
+        self.pending: Dict[str, list] = {}  # записи, отложенные до COMMIT (аудит), по имени буфера
+
+    def owns_current_task(self) -> bool:
+        # Задачи, запущенные изнутри (create_task копирует контекст), идут в пул
+        return asyncio.current_task() is self._owner
+
+    async def connection(self) -> asyncpg.Connection:
+        if self._conn is None:
+            conn = await self._pool.acquire()
+            try:
+                transaction = conn.transaction()
+                await transaction.start()
+            except BaseException:
+                await self._pool.release(conn)
+                raise
+            self._conn, self._transaction = conn, transaction
+        return self._conn
+
+    async def finish(self, commit: bool) -> None:
+        if self._conn is None:
+            return
+        try:
+            if commit and not self.failed:
+                await self._transaction.commit()
+            else:
+                await self._transaction.rollback()
+        finally:
+            await self._pool.release(self._conn)
+            self._conn = self._transaction = None
+
+
+_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar("unit_of_work", default=None)
+
 
 class Database:
     def __init__(self):
-        self.pool: asyncpg.Pool = None
+        self.pool: InstrumentedPool = None
+        self.read_pool: InstrumentedPool | None = None  # Реплика для тяжелых чтений (опционально)
+        self._init_hooks: List[ConnectionHook] = []
+        self._echo = False
+
+    def on_connect(self, hook: ConnectionHook) -> ConnectionHook:
+        """Регистрирует корутину, вызываемую для каждого нового соединения пула (кодеки, SET и т.п.)."""
+        self._init_hooks.append(hook)
+        return hook
 
-    async def connect(self, dsn: str):
+    async def _init_connection(self, conn: asyncpg.Connection) -> None:
+        if self._echo:
+            conn.add_query_logger(_log_query)
+        for hook in self._init_hooks:
+            await hook(conn)
+
+    async def connect(self, dsn: str, config: DatabaseConfig | None = None):
+        config = config or settings.db
+        self._echo = config.echo
         if not self.pool:
+            self.pool = await self._create_pool(dsn, config, name="pool")
+        if config.replica_dsn and not self.read_pool:
+            self.read_pool = await self._create_pool(config.replica_dsn, config, name="read_pool")
+
+    async def _create_pool(self, dsn: str, config: DatabaseConfig, name: str) -> InstrumentedPool:
+        try:
+            return await InstrumentedPool.create(
+                dsn,
+                name=name,
+                echo_pool=config.echo_pool,
+                min_size=config.pool_size,
+                max_size=config.pool_size + config.max_overflow,
+                max_queries=config.max_queries,
+                max_inactive_connection_lifetime=config.max_inactive_connection_lifetime,
+                init=self._init_connection,
+                statement_cache_size=config.statement_cache_size,
+                command_timeout=config.command_timeout,
+                # NOW()/DEFAULT now() в колонках TIMESTAMP - в том же UTC, что и utcnow() приложения
+                server_settings={"timezone": DB_TIMEZONE},
+            )
+        except Exception:
+            # Без пула приложение работать не может - ошибка останавливает старт
+            logger.exception(f"Failed to create database pool '{name}' for {_safe_dsn(dsn)}")
+            raise
+
+    def current_unit(self) -> Optional[UnitOfWork]:
+        unit = _unit_of_work.get()
+        if unit is not None and unit.owns_current_task():
+            return unit
+        return None
+
+    def in_transaction(self) -> bool:
+        return self.current_unit() is not None
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Соединение для репозитория: внутри db.transaction() - общее соединение единицы
+        работы, иначе - из основного пула на время блока (как pool.acquire()).
+        """
+        unit = self.current_unit()
+        if unit is None:
+            async with self.pool.acquire() as conn:
+                yield conn
+            return
+        conn = await unit.connection()
+        try:
+            yield conn
+        except BaseException as e:
+            if _is_db_error(e):
+                unit.failed = True  # транзакция в PostgreSQL уже прервана, COMMIT стал бы ROLLBACK
+            raise
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[UnitOfWork]:
+        """
+        Единица работы: все db.connection() внутри блока (в том числе в вызываемых
+        репозиториях) используют одно соединение и одну транзакцию. Выход по исключению -
+        откат. Вложенный вызов присоединяется к внешней единице работы.
+        Перед COMMIT выполняются unit.before_commit (например, пакетная запись аудита).
+        """
+        unit = self.current_unit()
+        if unit is not None:
+            yield unit
+            return
+        unit = UnitOfWork(self.pool)
+        token = _unit_of_work.set(unit)
+        try:
             try:
-                self.pool = await asyncpg.create_pool(
-                    dsn=dsn,
-                )
-            except Exception as e:
-                print(dsn, repr(e), flush=True)
+                yield unit
+                for callback in unit.before_commit:
+                    await callback()
+            except BaseException:
+                await unit.finish(commit=False)
+                raise
+            await unit.finish(commit=True)
+        finally:
+            _unit_of_work.reset(token)
+        if unit.failed:
+            raise TransactionAbortedError("Query failed inside a unit of work, transaction rolled back")
+        for callback in unit.after_commit:
+            try:
+                callback()
+            except Exception:
+                logger.exception(f"after_commit callback {callback!r} failed")
+
+    def transactional(self, func):
+        """Декоратор метода сервиса: весь вызов - одна единица работы (db.transaction())."""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with self.transaction():
+                return await func(*args, **kwargs)
+        return wrapper
+
+    def after_commit(self, callback: Callable[[], object]) -> None:
+        """
+        Действие после успешного COMMIT текущей единицы работы (обновить кеш/реестр),
+        чтобы откат не оставлял в памяти несуществующие данные. Вне единицы работы - сразу.
+        """
+        unit = self.current_unit()
+        if unit is None:
+            callback()
+        else:
+            unit.after_commit.append(callback)
+
+    def reader(self, use_primary: bool = False) -> InstrumentedPool:
+        """
+        Пул для чтения: реплика, если настроена (db.replica_dsn), иначе основной.
+        use_primary=True - читать с основного (нужно увидеть только что записанное).
+        """
+        if use_primary or self.read_pool is None:
+            return self.pool
+        return self.read_pool
 
     async def disconnect(self):
-        if self.pool:
-            try:
-                await asyncio.wait_for(self.pool.close(), timeout=5)
-            except TimeoutError:
-                print("TimeoutError")
-            self.pool = None
+        for attr in ("read_pool", "pool"):
+            pool = getattr(self, attr)
+            if pool:
+                try:
+                    await asyncio.wait_for(pool.close(), timeout=5)
+                except TimeoutError:
+                    print("TimeoutError")
+                setattr(self, attr, None)
+
+    def stats(self) -> dict:
+        stats = self._pool_stats(self.pool)
+        if self.read_pool:
+            stats["read_pool"] = self._pool_stats(self.read_pool)
+        return stats
+
+    @staticmethod
+    def _pool_stats(pool: InstrumentedPool | None) -> dict:
+        if not pool:
+            return {"connected": False}
+        size, idle = pool.get_size(), pool.get_idle_size()
+        return {
+            "connected": True,
+            "min_size": pool.get_min_size(),
+            "max_size": pool.get_max_size(),
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "waiters": pool.waiters,
+            "acquire_wait": pool.acquire_wait.snapshot(),
+        }
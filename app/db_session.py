@@ -1,3 +1,5 @@
 from app.db_helper import Database
+from app.pkg.pg_codecs import register_json_codecs
 
 db = Database()
+db.on_connect(register_json_codecs)
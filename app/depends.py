@@ -1,5 +1,6 @@
 from typing import Annotated
 
+import httpx
 from fastapi import Depends
 
 # Репозитории
@@ -23,6 +24,8 @@ from app.services.audit_log import AuditLogService   # Новый
 from app.services.openvpn import OpenVPNService   # Новый
 
 from app.pkg.docker_manager import DockerManager
+from app.pkg.http_clients import http_clients
+from app.pkg.pagination import PageRequest
 
 # --- Репозитории ---
 UserRepoDependency = Annotated[UserRepo, Depends(UserRepo)]
@@ -36,6 +39,22 @@ OpenVPNRepoDependency = Annotated[OpenVPNRepo, Depends(OpenVPNRepo)]
 
 DockerManagerDependency = Annotated[DockerManager, Depends(DockerManager)]
 
+# --- Пагинация (limit, cursor из query) ---
+PageRequestDependency = Annotated[PageRequest, Depends(PageRequest)]
+
+
+# --- HTTP-клиенты (общие, живут в lifespan) ---
+def get_cv_http_client() -> httpx.AsyncClient:
+    return http_clients.cv
+
+
+def get_device_http_client() -> httpx.AsyncClient:
+    return http_clients.device
+
+
+CVHttpClientDependency = Annotated[httpx.AsyncClient, Depends(get_cv_http_client)]
+DeviceHttpClientDependency = Annotated[httpx.AsyncClient, Depends(get_device_http_client)]
+
 
 # --- Сервисы ---
 
@@ -81,9 +100,14 @@ async def get_device_service(
     device_repo: DeviceRepoDependency,
     audit_repo: AuditLogRepoDependency,    # Добавлено
     access_log_repo: AccessLogRepoDependency,  # Добавлено
-    permission_service: PermissionServiceDependency  # Добавлено (для проверки прав в wakeup)
+    permission_service: PermissionServiceDependency,  # Добавлено (для проверки прав в wakeup)
+    cv_client: CVHttpClientDependency,
+    device_client: DeviceHttpClientDependency
 ):
-    return DeviceService(user_repo, zone_repo, device_repo, audit_repo, access_log_repo, permission_service)
+    return DeviceService(
+        user_repo, zone_repo, device_repo, audit_repo, access_log_repo, permission_service,
+        cv_client, device_client
+    )
 
 DeviceServiceDependency = Annotated[DeviceService, Depends(get_device_service)]
 
@@ -92,9 +116,10 @@ DeviceServiceDependency = Annotated[DeviceService, Depends(get_device_service)]
 async def get_biometry_service(
     user_repo: UserRepoDependency,
     biometry_repo: BiometryRepoDependency,
-    audit_repo: AuditLogRepoDependency  # Добавлено
+    audit_repo: AuditLogRepoDependency,  # Добавлено
+    cv_client: CVHttpClientDependency
 ):
-    return BiometryService(user_repo, biometry_repo, audit_repo)
+    return BiometryService(user_repo, biometry_repo, audit_repo, cv_client)
 
 BiometryServiceDependency = Annotated[BiometryService, Depends(get_biometry_service)]
 
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -16,7 +16,7 @@ class AccessLogBase(BaseModel):
 
 
 class AccessLogCreate(AccessLogBase):
-    pass
+    created_at: Optional[datetime] = Field(None, description="Время события, UTC (по умолчанию - момент постановки в очередь)")
 
 
 class AccessLog(AccessLogBase):  # Модель для представления данных из БД
@@ -29,3 +29,16 @@ class AccessLog(AccessLogBase):  # Модель для представлени
 
 class AccessLogResponse(AccessLog):  # Модель для ответа API
     pass
+
+
+StatsDimension = Literal["device", "zone", "hour", "day", "event_type"]
+
+
+class AccessStatsRow(BaseModel):  # Строка агрегата из access_log_hourly
+    device_id: Optional[UUID] = Field(None, description="ID устройства (group_by=device)")
+    zone_id: Optional[UUID] = Field(None, description="ID зоны (group_by=zone)")
+    period: Optional[datetime] = Field(None, description="Начало часа или дня (group_by=hour/day)")
+    event_type: Optional[str] = Field(None, description="Тип события (group_by=event_type)")
+    granted: int = Field(..., description="Событий с предоставленным доступом")
+    denied: int = Field(..., description="Событий без доступа")
+    total: int = Field(..., description="Всего событий")
@@ -14,7 +14,7 @@ class AuditLogBase(BaseModel):
 
 
 class AuditLogCreate(AuditLogBase):
-    pass
+    created_at: Optional[datetime] = Field(None, description="Время действия (по умолчанию - момент вызова AuditLogRepo.record)")
 
 
 class AuditLog(AuditLogBase):  # Модель для представления данных из БД
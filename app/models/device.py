@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Union, Optional
+from typing import Dict, List, Union, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, EmailStr, Field
@@ -55,3 +55,4 @@ class DeviceWakeupResponse(BaseModel):  # Ответ нашего API на /wake
     final_event_type: str
     processed_device_id: UUID
     identified_user_id: Optional[UUID] = None
+    timings_ms: Optional[Dict[str, float]] = None  # Разбивка по этапам (только по запросу ?timings=true)
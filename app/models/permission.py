@@ -1,17 +1,54 @@
-from datetime import datetime
-from typing import Optional, Literal
+from datetime import datetime, time
+from typing import Any, Dict, List, Optional, Literal
 from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from pydantic import BaseModel, Field
+import orjson
+from pydantic import BaseModel, Field, field_validator
+
+from app.pkg.clock import utcnow
+
+Weekday = Literal['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+WEEKDAYS: List[str] = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+class ScheduleRule(BaseModel):
+    days: List[Weekday] = Field(..., min_length=1, description="Дни недели, в которые действует интервал")
+    start: time = Field(..., description="Начало интервала (местное время расписания)")
+    end: time = Field(..., description="Конец интервала, не включая; end <= start - интервал через полночь, end == start - сутки")
+
+
+class AccessSchedule(BaseModel):
+    """Недельное расписание доступа: право действует только в минуты, попавшие в один из интервалов."""
+    timezone: str = Field("UTC", description="Часовой пояс IANA, в котором заданы интервалы (Europe/Moscow)")
+    rules: List[ScheduleRule] = Field(..., min_length=1)
+
+    @field_validator("timezone")
+    @classmethod
+    def known_timezone(cls, v: str) -> str:
+        try:
+            ZoneInfo(v)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone '{v}'")
+        return v
+
+
+def _schedule_from_json(v):
+    # Из CSV (/permission/bulk) расписание приходит JSON-строкой
+    if isinstance(v, (str, bytes)):
+        return orjson.loads(v) if v else None
+    return v
 
 
 class PermissionBase(BaseModel):
     user_id: UUID = Field(..., description="ID пользователя, которому выдается право")
     target_type: Literal['DEVICE', 'ZONE'] = Field(..., description="Тип объекта (DEVICE или ZONE)")
     target_id: UUID = Field(..., description="ID объекта (device_id или zone_id)")
-    valid_from: Optional[datetime] = Field(default_factory=datetime.now, description="Время начала действия права")
+    valid_from: Optional[datetime] = Field(default_factory=utcnow, description="Время начала действия права (UTC)")
     valid_to: Optional[datetime] = Field(None, description="Время окончания действия права (None - бессрочно)")
-    # schedule: Optional[dict] = Field(None, description="Расписание доступа (JSONB)") # Можно добавить позже
+    schedule: Optional[AccessSchedule] = Field(None, description="Недельное расписание (None - в любое время)")
+
+    parse_schedule = field_validator("schedule", mode="before")(_schedule_from_json)
 
 
 class PermissionCreate(PermissionBase):
@@ -19,11 +56,14 @@ class PermissionCreate(PermissionBase):
 
 
 class PermissionUpdate(BaseModel):
-    # Позволяем обновлять только сроки действия. Тип и объект права не меняются.
+    # Позволяем обновлять только сроки действия и расписание. Тип и объект права не меняются.
     # Для изменения типа/объекта - удалить старое право и создать новое.
     valid_from: Optional[datetime] = None
     valid_to: Optional[datetime] = None
-    # schedule: Optional[dict] = None
+    # schedule: передан null - расписание снимается, не передан - остается прежним
+    schedule: Optional[AccessSchedule] = None
+
+    parse_schedule = field_validator("schedule", mode="before")(_schedule_from_json)
 
 
 class Permission(PermissionBase):  # Модель для представления данных из БД
@@ -31,6 +71,10 @@ class Permission(PermissionBase):  # Модель для представлен
     assigned_by: UUID = Field(..., description="ID пользователя, выдавшего право")
     created_at: datetime = Field(..., description="Время создания записи о праве")
     updated_at: Optional[datetime] = Field(None, description="Время последнего обновления права")
+    # Из БД строки собираются без валидации (RowMapper): jsonb приходит dict'ом
+    schedule: Optional[Dict[str, Any]] = Field(None, description="Недельное расписание (None - в любое время)")
+    # Скомпилированное расписание (app.pkg.schedule) - для индекса прав, в ответы API не попадает
+    schedule_bitmap: Optional[bytes] = Field(None, exclude=True)
 
     class Config:
         from_attributes = True
@@ -1,21 +1,34 @@
-from datetime import datetime
+import hashlib
+import time
 
 import jwt
-import pytz
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 from app.config import settings
 from app.models.auth import TokenData
+from app.models.user import User
+from app.pkg.cache import TTLCache
 from app.pkg.hasher import Hasher
 from app.repositories.user import UserRepo
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
 
+# Пользователи, найденные по access-токену (ключ - user_id). Сбрасывается в UserService при изменении/удалении.
+user_cache: TTLCache[User] = TTLCache(ttl=settings.auth_cache.user_ttl, max_entries=settings.auth_cache.max_entries)
+
+
+# Payload уже проверенных токенов (ключ - sha256 токена); запись живет не дольше exp токена
+token_cache: TTLCache[dict] = TTLCache(ttl=settings.auth_cache.token_ttl, max_entries=settings.auth_cache.max_tokens)
+
+
+def evict_cached_user(user_id) -> None:
+    user_cache.pop(str(user_id))
+
 
 async def authenticate(login: str, password: str):
     db_user = await UserRepo.select_user(login=login)
-    check_verify = Hasher.verify_password(password, db_user.password)
+    check_verify = await Hasher.verify_password_async(password, db_user.password)
     if check_verify:
         return db_user
     else:
@@ -26,6 +39,48 @@ async def authenticate(login: str, password: str):
         )
 
 
+def _decode_token(token: str) -> dict:
+    """
+    Проверяет подпись и exp/iat токена (бросает jwt.PyJWTError).
+    Уже проверенные токены берутся из кэша по sha256 токена - не дольше, чем до их exp.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(
+        token, settings.hasher.hash_key, algorithms=[settings.hasher.algorithm],
+        options={"require": ["exp", "iat"]}
+    )
+    lifetime = min(payload["exp"] - time.time(), settings.auth_cache.token_ttl)
+    if lifetime > 0:
+        token_cache.set(key, payload, ttl=lifetime)
+    return payload
+
+
+def _token_user_id(token: str, expected_type: str, type_exception: HTTPException) -> TokenData:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = _decode_token(token)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Время жизни токена истекло")
+    except jwt.MissingRequiredClaimError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Нет срока жизни(")
+    except jwt.PyJWTError:
+        raise credentials_exception
+
+    if payload.get("type") != expected_type:
+        raise type_exception
+    user_id: str = payload.get("sub")
+    if not user_id:
+        raise credentials_exception
+    return TokenData(uuid=user_id)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -37,28 +92,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Invalid token type, expected access token",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.hasher.hash_key, algorithms=[settings.hasher.algorithm])
-
-        expiration_date: str = payload.get("expire", {})
-        if expiration_date is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Нет срока жизни(")
-        expiration_date = datetime.fromisoformat(expiration_date)
-        if expiration_date < datetime.now(tz=pytz.timezone('Europe/Moscow')):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Время жизни токена истекло")
-
-        token_type: str = payload.get("type")
-        if token_type != 'access':
-            raise access_exception
-        user_id: str = payload.get("sub")
-        if not user_id:
-            raise credentials_exception
-        token_data = TokenData(uuid=user_id)
-    except jwt.PyJWTError:
-        raise credentials_exception
+    token_data = _token_user_id(token, 'access', access_exception)
+    user = user_cache.get(str(token_data.uuid))
+    if user is not None:
+        return user
     user = await UserRepo.select_user(user_id=token_data.uuid)
     if not user:
         raise credentials_exception
+    user_cache.set(str(user.user_id), user)
     return user
 
 
@@ -73,25 +114,8 @@ async def refresh_account_token(token: str = Depends(oauth2_scheme)):
         detail="Invalid token type, expected refresh token",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.hasher.hash_key, algorithms=[settings.hasher.algorithm])
-
-        expiration_date: str = payload.get("expire", {})
-        if expiration_date is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Нет срока жизни(")
-        expiration_date = datetime.fromisoformat(expiration_date)
-        if expiration_date < datetime.now(tz=pytz.timezone('Europe/Moscow')):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Время жизни токена истекло")
-        token_type: str = payload.get("type")
-        if token_type != 'refresh':
-            raise refresh_exception
-        user_id: str = payload.get("sub")
-        if not user_id:
-            raise credentials_exception
-        token_data = TokenData(uuid=user_id)
-    except jwt.PyJWTError:
-        raise credentials_exception
-    user = await UserRepo.select_account(uuid=token_data.uuid)
+    token_data = _token_user_id(token, 'refresh', refresh_exception)
+    user = await UserRepo.select_user(user_id=token_data.uuid)
     if not user:
         raise credentials_exception
     return user
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Generic, List, Optional, TypeVar
+
+from app.pkg.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BatchWriter(Generic[T]):
+    """
+    Write-behind очередь: элементы копятся в ограниченной очереди в памяти и
+    сбрасываются пачками - по достижении batch_size или раз в flush_interval секунд.
+
+    put() ждет, если очередь заполнена (backpressure); offer() не ждет и при
+    заполненной очереди отбрасывает элемент (счетчик dropped). close() дожидается
+    сброса всего, что осталось в очереди; вызывается при остановке приложения.
+    Время от постановки в очередь до записи - гистограмма "batch_writer.<name>.delay".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[List[T]], Awaitable[None]],
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ):
+        self.name = name
+        self._flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self._delay_name = f"batch_writer.{name}.delay"
+
+    @property
+    def delay(self):
+        # По имени при каждом обращении - та же гистограмма, что отдает /metrics, даже после ее сброса
+        return metrics.histogram(self._delay_name)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name=f"batch-writer-{self.name}")
+
+    async def put(self, item: T) -> None:
+        if self._task is None:
+            # Writer не запущен (скрипты, тесты) - пишем сразу
+            await self._flush_batch([(time.monotonic(), item)])
+            return
+        await self._queue.put((time.monotonic(), item))
+        self.enqueued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+
+    def offer(self, item: T) -> bool:
+        """Поставить в очередь без ожидания; False - очередь заполнена и элемент отброшен."""
+        try:
+            self._queue.put_nowait((time.monotonic(), item))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Batch writer '{self.name}' queue is full, item dropped")
+            return False
+        self.enqueued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+        return True
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._closing = True
+        self._full.set()
+        await self._task
+        self._task = None
+        await self._drain()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self._drain()
+
+    async def _drain(self) -> None:
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._flush_batch(batch)
+
+    async def _flush_batch(self, batch: list) -> None:
+        try:
+            await self._flush([item for _, item in batch])
+            self.flushed += len(batch)
+            now = time.monotonic()
+            delay = self.delay
+            for enqueued_at, _ in batch:
+                delay.observe((now - enqueued_at) * 1000)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception(f"Batch writer '{self.name}' failed to flush {len(batch)} items")
+        finally:
+            self.batches += 1
@@ -0,0 +1,166 @@
+"""
+Пакетная загрузка (/bulk): тело запроса - JSON-массив, NDJSON или CSV (по Content-Type,
+либо файл в multipart/form-data), каждая строка проверяется моделью отдельно.
+Ошибки не прерывают загрузку: в ответе отчет по каждой строке.
+"""
+import csv
+import io
+from typing import Dict, Generic, List, Optional, Tuple, Type, TypeVar
+from uuid import UUID
+
+import orjson
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, Field, ValidationError
+
+from app.config import settings
+
+M = TypeVar("M", bound=BaseModel)
+
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+JSON_TYPES = ("application/json",)
+
+# Описание тела для OpenAPI: FastAPI не выводит его сам, т.к. тело читается из Request
+BULK_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            "application/x-ndjson": {"schema": {"type": "string"}},
+            "text/csv": {"schema": {"type": "string"}},
+            "multipart/form-data": {
+                "schema": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}}}
+            },
+        },
+    }
+}
+
+
+class BulkRowResult(BaseModel):
+    row: int = Field(..., description="Номер строки в загрузке, с 0 (для CSV - без заголовка)")
+    ok: bool
+    id: Optional[UUID] = Field(None, description="ID созданной записи")
+    error: Optional[str] = None
+
+
+class BulkReport(BaseModel):
+    total: int
+    created: int
+    failed: int
+    results: List[BulkRowResult]
+
+
+class BulkBatch(Generic[M]):
+    """Строки загрузки: провалившиеся отмечаются fail, созданные - succeed."""
+
+    def __init__(self):
+        self.rows: List[Tuple[int, M]] = []
+        self.results: Dict[int, BulkRowResult] = {}
+
+    def fail(self, row: int, error: str) -> None:
+        self.results[row] = BulkRowResult(row=row, ok=False, error=error)
+
+    def succeed(self, row: int, id_: UUID) -> None:
+        self.results[row] = BulkRowResult(row=row, ok=True, id=id_)
+
+    def pending(self) -> List[Tuple[int, M]]:
+        """Прошедшие валидацию строки, по которым еще нет результата."""
+        return [(row, item) for row, item in self.rows if row not in self.results]
+
+    def report(self) -> BulkReport:
+        results = [self.results[row] for row in sorted(self.results)]
+        created = sum(1 for result in results if result.ok)
+        return BulkReport(total=len(results), created=created, failed=len(results) - created, results=results)
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _json_rows(body: bytes) -> list:
+    try:
+        rows = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise _bad_request(f"Invalid JSON: {e}")
+    if not isinstance(rows, list):
+        raise _bad_request("Expected a JSON array of objects")
+    return rows
+
+
+def _ndjson_rows(body: bytes) -> list:
+    rows = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(orjson.loads(line))
+        except orjson.JSONDecodeError as e:
+            rows.append(ValueError(f"Invalid JSON: {e}"))  # ошибка только этой строки
+    return rows
+
+
+def _csv_rows(body: bytes) -> list:
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise _bad_request("CSV must be UTF-8")
+    # Пустая ячейка - поля нет, чтобы сработало значение по умолчанию модели
+    return [
+        {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+def _error_text(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in exc.errors())
+
+
+async def _upload(request: Request) -> Tuple[str, bytes]:
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    if content_type != "multipart/form-data":
+        return content_type, await request.body()
+    form = await request.form()
+    upload = form.get("file")
+    if upload is None or isinstance(upload, str):
+        raise _bad_request("Expected a file in the 'file' form field")
+    content_type = (upload.content_type or "").split(";")[0].strip().lower()
+    filename = (upload.filename or "").lower()
+    if filename.endswith(".csv"):
+        content_type = "text/csv"
+    elif filename.endswith((".ndjson", ".jsonl")):
+        content_type = "application/x-ndjson"
+    elif filename.endswith(".json"):
+        content_type = "application/json"
+    return content_type, await upload.read()
+
+
+async def read_bulk(request: Request, model: Type[M]) -> BulkBatch[M]:
+    """Разбирает загрузку и проверяет каждую строку моделью; невалидные строки сразу в отчет."""
+    content_type, body = await _upload(request)
+    if content_type in CSV_TYPES:
+        raw_rows = _csv_rows(body)
+    elif content_type in NDJSON_TYPES:
+        raw_rows = _ndjson_rows(body)
+    elif content_type in JSON_TYPES:
+        raw_rows = _json_rows(body)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected application/json, application/x-ndjson or text/csv"
+        )
+    if len(raw_rows) > settings.bulk.max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many rows: {len(raw_rows)}, max {settings.bulk.max_rows}"
+        )
+
+    batch: BulkBatch[M] = BulkBatch()
+    for row, raw in enumerate(raw_rows):
+        if isinstance(raw, ValueError):
+            batch.fail(row, str(raw))
+            continue
+        try:
+            batch.rows.append((row, model.model_validate(raw)))
+        except ValidationError as e:
+            batch.fail(row, _error_text(e))
+    return batch
@@ -0,0 +1,27 @@
+"""
+Единые часы для колонок TIMESTAMP (без зоны): все время в БД - naive UTC.
+
+Сеанс каждого соединения пула работает в поясе UTC (Database._create_pool), поэтому
+NOW()/DEFAULT now() в SQL и utcnow() в приложении дают одно и то же время независимо
+от пояса сервера приложения и сервера БД: секции access_log, почасовые агрегаты и
+keyset-сортировка по created_at не расходятся.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+DB_TIMEZONE = "UTC"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Время к виду колонок TIMESTAMP. Aware-значения из запроса (…Z, +03:00) переводятся
+    в UTC; иначе asyncpg не передаст их параметром, а граница секционирования не сработает
+    для отсечения секций. Naive-значения считаются уже заданными в UTC.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -0,0 +1,106 @@
+import uuid
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+from app.models.device import Device
+
+
+class DeviceRegistry:
+    """
+    Процессный реестр устройств для горячего пути /device/wakeup.
+
+    Загружается при старте приложения и обновляется DeviceService при
+    создании/изменении/удалении устройств, поэтому определение камеры по
+    (ip, port) и по device_id не требует обращения к БД.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[uuid.UUID, Device] = {}
+        self._by_address: Dict[Tuple[str, int], uuid.UUID] = {}
+        self._version = 0
+        self._loaded = False
+
+    @property
+    def version(self) -> int:
+        """Счетчик изменений; позволяет не затирать свежие изменения устаревшим снимком из БД."""
+        return self._version
+
+    @property
+    def loaded(self) -> bool:
+        """Реестр хотя бы раз загружен из БД."""
+        return self._loaded
+
+    @staticmethod
+    def _address_key(ip, port) -> Optional[Tuple[str, int]]:
+        if ip is None or port is None:
+            return None
+        try:
+            return str(ip), int(port)
+        except (TypeError, ValueError):
+            return None
+
+    def load(self, devices: Iterable[Device], version: Optional[int] = None) -> bool:
+        if version is not None and version != self._version:
+            return False
+        by_id: Dict[uuid.UUID, Device] = {}
+        by_address: Dict[Tuple[str, int], uuid.UUID] = {}
+        for device in devices:
+            by_id[device.device_id] = device
+            key = self._address_key(device.ip, device.port)
+            if key:
+                by_address[key] = device.device_id
+        # Подменяем словари целиком, чтобы параллельные чтения не видели частичного состояния
+        self._by_id = by_id
+        self._by_address = by_address
+        self._version += 1
+        self._loaded = True
+        return True
+
+    def put(self, device: Device) -> None:
+        previous = self._by_id.get(device.device_id)
+        if previous:
+            old_key = self._address_key(previous.ip, previous.port)
+            if old_key and self._by_address.get(old_key) == device.device_id:
+                del self._by_address[old_key]
+        self._by_id[device.device_id] = device
+        key = self._address_key(device.ip, device.port)
+        if key:
+            self._by_address[key] = device.device_id
+        self._version += 1
+
+    def remove(self, device_id: uuid.UUID) -> None:
+        device = self._by_id.pop(device_id, None)
+        if not device:
+            return
+        key = self._address_key(device.ip, device.port)
+        if key and self._by_address.get(key) == device_id:
+            del self._by_address[key]
+        self._version += 1
+
+    def remove_zone(self, zone_id: uuid.UUID) -> None:
+        """Устройства удаляются каскадно вместе с зоной (ON DELETE CASCADE)."""
+        for device_id in [d.device_id for d in self._by_id.values() if d.zone_id == zone_id]:
+            self.remove(device_id)
+
+    def get(self, device_id: uuid.UUID) -> Optional[Device]:
+        return self._by_id.get(device_id)
+
+    def get_by_address(self, ip, port) -> Optional[Device]:
+        key = self._address_key(ip, port)
+        if not key:
+            return None
+        device_id = self._by_address.get(key)
+        return self._by_id.get(device_id) if device_id else None
+
+    def in_zones(self, zone_ids: Collection[uuid.UUID]) -> List[uuid.UUID]:
+        if not zone_ids:
+            return []
+        return [d.device_id for d in self._by_id.values() if d.zone_id in zone_ids]
+
+    def all(self) -> List[Device]:
+        return list(self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+
+device_registry = DeviceRegistry()
@@ -0,0 +1,69 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Literal, Tuple
+
+import asyncpg
+import orjson
+
+from app.db_helper import InstrumentedPool
+
+ExportFormat = Literal["ndjson", "csv"]
+RowChunks = AsyncIterator[List[asyncpg.Record]]
+
+
+async def stream_query(pool: InstrumentedPool, query: str, params: list, chunk_size: int) -> RowChunks:
+    """
+    Строки запроса пачками по chunk_size через серверный курсор.
+
+    Курсор живет в read-only транзакции REPEATABLE READ: выгрузка видит один снимок
+    данных, в памяти одновременно не больше одной пачки. Соединение занято до конца
+    выгрузки (или до обрыва клиента - тогда генератор закрывается и транзакция откатывается).
+    """
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            cursor = await conn.cursor(query, *params)
+            while True:
+                rows = await cursor.fetch(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+
+async def ndjson_lines(chunks: RowChunks) -> AsyncIterator[bytes]:
+    """Одна JSON-строка на запись; datetime и jsonb (dict) сериализует orjson, uuid asyncpg - через str."""
+    dumps, option = orjson.dumps, orjson.OPT_NON_STR_KEYS
+    async for rows in chunks:
+        yield b"".join(dumps(dict(row.items()), default=str, option=option) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return value
+
+
+async def csv_lines(chunks: RowChunks) -> AsyncIterator[bytes]:
+    """CSV с заголовком из имен колонок; jsonb-поля - JSON-строкой в ячейке."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    async for rows in chunks:
+        if not header_written:
+            writer.writerow(rows[0].keys())
+            header_written = True
+        for row in rows:
+            writer.writerow([_csv_value(value) for value in row.values()])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+EXPORT_FORMATS: Dict[str, Tuple[str, Callable[[RowChunks], AsyncIterator[bytes]]]] = {
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+    "csv": ("text/csv; charset=utf-8", csv_lines),
+}
@@ -1,37 +1,86 @@
-from datetime import datetime, timedelta
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 import jwt
-import pytz
 from passlib.context import CryptContext
 
 from app.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Пул для bcrypt (десятки мс CPU на вызов), чтобы хеширование не блокировало event loop.
+# Создается в lifespan (start_hash_executor); без него используется пул потоков loop по умолчанию.
+_hash_executor: Executor | None = None
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _noop() -> None:
+    pass
+
+
+async def start_hash_executor() -> None:
+    global _hash_executor
+    config = settings.hasher
+    if _hash_executor is not None or config.executor == "inline":
+        return
+    workers = config.workers or os.cpu_count() or 1
+    if config.executor == "process":
+        # spawn: дочерние процессы не наследуют состояние event loop и пула БД
+        _hash_executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        # Запускаем процессы заранее, чтобы первые логины не ждали их старта
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(_hash_executor, _noop) for _ in range(workers)])
+    else:
+        _hash_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hasher")
+
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run(func, *args):
+    if settings.hasher.executor == "inline":
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+
+
+def _encode_token(data: dict, minutes) -> str:
+    # Стандартные числовые claims: exp проверяет сам PyJWT при decode
+    now = datetime.now(timezone.utc)
+    to_encode = data.copy()
+    to_encode.update({"iat": now, "exp": now + timedelta(minutes=minutes)})
+    return jwt.encode(to_encode, settings.hasher.hash_key, algorithm=settings.hasher.algorithm)
+
 
 class Hasher:
     def verify_password(plain_password, hashed_password):
-        return pwd_context.verify(plain_password, hashed_password)
+        return _verify(plain_password, hashed_password)
 
     def get_password_hash(password):
-        return pwd_context.hash(password)
+        return _hash(password)
+
+    async def verify_password_async(plain_password, hashed_password) -> bool:
+        return await _run(_verify, plain_password, hashed_password)
+
+    async def get_password_hash_async(password) -> str:
+        return await _run(_hash, password)
 
     def create_access_token(data: dict, expires_delta: timedelta | None = None):
-        to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.now(pytz.timezone('Europe/Moscow')) + timedelta(minutes=expires_delta)
-        else:
-            expire = datetime.now(pytz.timezone('Europe/Moscow')) + timedelta(minutes=settings.hasher.access_token_expire)
-        to_encode.update({"expire": expire.isoformat()})
-        encoded_jwt = jwt.encode(to_encode, settings.hasher.hash_key, algorithm=settings.hasher.algorithm)
-        return encoded_jwt
+        return _encode_token(data, expires_delta or settings.hasher.access_token_expire)
 
     def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
-        to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.now(pytz.timezone('Europe/Moscow')) + timedelta(minutes=expires_delta)
-        else:
-            expire = datetime.now(pytz.timezone('Europe/Moscow')) + timedelta(minutes=settings.hasher.refresh_token_expire)
-        to_encode.update({"expire": expire.isoformat()})
-        encoded_jwt = jwt.encode(to_encode, settings.hasher.hash_key, algorithm=settings.hasher.algorithm)
-        return encoded_jwt
+        return _encode_token(data, expires_delta or settings.hasher.refresh_token_expire)
+
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from app.config import HttpPoolConfig, settings
+
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Транспорт с ограничением числа одновременных запросов к одному хосту.
+    Нужен для устройств: один клиент ходит на сотни камер, и зависшая камера
+    не должна занимать весь пул соединений.
+    """
+
+    def __init__(self, per_host: int, **transport_kwargs):
+        self._transport = httpx.AsyncHTTPTransport(**transport_kwargs)
+        self._per_host = per_host
+        self._semaphores: Dict[Tuple[str, Optional[int]], asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = (request.url.host, request.url.port)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(key, asyncio.Semaphore(self._per_host))
+        async with semaphore:
+            response = await self._transport.handle_async_request(request)
+            # Тело вычитываем под семафором, иначе соединение освободится позже, чем слот
+            try:
+                raw = b"".join([chunk async for chunk in response.stream])
+            finally:
+                await response.aclose()
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(raw),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _build_client(config: HttpPoolConfig) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    if config.per_host:
+        transport = HostLimitedTransport(per_host=config.per_host, limits=limits, retries=config.retries)
+    else:
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=config.retries)
+    return httpx.AsyncClient(transport=transport, timeout=config.timeout)
+
+
+class HttpClients:
+    """Общие HTTP-клиенты с keep-alive; создаются и закрываются в lifespan приложения."""
+
+    def __init__(self):
+        self._cv: Optional[httpx.AsyncClient] = None
+        self._device: Optional[httpx.AsyncClient] = None
+
+    def start(self) -> None:
+        if self._cv is None:
+            self._cv = _build_client(settings.http.cv)
+        if self._device is None:
+            self._device = _build_client(settings.http.device)
+
+    async def close(self) -> None:
+        for client in (self._cv, self._device):
+            if client is not None:
+                await client.aclose()
+        self._cv = None
+        self._device = None
+
+    @property
+    def cv(self) -> httpx.AsyncClient:
+        """Клиент CV-сервиса (settings.cv.url)."""
+        if self._cv is None:
+            raise RuntimeError("HTTP clients are not started")
+        return self._cv
+
+    @property
+    def device(self) -> httpx.AsyncClient:
+        """Клиент для обращений к устройствам (/open_door, /health)."""
+        if self._device is None:
+            raise RuntimeError("HTTP clients are not started")
+        return self._device
+
+
+http_clients = HttpClients()
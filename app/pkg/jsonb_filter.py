@@ -0,0 +1,55 @@
+"""
+Структурные фильтры по JSONB-колонке в виде "путь=значение" (login=ivan,
+changes.access_level=3). Каждый фильтр превращается в условие containment
+(column @> '{"changes": {"access_level": 3}}'), которое обслуживает GIN-индекс
+jsonb_path_ops, - без разбора JSON в каждой строке таблицы.
+"""
+from typing import List, Sequence, Tuple
+
+import orjson
+from fastapi import HTTPException, status
+
+
+def _values(raw: str) -> list:
+    """
+    Варианты значения: строка как есть и, если это JSON-скаляр (3, true, null), он сам -
+    в action_data хранятся и строки, и числа. Значение в кавычках ("3") - только строка.
+    """
+    try:
+        parsed = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return [raw]
+    if isinstance(parsed, str):
+        return [parsed]
+    if isinstance(parsed, (dict, list)):
+        return [raw]
+    return [raw, parsed]
+
+
+def parse_path_filter(expr: str) -> List[dict]:
+    """Документы для @> по одному фильтру "путь=значение"; подходит любой из них."""
+    path, sep, raw = expr.partition("=")
+    keys = path.strip().split(".")
+    if not sep or not all(keys):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid data filter '{expr}', expected path=value"
+        )
+    documents = []
+    for value in _values(raw):
+        for key in reversed(keys):
+            value = {key: value}
+        documents.append(value)
+    return documents
+
+
+def containment_conditions(column: str, filters: Sequence[str], param_idx: int) -> Tuple[List[str], list]:
+    """SQL-условия (по одному на фильтр, все через AND) начиная с параметра $param_idx и их параметры."""
+    conditions, params = [], []
+    for expr in filters:
+        options = []
+        for document in parse_path_filter(expr):
+            params.append(document)  # dict -> jsonb через кодек пула
+            options.append(f"{column} @> ${param_idx + len(params) - 1}")
+        conditions.append(options[0] if len(options) == 1 else f"({' OR '.join(options)})")
+    return conditions, params
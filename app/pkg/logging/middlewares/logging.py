@@ -11,6 +11,9 @@ from starlette.responses import StreamingResponse
 
 from app.pkg.logging.logs.helpers import log_requests, log_uvicorn_access
 
+# Ответы-выгрузки (журналы в NDJSON/CSV) не собираем в память и не пишем в лог целиком
+STREAMING_MEDIA_TYPES = ('application/x-ndjson', 'text/csv')
+
 
 class LoggingMiddleware(BaseHTTPMiddleware):
     def __init__(self, *args, **kwargs):
@@ -41,6 +44,10 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         time_consumed = round(time_consumed, 3)
         time_consumed = f'{time_consumed} ms'
 
+        if response.headers.get('content-type', '').startswith(STREAMING_MEDIA_TYPES):
+            log_uvicorn_access(request=request, response=response, time_consumed=time_consumed)
+            return response
+
         res_body: bytes = b''
         async for chunk in response.body_iterator:
             res_body += chunk if isinstance(chunk, bytes) else chunk.encode()
@@ -0,0 +1,126 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Верхние границы корзин в миллисекундах: геометрическая сетка 0.1 мс .. ~2 мин с шагом 20%
+_BUCKET_BOUNDS: List[float] = [0.1 * 1.2 ** i for i in range(78)]
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек в памяти процесса с логарифмическими корзинами.
+    Перцентили оцениваются по верхней границе корзины (погрешность не более 20%).
+    Владельцы (пул БД, BatchWriter) держат ссылку на объект, поэтому сброс - на месте.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        idx = bisect.bisect_left(_BUCKET_BOUNDS, value_ms)
+        with self._lock:
+            self._counts[idx] += 1
+            self.count += 1
+            self.total += value_ms
+            if value_ms > self.max:
+                self.max = value_ms
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(_BUCKET_BOUNDS[idx], self.max) if idx < len(_BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, 3) if value is not None else None
+
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean_ms": rounded(self.total / self.count) if self.count else None,
+                "p50_ms": rounded(self.percentile(50)),
+                "p90_ms": rounded(self.percentile(90)),
+                "p95_ms": rounded(self.percentile(95)),
+                "p99_ms": rounded(self.percentile(99)),
+                "max_ms": rounded(self.max) if self.count else None,
+            }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram()
+        return histogram
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, dict]:
+        return {
+            name: histogram.snapshot()
+            for name, histogram in sorted(self._histograms.items())
+            if prefix is None or name.startswith(prefix)
+        }
+
+    def reset(self, prefix: Optional[str] = None) -> None:
+        """Обнуляет гистограммы на месте: записи в реестре и ссылки на них у владельцев остаются."""
+        for name, histogram in list(self._histograms.items()):
+            if prefix is None or name.startswith(prefix):
+                histogram.reset()
+
+
+metrics = MetricsRegistry()
+
+
+class StageTimer:
+    """
+    Замер именованных этапов обработки запроса:
+
+        timer = StageTimer("wakeup")
+        with timer.stage("cv_call"):
+            ...
+
+    Каждый этап пишется в гистограмму "<prefix>.<stage>" и в timer.timings (мс).
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, value_ms: float) -> None:
+        self.timings[name] = round(value_ms, 3)
+        metrics.histogram(f"{self.prefix}.{name}").observe(value_ms)
+
+    def finish(self) -> Dict[str, float]:
+        """Фиксирует общий этап "total" с момента создания таймера."""
+        self.record("total", (time.perf_counter() - self._started) * 1000)
+        return self.timings
@@ -0,0 +1,228 @@
+"""
+Версионные миграции схемы.
+
+Базовая схема - init.sql (версия "0000_init"), дальше по порядку имен файлы
+migrations/NNNN_<описание>.sql. Примененные версии записываются в
+public.schema_migrations, поэтому повторный запуск ничего не делает.
+
+Файл выполняется в одной транзакции, если в его первой строке нет маркера
+"-- migrate: no-transaction". С маркером (нужен для CREATE INDEX CONCURRENTLY)
+выражения выполняются по одному вне транзакции; разделитель - ";" в конце строки,
+поэтому такие файлы должны быть идемпотентными (IF NOT EXISTS) - при сбое
+посередине файл выполнится заново целиком.
+
+Маркер "-- migrate: requires-extension <имя>" (в начале файла, можно несколько) -
+миграция только для сервера, где расширение есть в pg_available_extensions
+(например, pg_trgm из contrib). Без него миграция пропускается с предупреждением
+и не записывается, поэтому применится при первом старте после установки расширения.
+
+Одновременный старт нескольких воркеров сериализуется advisory-блокировкой:
+остальные ждут, пока первый применит миграции, и находят схему актуальной.
+
+Запуск вручную:
+    python -m app.pkg.migrator            # применить новые миграции
+    python -m app.pkg.migrator --list     # показать состояние
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Tuple, Union
+
+import asyncpg
+
+from app.pkg.clock import DB_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BASELINE_FILE = ROOT_DIR / "init.sql"
+MIGRATIONS_DIR = ROOT_DIR / "migrations"
+
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+_REQUIRES_EXTENSION = re.compile(r"^--\s*migrate:\s*requires-extension\s+(\w+)", re.MULTILINE)
+LOCK_KEY = 0x6D696772  # Общий ключ advisory-блокировки для всех воркеров
+LOCK_POLL_INTERVAL = 0.5
+
+_STATEMENT_END = re.compile(r";[ \t]*(?:--[^\n]*)?$", re.MULTILINE)
+_CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE
+)
+
+
+class Migration(NamedTuple):
+    version: str
+    path: Path
+    sql: str
+    checksum: str
+    transactional: bool
+    extensions: Tuple[str, ...] = ()
+
+
+def _load(version: str, path: Path) -> Migration:
+    sql = path.read_text(encoding="utf-8")
+    return Migration(
+        version=version,
+        path=path,
+        sql=sql,
+        checksum=hashlib.sha256(sql.encode()).hexdigest(),
+        transactional=not sql.lstrip().startswith(NO_TRANSACTION_MARKER),
+        extensions=tuple(_REQUIRES_EXTENSION.findall(sql)),
+    )
+
+
+def discover() -> List[Migration]:
+    migrations = [_load("0000_init", BASELINE_FILE)]
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        migrations.append(_load(path.stem, path))
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    statements = []
+    for chunk in _STATEMENT_END.split(sql):
+        lines = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith("--")]
+        if lines:
+            statements.append("\n".join(lines))
+    return statements
+
+
+async def _ensure_table(conn: asyncpg.Connection) -> None:
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS public.schema_migrations
+        (
+            version VARCHAR(128) NOT NULL,
+            checksum VARCHAR(64) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now(),
+            duration_ms FLOAT,
+            CONSTRAINT schema_migrations_pkey PRIMARY KEY (version)
+        );
+        """
+    )
+
+
+async def _applied(conn: asyncpg.Connection) -> dict:
+    rows = await conn.fetch("SELECT version, checksum FROM public.schema_migrations;")
+    return {row["version"]: row["checksum"] for row in rows}
+
+
+async def _missing_extensions(conn: asyncpg.Connection, migration: Migration) -> List[str]:
+    if not migration.extensions:
+        return []
+    available = await conn.fetch(
+        "SELECT name FROM pg_available_extensions WHERE name = ANY($1::text[]);", list(migration.extensions)
+    )
+    found = {row["name"] for row in available}
+    return [name for name in migration.extensions if name not in found]
+
+
+async def _drop_invalid_indexes(conn: asyncpg.Connection, sql: str) -> None:
+    """
+    Прерванный CREATE INDEX CONCURRENTLY оставляет индекс в состоянии INVALID,
+    и IF NOT EXISTS его больше не перестроит - удаляем такие индексы перед повтором.
+    """
+    names = _CONCURRENT_INDEX.findall(sql)
+    if not names:
+        return
+    invalid = await conn.fetch(
+        """
+        SELECT c.relname FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = 'public' AND c.relname = ANY($1::text[]);
+        """,
+        names
+    )
+    for row in invalid:
+        logger.warning(f"Dropping invalid index {row['relname']} left by an interrupted migration")
+        await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS public."{row["relname"]}";')
+
+
+async def _apply(conn: asyncpg.Connection, migration: Migration) -> None:
+    start = time.perf_counter()
+    record = """
+        INSERT INTO public.schema_migrations (version, checksum, duration_ms)
+        VALUES ($1, $2, $3);
+    """
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record, migration.version, migration.checksum, (time.perf_counter() - start) * 1000)
+    else:
+        await _drop_invalid_indexes(conn, migration.sql)
+        for statement in split_statements(migration.sql):
+            await conn.execute(statement)
+        await conn.execute(record, migration.version, migration.checksum, (time.perf_counter() - start) * 1000)
+    logger.info(f"Migration {migration.version} applied in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+async def _lock(conn: asyncpg.Connection) -> None:
+    # Не pg_advisory_lock: ждущий в нем сеанс держит открытую транзакцию, а
+    # CREATE INDEX CONCURRENTLY у владельца блокировки ждет завершения всех транзакций - deadlock
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1);", LOCK_KEY):
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+
+async def migrate(conn: asyncpg.Connection) -> List[str]:
+    """Применяет недостающие миграции, возвращает список примененных версий."""
+    await _lock(conn)
+    try:
+        await _ensure_table(conn)
+        applied = await _applied(conn)
+        done = []
+        for migration in discover():
+            checksum = applied.get(migration.version)
+            if checksum is None:
+                missing = await _missing_extensions(conn, migration)
+                if missing:
+                    logger.warning(
+                        f"Migration {migration.version} skipped: extension {', '.join(missing)} "
+                        f"is not available on the server"
+                    )
+                    continue
+                await _apply(conn, migration)
+                done.append(migration.version)
+            elif checksum != migration.checksum:
+                logger.warning(f"Migration {migration.version} was modified after it had been applied")
+        return done
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1);", LOCK_KEY)
+
+
+async def run_migrations(pool: Union[asyncpg.Pool, "InstrumentedPool"]) -> List[str]:  # нужен только acquire()
+    async with pool.acquire() as conn:
+        return await migrate(conn)
+
+
+async def _main(args) -> int:
+    conn = await asyncpg.connect(args.dsn, server_settings={"timezone": DB_TIMEZONE})
+    try:
+        if args.list:
+            await _ensure_table(conn)
+            applied = await _applied(conn)
+            for migration in discover():
+                state = "pending"
+                if migration.version in applied:
+                    state = "applied" if applied[migration.version] == migration.checksum else "modified"
+                print(f"{migration.version:<40} {state}")
+            return 0
+        done = await migrate(conn)
+        print("Applied: " + ", ".join(done) if done else "Schema is up to date")
+        return 0
+    finally:
+        await conn.close()
+
+
+if __name__ == '__main__':
+    from app.config import settings
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=settings.db.db_dsn)
+    parser.add_argument("--list", action="store_true", help="только показать состояние миграций")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,103 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime
+from typing import Any, Generic, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+import orjson
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel, Field
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class Cursor(NamedTuple):
+    """Позиция в списке: (created_at, id) последней отданной записи."""
+    created_at: datetime
+    id: uuid.UUID
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    raw = orjson.dumps([cursor.created_at.isoformat(), str(cursor.id)])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(value: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        created_at, id_ = orjson.loads(raw)
+        return Cursor(datetime.fromisoformat(created_at), uuid.UUID(id_))
+    except (binascii.Error, ValueError, TypeError, orjson.JSONDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = Field(None, description="Передать в cursor для следующей страницы; null - страниц больше нет")
+
+
+class PageRequest:
+    """
+    Параметры страницы из query (limit, cursor). limit больше pagination.max_limit
+    не ошибка - страница просто обрезается до максимума.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, description="Размер страницы"),
+        cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы")
+    ):
+        self.limit = min(limit or settings.pagination.default_limit, settings.pagination.max_limit)
+        self.cursor = decode_cursor(cursor) if cursor else None
+
+    @classmethod
+    def first(cls, limit: Optional[int] = None) -> "PageRequest":
+        """Первая страница вне HTTP-запроса (скрипты, внутренние вызовы)."""
+        return cls(limit=limit, cursor=None)
+
+    @property
+    def fetch_limit(self) -> int:
+        # Лишняя строка показывает, есть ли следующая страница
+        return self.limit + 1
+
+
+class Keyset:
+    """
+    Keyset-пагинация по (created_at, id): вместо OFFSET условие
+    (created_at, id) < (курсор), поэтому любая страница стоит как первая
+    (при индексе, начинающемся с created_at).
+    """
+
+    def __init__(self, page: PageRequest, id_column: str, created_column: str = "created_at", descending: bool = True):
+        self.page = page
+        self.id_column = id_column
+        self.created_column = created_column
+        self.descending = descending
+
+    def condition(self, param_idx: int) -> Tuple[Optional[str], list]:
+        """SQL-условие после курсора (или None для первой страницы) и его параметры."""
+        if self.page.cursor is None:
+            return None, []
+        op = "<" if self.descending else ">"
+        return (
+            f"({self.created_column}, {self.id_column}) {op} (${param_idx}, ${param_idx + 1})",
+            [self.page.cursor.created_at, self.page.cursor.id]
+        )
+
+    @property
+    def order_by(self) -> str:
+        direction = "DESC" if self.descending else "ASC"
+        return f"ORDER BY {self.created_column} {direction}, {self.id_column} {direction}"
+
+    def build(self, items: Sequence[Any], id_attr: str) -> Page:
+        """Страница из items (выбранных с LIMIT fetch_limit) с курсором на последнюю запись."""
+        if len(items) <= self.page.limit:
+            return Page(items=list(items))
+        items = list(items[:self.page.limit])
+        last = items[-1]
+        return Page(items=items, next_cursor=encode_cursor(Cursor(last.created_at, getattr(last, id_attr))))
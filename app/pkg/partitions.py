@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+import asyncpg
+
+from app.config import PartitionConfig
+from app.db_helper import Database
+from app.pkg.clock import utcnow
+
+logger = logging.getLogger(__name__)
+
+_BOUNDS = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: Optional[datetime]  # None - MINVALUE
+    upper: Optional[datetime]  # None - MAXVALUE
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def align(ts: datetime, interval: str) -> datetime:
+    """Начало секции, в которую попадает ts."""
+    ts = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "month":
+        return ts.replace(day=1)
+    if interval == "week":
+        return ts - timedelta(days=ts.weekday())
+    return ts
+
+
+def next_boundary(ts: datetime, interval: str) -> datetime:
+    """Граница следующей секции после ts (ts может быть не выровнен)."""
+    start = align(ts, interval)
+    if interval == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    if interval == "week":
+        return start + timedelta(weeks=1)
+    return start + timedelta(days=1)
+
+
+class PartitionManager:
+    """
+    Обслуживание таблицы, секционированной RANGE по времени (запускается в lifespan).
+
+    run_once() создает секции от последней существующей до текущей + premake вперед
+    (заполняя пропуски, если приложение долго не работало) и удаляет целиком секции,
+    все строки которых старше retention_days, - без DELETE и последующего vacuum.
+    Если таблица еще не секционирована (миграция не применена), ничего не делает.
+    Воркеры не мешают друг другу: цикл выполняет тот, кто взял advisory-блокировку.
+    """
+
+    def __init__(self, database: Database, table: str, config: PartitionConfig):
+        self.database = database
+        self.table = table
+        self.config = config
+        self._lock_key = zlib.crc32(f"partitions:{table}".encode()) & 0x7FFFFFFF  # одинаковый во всех воркерах
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self.config.enabled:
+            self._task = asyncio.create_task(self._run(), name=f"partition-manager-{self.table}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.check_interval)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Partition maintenance of {self.table} failed")
+
+    async def partitions(self, conn: asyncpg.Connection) -> Optional[List[Partition]]:
+        """Секции таблицы по возрастанию границ; None, если таблица не секционирована."""
+        relkind = await conn.fetchval("SELECT relkind::text FROM pg_class WHERE oid = $1::regclass;", f"public.{self.table}")
+        if relkind != "p":
+            return None
+        rows = await conn.fetch(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = $1::regclass;
+            """,
+            f"public.{self.table}"
+        )
+        result = []
+        for row in rows:
+            match = _BOUNDS.search(row["bound"])
+            if match:  # DEFAULT-секция границ не имеет
+                result.append(Partition(row["relname"], _parse_bound(match[1]), _parse_bound(match[2])))
+        result.sort(key=lambda p: (p.lower or datetime.min))
+        return result
+
+    async def run_once(self, now: Optional[datetime] = None) -> dict:
+        """Один цикл обслуживания. Возвращает имена созданных и удаленных секций."""
+        now = now or utcnow()  # created_at - TIMESTAMP без зоны в UTC (app.pkg.clock)
+        interval = self.config.interval
+        created, dropped = [], []
+        async with self.database.pool.acquire() as conn:
+            async with conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1);", self._lock_key):
+                    return {"created": created, "dropped": dropped}
+                parts = await self.partitions(conn)
+                if parts is None:
+                    return {"created": created, "dropped": dropped}
+                # DROP/CREATE секции берут блокировку родительской таблицы - не ждем ее за долгими запросами
+                await conn.execute(f"SET LOCAL lock_timeout = '{int(self.config.lock_timeout * 1000)}ms';")
+
+                horizon = align(now, interval)
+                for _ in range(self.config.premake + 1):
+                    horizon = next_boundary(horizon, interval)
+                if not any(p.upper is None for p in parts):  # секция до MAXVALUE покрывает все будущее
+                    start = max((p.upper for p in parts), default=align(now, interval))
+                    while start < horizon:
+                        end = next_boundary(start, interval)
+                        name = f"{self.table}_p{start:%Y%m%d}"
+                        await conn.execute(
+                            f"CREATE TABLE IF NOT EXISTS public.{name} PARTITION OF public.{self.table} "
+                            f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}');"
+                        )
+                        created.append(name)
+                        start = end
+
+                if self.config.retention_days:
+                    cutoff = now - timedelta(days=self.config.retention_days)
+                    for part in parts:
+                        if part.upper is not None and part.upper <= cutoff:
+                            await conn.execute(f'DROP TABLE public."{part.name}";')
+                            dropped.append(part.name)
+
+        for name in created:
+            logger.info(f"Created partition {name}")
+        for name in dropped:
+            logger.info(f"Dropped partition {name} (older than {self.config.retention_days} days)")
+        return {"created": created, "dropped": dropped}
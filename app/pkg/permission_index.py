@@ -0,0 +1,178 @@
+import heapq
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from app.models.permission import Permission
+from app.pkg.clock import naive_utc, utcnow  # utcnow - как NOW() AT TIME ZONE 'utc' в SQL-проверке
+from app.pkg.schedule import schedule_allows
+
+
+class Grant(NamedTuple):
+    permission_id: uuid.UUID
+    user_id: uuid.UUID
+    target_type: str
+    target_id: uuid.UUID
+    valid_from: Optional[datetime]
+    valid_to: Optional[datetime]
+    schedule_bitmap: Optional[bytes] = None
+    schedule_tz: Optional[ZoneInfo] = None
+
+    @classmethod
+    def from_permission(cls, permission: Permission) -> "Grant":
+        return cls(
+            permission_id=permission.permission_id,
+            user_id=permission.user_id,
+            target_type=permission.target_type,
+            target_id=permission.target_id,
+            valid_from=naive_utc(permission.valid_from),
+            valid_to=naive_utc(permission.valid_to),
+            schedule_bitmap=permission.schedule_bitmap,
+            schedule_tz=ZoneInfo(permission.schedule["timezone"]) if permission.schedule_bitmap else None,
+        )
+
+    def is_active(self, now: datetime, ignore_schedule: bool = False) -> bool:
+        """ignore_schedule - только срок действия (видимость данных, а не проход в дверь)."""
+        return (self.valid_from is None or self.valid_from <= now) and \
+               (self.valid_to is None or self.valid_to >= now) and \
+               (ignore_schedule or self.schedule_bitmap is None or
+                schedule_allows(self.schedule_bitmap, self.schedule_tz, now))
+
+
+class PermissionIndex:
+    """
+    Скомпилированный индекс прав доступа: user_id -> (target_type, target_id) -> выданные права.
+
+    Решение о доступе - чистый поиск в памяти. Будущие права хранятся в индексе и
+    начинают действовать, когда наступает valid_from; истекшие права вычищаются
+    по куче сроков окончания (без полного пересканирования) при каждом обращении.
+    Право с расписанием действует только в отмеченные минуты недели (один бит, app.pkg.schedule).
+    """
+
+    def __init__(self):
+        self._grants: Dict[uuid.UUID, Grant] = {}
+        self._by_user: Dict[uuid.UUID, Dict[Tuple[str, uuid.UUID], Dict[uuid.UUID, Grant]]] = {}
+        self._expiry: List[Tuple[datetime, uuid.UUID]] = []
+        self._version = 0
+        self._loaded = False
+
+    @property
+    def version(self) -> int:
+        """Счетчик изменений; позволяет не затирать свежие изменения устаревшим снимком из БД."""
+        return self._version
+
+    @property
+    def loaded(self) -> bool:
+        """Индекс хотя бы раз загружен из БД (до этого в нем только изменения этого воркера)."""
+        return self._loaded
+
+    def load(self, permissions: Iterable[Permission], version: Optional[int] = None) -> bool:
+        if version is not None and version != self._version:
+            return False
+        self._grants = {}
+        self._by_user = {}
+        self._expiry = []
+        for permission in permissions:
+            self._add(Grant.from_permission(permission))
+        self._version += 1
+        self._loaded = True
+        return True
+
+    def _add(self, grant: Grant) -> None:
+        self._grants[grant.permission_id] = grant
+        targets = self._by_user.setdefault(grant.user_id, {})
+        targets.setdefault((grant.target_type, grant.target_id), {})[grant.permission_id] = grant
+        if grant.valid_to is not None:
+            heapq.heappush(self._expiry, (grant.valid_to, grant.permission_id))
+
+    def _discard(self, permission_id: uuid.UUID) -> Optional[Grant]:
+        grant = self._grants.pop(permission_id, None)
+        if not grant:
+            return None
+        targets = self._by_user.get(grant.user_id)
+        if targets is not None:
+            key = (grant.target_type, grant.target_id)
+            grants = targets.get(key)
+            if grants is not None:
+                grants.pop(permission_id, None)
+                if not grants:
+                    del targets[key]
+            if not targets:
+                del self._by_user[grant.user_id]
+        # Запись в куче сроков остается и будет пропущена при очистке
+        return grant
+
+    def put(self, permission: Permission) -> None:
+        self._discard(permission.permission_id)
+        self._add(Grant.from_permission(permission))
+        self._version += 1
+
+    def remove(self, permission_id: uuid.UUID) -> None:
+        self._discard(permission_id)
+        self._version += 1
+
+    def remove_user(self, user_id: uuid.UUID) -> None:
+        """Права пользователя удаляются каскадно вместе с ним (ON DELETE CASCADE)."""
+        for target_grants in list(self._by_user.get(user_id, {}).values()):
+            for permission_id in list(target_grants):
+                self._discard(permission_id)
+        self._version += 1
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        now = now or utcnow()
+        purged = 0
+        while self._expiry and self._expiry[0][0] < now:
+            valid_to, permission_id = heapq.heappop(self._expiry)
+            grant = self._grants.get(permission_id)
+            # Право могло быть изменено или удалено - тогда запись в куче устарела
+            if grant is not None and grant.valid_to == valid_to:
+                self._discard(permission_id)
+                purged += 1
+        return purged
+
+    def _has_active(self, targets, key, now: datetime, ignore_schedule: bool = False) -> bool:
+        grants = targets.get(key)
+        if not grants:
+            return False
+        return any(grant.is_active(now, ignore_schedule) for grant in grants.values())
+
+    def is_granted(
+        self,
+        user_id: uuid.UUID,
+        device_id: uuid.UUID,
+        zone_id: Optional[uuid.UUID] = None,
+        now: Optional[datetime] = None,
+        ignore_schedule: bool = False
+    ) -> bool:
+        """
+        Прямое право на устройство или право на зону устройства.
+        ignore_schedule=True - без учета расписания (просмотр журналов менеджером в любое время).
+        """
+        now = now or utcnow()
+        self.purge_expired(now)
+        targets = self._by_user.get(user_id)
+        if not targets:
+            return False
+        if self._has_active(targets, ('DEVICE', device_id), now, ignore_schedule):
+            return True
+        return zone_id is not None and self._has_active(targets, ('ZONE', zone_id), now, ignore_schedule)
+
+    def granted_targets(
+        self, user_id: uuid.UUID, now: Optional[datetime] = None, ignore_schedule: bool = False
+    ) -> Tuple[Set[uuid.UUID], Set[uuid.UUID]]:
+        """Устройства и зоны, на которые у пользователя сейчас есть действующее право."""
+        now = now or utcnow()
+        self.purge_expired(now)
+        devices, zones = set(), set()
+        targets = self._by_user.get(user_id, {})
+        for key in targets:
+            if self._has_active(targets, key, now, ignore_schedule):
+                (devices if key[0] == 'DEVICE' else zones).add(key[1])
+        return devices, zones
+
+    def __len__(self) -> int:
+        return len(self._grants)
+
+
+permission_index = PermissionIndex()
@@ -0,0 +1,28 @@
+import asyncpg
+import orjson
+
+# Версия бинарного формата jsonb: первый байт значения
+_JSONB_FORMAT_VERSION = b"\x01"
+
+
+def _dumps(value) -> bytes:
+    # OPT_NON_STR_KEYS: ключи-числа/UUID как в json.dumps; UUID, datetime и Enum orjson сериализует сам
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _encode_jsonb(value) -> bytes:
+    return _JSONB_FORMAT_VERSION + _dumps(value)
+
+
+def _decode_jsonb(data: bytes):
+    return orjson.loads(data[1:])
+
+
+async def register_json_codecs(conn: asyncpg.Connection) -> None:
+    """json/jsonb <-> dict/list через orjson в бинарном протоколе (без промежуточных строк)."""
+    await conn.set_type_codec(
+        "jsonb", schema="pg_catalog", encoder=_encode_jsonb, decoder=_decode_jsonb, format="binary"
+    )
+    await conn.set_type_codec(
+        "json", schema="pg_catalog", encoder=_dumps, decoder=orjson.loads, format="binary"
+    )
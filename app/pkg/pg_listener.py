@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Set
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """
+    LISTEN на канале PostgreSQL на отдельном соединении (не из пула): id измененных
+    строк из уведомлений копятся и передаются пачкой в apply(ids). Так изменения,
+    сделанные другими воркерами, доходят до состояния в памяти сразу после их COMMIT.
+
+    Уведомления, отправленные, пока соединения нет, теряются, поэтому после
+    переподключения и при ошибке apply() вызывается resync() - полная перезагрузка.
+    LISTEN не работает через pgbouncer в transaction mode - нужен прямой DSN.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        apply: Callable[[Set[str]], Awaitable[None]],
+        resync: Callable[[], Awaitable[None]],
+        reconnect_delay: float = 5.0,
+    ):
+        self.channel = channel
+        self._apply = apply
+        self._resync = resync
+        self.reconnect_delay = reconnect_delay
+        self._dsn: Optional[str] = None
+        self._conn: Optional[asyncpg.Connection] = None
+        self._pending: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.notifications = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def start(self, dsn: str) -> None:
+        """
+        Первое подключение - сразу, до загрузки состояния из БД: изменения между
+        загрузкой и LISTEN иначе были бы потеряны. Если БД недоступна, подключение
+        повторяется в фоне.
+        """
+        if self._task is not None:
+            return
+        self._dsn = dsn
+        try:
+            await self._connect()
+        except Exception:
+            logger.exception(f"LISTEN {self.channel} failed, retrying in background")
+        self._task = asyncio.create_task(self._run(), name=f"listener-{self.channel}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._disconnect()
+
+    async def _connect(self) -> None:
+        conn = await asyncpg.connect(self._dsn)
+        try:
+            conn.add_termination_listener(lambda _: self._wakeup.set())
+            await conn.add_listener(self.channel, self._on_notify)
+        except BaseException:
+            await conn.close()
+            raise
+        self._conn = conn
+
+    async def _disconnect(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+
+    def _on_notify(self, conn: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        self.notifications += 1
+        self._pending.add(payload)
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self.connected:
+                await self._disconnect()
+                await asyncio.sleep(self.reconnect_delay)
+                try:
+                    await self._connect()
+                except Exception as e:
+                    logger.warning(f"LISTEN {self.channel} reconnect failed: {e!r}")
+                    continue
+                logger.info(f"LISTEN {self.channel} reconnected, resyncing")
+                self._pending.clear()
+                await self._safe_resync()
+                continue
+            try:
+                # Таймаут - проверить соединение, даже если уведомлений нет
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.reconnect_delay)
+            except asyncio.TimeoutError:
+                continue
+            self._wakeup.clear()
+            if not self._pending:
+                continue
+            ids, self._pending = self._pending, set()
+            try:
+                await self._apply(ids)
+            except Exception:
+                logger.exception(f"Applying {len(ids)} changes from {self.channel} failed, resyncing")
+                await self._safe_resync()
+
+    async def _safe_resync(self) -> None:
+        try:
+            await self._resync()
+        except Exception:
+            logger.exception(f"Resync after {self.channel} changes failed")
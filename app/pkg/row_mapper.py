@@ -0,0 +1,99 @@
+from operator import itemgetter
+from typing import Any, Dict, Generic, Iterable, List, Mapping, Optional, Tuple, Type, TypeVar
+
+import asyncpg
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+_object_setattr = object.__setattr__
+_IMMUTABLE_DEFAULTS = (type(None), bool, int, float, str, bytes, tuple, frozenset)
+
+
+class RowMapper(Generic[M]):
+    """
+    Сборка pydantic-моделей из строк asyncpg (или любых Mapping) без повторной валидации.
+
+    Данные из БД уже имеют нужные типы (uuid, datetime, inet, jsonb -> dict), поэтому
+    модель собирается так же, как в BaseModel.model_construct, но план сборки
+    (какие колонки берем, каких полей нет и нужны ли значения по умолчанию)
+    вычисляется один раз для каждого набора колонок запроса.
+
+    Лишние колонки (z.name AS zone_name, password для UserResponse) игнорируются;
+    отсутствие обязательного поля - ValueError.
+    """
+
+    def __init__(self, model: Type[M]):
+        self.model = model
+        self._plans: Dict[Tuple[str, ...], tuple] = {}
+        # Алиасы, post_init и приватные атрибуты требуют полного пути model_construct
+        self._simple = not (
+            model.__pydantic_post_init__
+            or model.__pydantic_root_model__
+            or model.__private_attributes__
+            or model.model_config.get("extra") == "allow"
+            or any(f.alias or f.validation_alias for f in model.model_fields.values())
+        )
+
+    def _plan(self, keys: Tuple[str, ...], by_position: bool) -> tuple:
+        """(getter значений полей, имена полей, неизменяемые значения по умолчанию, поля с вычисляемым default)."""
+        plan = self._plans.get((keys, by_position))
+        if plan is None:
+            present = set(keys)
+            names, static_defaults, computed_defaults = [], {}, []
+            for name, field in self.model.model_fields.items():
+                if name in present:
+                    names.append(name)
+                elif field.is_required():
+                    raise ValueError(f"{self.model.__name__}: column '{name}' is missing in query result")
+                elif field.default_factory is None and isinstance(field.default, _IMMUTABLE_DEFAULTS):
+                    static_defaults[name] = field.default
+                else:
+                    computed_defaults.append(name)  # default_factory или изменяемый default - копия на каждую строку
+            if not names:
+                raise ValueError(f"{self.model.__name__}: no model columns in query result")
+            items =[keys.index(name) for name in names] if by_position else names
+            getter = itemgetter(*items) if len(items) > 1 else (lambda row, item=items[0]: (row[item],))
+            plan = (getter, tuple(names), static_defaults, tuple(computed_defaults))
+            self._plans[(keys, by_position)] = plan
+        return plan
+
+    def _build_many(self, rows: List[Any], plan: tuple) -> List[M]:
+        getter, names, static_defaults, computed_defaults = plan
+        fields = self.model.model_fields
+        model = self.model
+        new = model.__new__
+        result = []
+        for row in rows:
+            values = dict(zip(names, getter(row)))
+            if static_defaults:
+                values.update(static_defaults)
+            for name in computed_defaults:
+                values[name] = fields[name].get_default(call_default_factory=True)
+            obj = new(model)
+            _object_setattr(obj, "__dict__", values)
+            _object_setattr(obj, "__pydantic_fields_set__", set(names))
+            _object_setattr(obj, "__pydantic_extra__", None)
+            _object_setattr(obj, "__pydantic_private__", None)
+            result.append(obj)
+        return result
+
+    def one(self, row: Optional[Mapping[str, Any]]) -> Optional[M]:
+        if row is None:
+            return None
+        return self.many((row,))[0]
+
+    def many(self, rows: Iterable[Mapping[str, Any]]) -> List[M]:
+        if not isinstance(rows, (list, tuple)):
+            rows = list(rows)
+        if not rows:
+            return []
+        if not self._simple:
+            return [self.model.model_construct(**dict(row)) for row in rows]
+        # У asyncpg.Record доступ по индексу быстрее, чем по имени; у dict - только по ключу
+        by_position = isinstance(rows[0], asyncpg.Record)
+        return self._build_many(rows, self._plan(tuple(rows[0].keys()), by_position))
+
+    def from_model(self, obj: BaseModel) -> M:
+        """Пересборка уже проверенной модели в другую (User -> UserResponse) без валидации."""
+        return self.one(obj.__dict__)
@@ -0,0 +1,50 @@
+"""
+Компиляция недельного расписания доступа в битовую карту: по биту на минуту недели
+(7 * 1440 = 10080 бит, 1260 байт), минута 0 - понедельник 00:00 местного времени
+расписания. Карта считается один раз при записи права; проверка "действует ли сейчас" -
+чтение одного бита и в Python (PermissionIndex), и в SQL (get_bit), без разбора JSON.
+
+Порядок бит как у get_bit(bytea) в PostgreSQL: минута m - бит (m % 8) байта m // 8,
+считая от младшего.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.models.permission import WEEKDAYS, AccessSchedule
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+BITMAP_SIZE = MINUTES_PER_WEEK // 8
+
+
+def compile_schedule(schedule: AccessSchedule) -> bytes:
+    bitmap = bytearray(BITMAP_SIZE)
+    for rule in schedule.rules:
+        start = rule.start.hour * 60 + rule.start.minute
+        end = rule.end.hour * 60 + rule.end.minute
+        length = (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY  # через полночь или целые сутки
+        for day in rule.days:
+            first = WEEKDAYS.index(day) * MINUTES_PER_DAY + start
+            for minute in range(first, first + length):
+                minute %= MINUTES_PER_WEEK  # воскресенье через полночь - в понедельник
+                bitmap[minute >> 3] |= 1 << (minute & 7)
+    return bytes(bitmap)
+
+
+def schedule_columns(schedule: Optional[AccessSchedule]) -> Tuple[Optional[dict], Optional[bytes], Optional[str]]:
+    """Значения колонок schedule, schedule_bitmap, schedule_tz для записи права."""
+    if schedule is None:
+        return None, None, None
+    return schedule.model_dump(mode="json"), compile_schedule(schedule), schedule.timezone
+
+
+def minute_of_week(local: datetime) -> int:
+    # Как public.minute_of_week() в SQL (migrations/0006_permission_schedule.sql)
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def schedule_allows(bitmap: bytes, tz: ZoneInfo, now: datetime) -> bool:
+    """now - naive UTC (как PermissionIndex): переводится в пояс расписания, затем один бит."""
+    minute = minute_of_week(now.replace(tzinfo=timezone.utc).astimezone(tz))
+    return bool(bitmap[minute >> 3] >> (minute & 7) & 1)
@@ -1,50 +1,105 @@
 import uuid
+from collections import Counter
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterable, List, Optional, Sequence, Tuple
 import logging
 
 import asyncpg
-from fastapi import HTTPException, status
 
+from app.config import settings
 from app.db_session import db
-from app.models.access_log import AccessLog, AccessLogCreate
+from app.models.access_log import AccessLog, AccessLogCreate, AccessStatsRow, StatsDimension
+from app.pkg.batch_writer import BatchWriter
+from app.pkg.export import RowChunks, stream_query
+from app.pkg.pagination import Keyset, Page, PageRequest
+from app.pkg.clock import naive_utc, utcnow
+from app.pkg.partitions import PartitionManager
+from app.pkg.row_mapper import RowMapper
 
 logger = logging.getLogger(__name__)
 
+access_log_mapper = RowMapper(AccessLog)
+stats_mapper = RowMapper(AccessStatsRow)
+
+ACCESS_LOG_COLUMNS = [
+    'user_id', 'device_id', 'biometry_id', 'event_type', 'confidence',
+    'path_to_photo', 'access_granted', 'created_at'
+]
+
 
 class AccessLogRepo:
     @staticmethod
-    async def create(log_data: AccessLogCreate) -> AccessLog:
-        q = """
-            INSERT INTO public.access_log (
-                user_id, device_id, biometry_id, event_type, confidence, path_to_photo, access_granted, created_at
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
-            RETURNING access_log_id, user_id, device_id, biometry_id, event_type, confidence, path_to_photo, access_granted, created_at;
-        """
-        try:
-            row = await db.pool.fetchrow(
-                q, log_data.user_id, log_data.device_id, log_data.biometry_id,
-                log_data.event_type, log_data.confidence, log_data.path_to_photo, log_data.access_granted
-            )
-            if not row:
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create access log entry")
-            return AccessLog.model_validate(row)
-        except asyncpg.ForeignKeyViolationError as e:
-            logger.error(f"AccessLog creation FK violation: {e}")
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid foreign key in access log data: {str(e).splitlines()[-1]}")
-        except Exception as e:
-            logger.exception("Error creating access log in DB")
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {str(e)}")
+    async def enqueue(log_data: AccessLogCreate) -> None:
+        """Ставит событие в очередь на пакетную запись (не ждет INSERT)."""
+        # Время события - в момент постановки в очередь, а не записи пачки (UTC, как NOW() сеанса)
+        log_data.created_at = naive_utc(log_data.created_at) or utcnow()
+        await access_log_writer.put(log_data)
 
     @staticmethod
-    async def select_logs(
-        device_id: Optional[uuid.UUID] = None,
-        user_id_param: Optional[uuid.UUID] = None,  # Изменено имя параметра
-        limit: int = 100,
-        offset: int = 0,
-        start_time: Optional[datetime] = None,
-        end_time: Optional[datetime] = None,
-    ) -> List[AccessLog]:
+    async def create_many(entries: List[AccessLogCreate]) -> None:
+        """Пакетная запись событий через COPY; при ошибке пакета - построчно, чтобы не терять корректные записи."""
+        records = [
+            (
+                e.user_id, e.device_id, e.biometry_id, e.event_type, e.confidence,
+                e.path_to_photo, e.access_granted, naive_utc(e.created_at) or utcnow()
+            ) for e in entries
+        ]
+        async with db.pool.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    await conn.copy_records_to_table(
+                        'access_log', schema_name='public', columns=ACCESS_LOG_COLUMNS, records=records
+                    )
+                    await AccessLogRepo._add_to_rollup(conn, records)
+                return
+            except asyncpg.PostgresError as e:
+                logger.warning(f"Access log batch of {len(records)} failed ({e}), retrying row by row")
+
+            q = f"""
+                INSERT INTO public.access_log ({', '.join(ACCESS_LOG_COLUMNS)})
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8);
+            """
+            for record in records:
+                # Строка и ее счетчик в access_log_hourly - в одной транзакции, чтобы агрегаты не расходились с журналом
+                try:
+                    async with conn.transaction():
+                        await conn.execute(q, *record)
+                        await AccessLogRepo._add_to_rollup(conn, [record])
+                except asyncpg.PostgresError as e:
+                    logger.error(f"Dropping access log entry for device {record[1]}: {e}")
+
+    @staticmethod
+    async def _add_to_rollup(conn: asyncpg.Connection, records: Iterable[Sequence]) -> None:
+        """Прибавляет события пачки к почасовым счетчикам public.access_log_hourly."""
+        counts = Counter(
+            (r[1], r[7].replace(minute=0, second=0, microsecond=0), r[3], bool(r[6]))
+            for r in records  # device_id, час created_at, event_type, access_granted
+        )
+        # Одинаковый порядок ключей во всех воркерах - иначе встречные upsert'ы одних строк дают deadlock
+        keys = sorted(counts)
+        await conn.execute(
+            """
+            INSERT INTO public.access_log_hourly AS h (device_id, hour, event_type, access_granted, count)
+            SELECT * FROM unnest($1::uuid[], $2::timestamp[], $3::varchar[], $4::bool[], $5::bigint[])
+            ON CONFLICT (device_id, hour, event_type, access_granted)
+            DO UPDATE SET count = h.count + EXCLUDED.count;
+            """,
+            [k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys], [k[3] for k in keys],
+            [counts[k] for k in keys]
+        )
+
+    @staticmethod
+    def _filters(
+        device_id: Optional[uuid.UUID],
+        user_id_param: Optional[uuid.UUID],
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        device_ids: Optional[Sequence[uuid.UUID]] = None,
+    ) -> Tuple[List[str], list]:
+        """
+        Условия WHERE ($1, $2, ...) и их параметры - общие для select_logs и export_logs.
+        device_ids - набор допустимых устройств (просмотр менеджером); пустой - ни одной записи.
+        """
         conditions = []
         params = []
 
@@ -53,28 +108,134 @@ class AccessLogRepo:
             conditions.append(f"device_id = ${current_param_idx}")
             params.append(device_id)
             current_param_idx += 1
+        if device_ids is not None:
+            # Индекс (device_id, created_at) в каждой секции
+            conditions.append(f"device_id = ANY(${current_param_idx}::uuid[])")
+            params.append(list(device_ids))
+            current_param_idx += 1
         if user_id_param:
             conditions.append(f"user_id = ${current_param_idx}")
             params.append(user_id_param)
             current_param_idx += 1
+        # Условия на created_at (ключ секционирования) отсекают секции вне периода
         if start_time:
             conditions.append(f"created_at >= ${current_param_idx}")
-            params.append(start_time)
+            params.append(naive_utc(start_time))
             current_param_idx += 1
         if end_time:
             conditions.append(f"created_at <= ${current_param_idx}")
-            params.append(end_time)
+            params.append(naive_utc(end_time))
             current_param_idx += 1
+        return conditions, params
+
+    @staticmethod
+    async def select_logs(
+        device_id: Optional[uuid.UUID] = None,
+        user_id_param: Optional[uuid.UUID] = None,  # Изменено имя параметра
+        page: Optional[PageRequest] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        use_primary: bool = False,
+        device_ids: Optional[Sequence[uuid.UUID]] = None,
+    ) -> Page[AccessLog]:
+        keyset = Keyset(page or PageRequest.first(), id_column="access_log_id")
+        conditions, params = AccessLogRepo._filters(device_id, user_id_param, start_time, end_time, device_ids)
+        current_param_idx = len(params) + 1
+        after_cursor, cursor_params = keyset.condition(current_param_idx)
+        if after_cursor:
+            conditions.append(after_cursor)
+            params.extend(cursor_params)
+            current_param_idx += len(cursor_params)
 
         where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
         q = f"""
             SELECT * FROM public.access_log
             {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ${current_param_idx} OFFSET ${current_param_idx + 1};
+            {keyset.order_by}
+            LIMIT ${current_param_idx};
         """
-        params.extend([limit, offset])
+        params.append(keyset.page.fetch_limit)
+
+        rows = await db.reader(use_primary).fetch(q, *params)
+        return keyset.build(access_log_mapper.many(rows), id_attr="access_log_id")
+
+    @staticmethod
+    async def select_stats(
+        start_time: datetime,
+        end_time: datetime,
+        group_by: Sequence[StatsDimension],
+        device_id: Optional[uuid.UUID] = None,
+        zone_id: Optional[uuid.UUID] = None,
+        use_primary: bool = False,
+        device_ids: Optional[Sequence[uuid.UUID]] = None,
+    ) -> List[AccessStatsRow]:
+        """
+        Агрегаты granted/denied/total за период из access_log_hourly (без чтения access_log).
+        Границы берутся с точностью до часа: [час start_time, end_time).
+        """
+        dimensions = {
+            "device": "h.device_id AS device_id",
+            "zone": "d.zone_id AS zone_id",
+            "hour": "h.hour AS period",
+            "day": "date_trunc('day', h.hour) AS period",
+            "event_type": "h.event_type AS event_type",
+        }
+        columns = [dimensions[name] for name in dict.fromkeys(group_by)]
+        conditions = ["h.hour >= date_trunc('hour', $1::timestamp)", "h.hour < $2"]
+        params: list = [naive_utc(start_time), naive_utc(end_time)]
+        if device_id:
+            params.append(device_id)
+            conditions.append(f"h.device_id = ${len(params)}")
+        if zone_id:
+            params.append(zone_id)
+            conditions.append(f"d.zone_id = ${len(params)}")
+        if device_ids is not None:
+            params.append(list(device_ids))
+            conditions.append(f"h.device_id = ANY(${len(params)}::uuid[])")
+        join = "LEFT JOIN public.device d ON d.device_id = h.device_id" if "zone" in group_by or zone_id else ""
+        group_clause = f"GROUP BY {', '.join(str(i + 1) for i in range(len(columns)))}" if columns else ""
+        order_clause = f"ORDER BY {', '.join(str(i + 1) for i in range(len(columns)))}" if columns else ""
+        q = f"""
+            SELECT {''.join(c + ', ' for c in columns)}
+                   COALESCE(sum(h.count) FILTER (WHERE h.access_granted), 0)::bigint AS granted,
+                   COALESCE(sum(h.count) FILTER (WHERE NOT h.access_granted), 0)::bigint AS denied,
+                   COALESCE(sum(h.count), 0)::bigint AS total
+            FROM public.access_log_hourly h
+            {join}
+            WHERE {' AND '.join(conditions)}
+            {group_clause}
+            {order_clause};
+        """
+        rows = await db.reader(use_primary).fetch(q, *params)
+        return stats_mapper.many(rows)
+
+    @staticmethod
+    def export_logs(
+        device_id: Optional[uuid.UUID] = None,
+        user_id_param: Optional[uuid.UUID] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        device_ids: Optional[Sequence[uuid.UUID]] = None,
+    ) -> RowChunks:
+        """Все записи по фильтрам пачками (серверный курсор, от старых к новым) - для выгрузки."""
+        conditions, params = AccessLogRepo._filters(device_id, user_id_param, start_time, end_time, device_ids)
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        q = f"""
+            SELECT * FROM public.access_log
+            {where_clause}
+            ORDER BY created_at;
+        """
+        return stream_query(db.reader(), q, params, settings.export.chunk_size)
+
+
+access_log_writer = BatchWriter(
+    name="access_log",
+    flush=AccessLogRepo.create_many,
+    max_queue=settings.access_log_writer.max_queue,
+    batch_size=settings.access_log_writer.batch_size,
+    flush_interval=settings.access_log_writer.flush_interval,
+)
 
-        rows = await db.pool.fetch(q, *params)
-        return [AccessLog.model_validate(row) for row in rows]
+# Секции access_log по created_at: создание заранее и удаление по сроку хранения
+access_log_partitions = PartitionManager(db, "access_log", settings.access_log_partitions)
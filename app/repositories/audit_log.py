@@ -1,58 +1,107 @@
 import uuid
 from datetime import datetime
-from typing import List, Optional, Any, Dict
-import json
+from typing import List, Optional, Any, Dict, Sequence, Tuple
 import logging
 
 import asyncpg
-from fastapi import HTTPException, status
 
+from app.config import settings
 from app.db_session import db
 from app.models.audit_log import AuditLog, AuditLogCreate
+from app.pkg.batch_writer import BatchWriter
+from app.pkg.export import RowChunks, stream_query
+from app.pkg.jsonb_filter import containment_conditions
+from app.pkg.pagination import Keyset, Page, PageRequest
+from app.pkg.clock import naive_utc, utcnow
+from app.pkg.row_mapper import RowMapper
 
 logger = logging.getLogger(__name__)
 
+audit_log_mapper = RowMapper(AuditLog)
+
+
+AUDIT_BUFFER = "audit_log"
+
 
 class AuditLogRepo:
     @staticmethod
-    async def create(log_data: AuditLogCreate) -> AuditLog:
+    async def record(log_data: AuditLogCreate) -> None:
+        """
+        Запись аудита по settings.audit_log.durability, без RETURNING и сборки модели.
+
+        strict: внутри единицы работы (db.transaction) записи копятся в ней и пишутся
+        одним INSERT перед COMMIT - ошибка откатывает изменение; вне ее - сразу.
+        async: после COMMIT (или сразу вне транзакции) - в очередь audit_log_writer.
+        """
+        log_data.created_at = naive_utc(log_data.created_at) or utcnow()
+        if settings.audit_log.durability == "async" and audit_log_writer.running:
+            db.after_commit(lambda: audit_log_writer.offer(log_data))
+            return
+        unit = db.current_unit()
+        if unit is None:
+            await AuditLogRepo.create_many([log_data])
+            return
+        buffer = unit.pending.get(AUDIT_BUFFER)
+        if buffer is None:
+            buffer = unit.pending[AUDIT_BUFFER] = []
+            unit.before_commit.append(lambda: AuditLogRepo._flush_buffer(buffer))
+        buffer.append(log_data)
+        if len(buffer) >= settings.audit_log.batch_size:  # Большие пакетные операции не копят все в памяти
+            await AuditLogRepo._flush_buffer(buffer)
+
+    @staticmethod
+    async def _flush_buffer(buffer: List[AuditLogCreate]) -> None:
+        if buffer:
+            await AuditLogRepo.create_many(buffer)
+            buffer.clear()
+
+    @staticmethod
+    async def create_many(entries: List[AuditLogCreate]) -> None:
+        """Одним INSERT ... SELECT FROM unnest(...) - один round trip на пакет."""
         q = """
             INSERT INTO public.audit_log (user_id, action, entity_type, entity_id, action_data, created_at)
-            VALUES ($1, $2, $3, $4, $5, NOW())
-            RETURNING audit_log_id, user_id, action, entity_type, entity_id, action_data, created_at;
+            SELECT * FROM unnest($1::uuid[], $2::varchar[], $3::varchar[], $4::uuid[], $5::jsonb[], $6::timestamp[]);
         """
-        action_data_json = json.dumps(log_data.action_data) if log_data.action_data is not None else None
-        try:
-            row = await db.pool.fetchrow(
-                q, log_data.user_id, log_data.action, log_data.entity_type,
-                log_data.entity_id, action_data_json
+        async with db.connection() as conn:
+            await conn.execute(
+                q,
+                [e.user_id for e in entries],
+                [e.action for e in entries],
+                [e.entity_type for e in entries],
+                [e.entity_id for e in entries],
+                [e.action_data for e in entries],
+                [naive_utc(e.created_at) or utcnow() for e in entries],
             )
-            if not row:
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create audit log entry")
-
-            # asyncpg должен десериализовать JSONB в dict
-            validated_row = dict(row)
-            if isinstance(validated_row.get('action_data'), str):  # На всякий случай
-                validated_row['action_data'] = json.loads(validated_row['action_data'])
-            return AuditLog.model_validate(validated_row)
-        except asyncpg.ForeignKeyViolationError as e:
-            logger.error(f"AuditLog creation FK violation for user_id {log_data.user_id}: {e}")
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid user_id in audit log data: {str(e).splitlines()[-1]}")
-        except Exception as e:
-            logger.exception(f"Error creating audit log for user {log_data.user_id}, action {log_data.action}")
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {str(e)}")
 
     @staticmethod
-    async def select_logs(
-        user_id_filter: Optional[uuid.UUID] = None,
-        entity_type_filter: Optional[str] = None,
-        entity_id_filter: Optional[uuid.UUID] = None,
-        action_filter: Optional[str] = None,
-        limit: int = 100,
-        offset: int = 0,
-        start_time: Optional[datetime] = None,
-        end_time: Optional[datetime] = None,
-    ) -> List[AuditLog]:
+    async def write_batch(entries: List[AuditLogCreate]) -> None:
+        """Сброс очереди audit_log_writer; при ошибке пакета - построчно, чтобы не терять корректные записи."""
+        try:
+            await AuditLogRepo.create_many(entries)
+            return
+        except asyncpg.PostgresError as e:
+            logger.warning(f"Audit log batch of {len(entries)} failed ({e}), retrying row by row")
+        for entry in entries:
+            try:
+                await AuditLogRepo.create_many([entry])
+            except asyncpg.PostgresError as e:
+                logger.error(f"Dropping audit log entry {entry.action} by user {entry.user_id}: {e}")
+
+    @staticmethod
+    def _filters(
+        user_id_filter: Optional[uuid.UUID],
+        entity_type_filter: Optional[str],
+        entity_id_filter: Optional[uuid.UUID],
+        action_filter: Optional[str],
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        data_filters: Sequence[str] = (),
+    ) -> Tuple[List[str], list]:
+        """
+        Условия WHERE ($1, $2, ...) и их параметры - общие для select_logs и export_logs.
+        action ищется по подстроке через триграммный индекс, data_filters ("путь=значение")
+        - через GIN-индекс по action_data (migrations/0005_audit_log_search.sql).
+        """
         conditions = []
         params = []
         idx = 1
@@ -75,27 +124,81 @@ class AuditLogRepo:
             idx += 1
         if start_time:
             conditions.append(f"created_at >= ${idx}")
-            params.append(start_time)
+            params.append(naive_utc(start_time))
             idx += 1
         if end_time:
             conditions.append(f"created_at <= ${idx}")
-            params.append(end_time)
+            params.append(naive_utc(end_time))
             idx += 1
+        if data_filters:
+            data_conditions, data_params = containment_conditions("action_data", data_filters, idx)
+            conditions.extend(data_conditions)
+            params.extend(data_params)
+        return conditions, params
+
+    @staticmethod
+    async def select_logs(
+        user_id_filter: Optional[uuid.UUID] = None,
+        entity_type_filter: Optional[str] = None,
+        entity_id_filter: Optional[uuid.UUID] = None,
+        action_filter: Optional[str] = None,
+        page: Optional[PageRequest] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        data_filters: Sequence[str] = (),
+        use_primary: bool = False,
+    ) -> Page[AuditLog]:
+        keyset = Keyset(page or PageRequest.first(), id_column="audit_log_id")
+        conditions, params = AuditLogRepo._filters(
+            user_id_filter, entity_type_filter, entity_id_filter, action_filter, start_time, end_time, data_filters
+        )
+        idx = len(params) + 1
+        after_cursor, cursor_params = keyset.condition(idx)
+        if after_cursor:
+            conditions.append(after_cursor)
+            params.extend(cursor_params)
+            idx += len(cursor_params)
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        q = f"""
+            SELECT * FROM public.audit_log
+            {where_clause}
+            {keyset.order_by}
+            LIMIT ${idx};
+        """
+        params.append(keyset.page.fetch_limit)
+
+        rows = await db.reader(use_primary).fetch(q, *params)
+        return keyset.build(audit_log_mapper.many(rows), id_attr="audit_log_id")
 
+    @staticmethod
+    def export_logs(
+        user_id_filter: Optional[uuid.UUID] = None,
+        entity_type_filter: Optional[str] = None,
+        entity_id_filter: Optional[uuid.UUID] = None,
+        action_filter: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        data_filters: Sequence[str] = (),
+    ) -> RowChunks:
+        """Все записи по фильтрам пачками (серверный курсор, от старых к новым) - для выгрузки."""
+        conditions, params = AuditLogRepo._filters(
+            user_id_filter, entity_type_filter, entity_id_filter, action_filter, start_time, end_time, data_filters
+        )
         where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
         q = f"""
             SELECT * FROM public.audit_log
             {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ${idx} OFFSET ${idx + 1};
+            ORDER BY created_at;
         """
-        params.extend([limit, offset])
-
-        rows = await db.pool.fetch(q, *params)
-        logs = []
-        for row_data in rows:
-            validated_row = dict(row_data)
-            if isinstance(validated_row.get('action_data'), str):
-                validated_row['action_data'] = json.loads(validated_row['action_data'])
-            logs.append(AuditLog.model_validate(validated_row))
-        return logs
+        return stream_query(db.reader(), q, params, settings.export.chunk_size)
+
+
+# Очередь аудита для settings.audit_log.durability = "async"
+audit_log_writer = BatchWriter(
+    name="audit_log",
+    flush=AuditLogRepo.write_batch,
+    max_queue=settings.audit_log.max_queue,
+    batch_size=settings.audit_log.batch_size,
+    flush_interval=settings.audit_log.flush_interval,
+)
@@ -8,6 +8,7 @@ from fastapi import HTTPException, status
 from app.db_session import db
 from app.models.biometry import BiometryDB
 from app.models.user import AccessLevel, User
+from app.repositories.user import user_mapper
 
 
 class BiometryRepo:
@@ -18,7 +19,7 @@ class BiometryRepo:
         iv: bytes,
         secure_hash: bytes
     ) -> BiometryDB:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 INSERT INTO public.biometry (
                     user_id, encrypted_embedding, iv, secure_hash
@@ -61,7 +62,7 @@ class BiometryRepo:
 
     @staticmethod
     async def get_biometry(biometry_id: uuid.UUID) -> BiometryDB:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 SELECT * FROM public.biometry
                 WHERE biometry_id = $1;
@@ -83,7 +84,7 @@ class BiometryRepo:
 
     @staticmethod
     async def get_biometry_by_user(user_id: uuid.UUID) -> Optional[BiometryDB]:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 SELECT * FROM public.biometry
                 WHERE user_id = $1;
@@ -110,7 +111,7 @@ class BiometryRepo:
         iv: bytes,
         secure_hash: bytes
     ) -> BiometryDB:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 UPDATE public.biometry
                 SET
@@ -144,7 +145,7 @@ class BiometryRepo:
 
     @staticmethod
     async def delete_biometry(biometry_id: uuid.UUID) -> bool:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             try:
                 result = await conn.execute(
                     "DELETE FROM public.biometry WHERE biometry_id = $1 RETURNING 1;",
@@ -159,7 +160,7 @@ class BiometryRepo:
 
     @staticmethod
     async def get_user(user_id: uuid.UUID) -> User:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 SELECT * FROM public.user
                 WHERE user_id = $1;
@@ -170,19 +171,7 @@ class BiometryRepo:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="User not found"
                 )
-            return User(
-                user_id=user['user_id'],
-                login=user['login'],
-                password=user['password'],
-                full_name=user['full_name'],
-                phone=user['phone'],
-                access_level=user['access_level'],
-                employee_id=user['employee_id'],
-                department=user['department'],
-                is_active=user['is_active'],
-                created_at=user['created_at'],
-                updated_at=user['updated_at']
-            )
+            return user_mapper.one(user)
 
     @staticmethod
     async def min_user_access_level(user: User):
@@ -1,6 +1,5 @@
 import uuid
-from datetime import datetime
-from typing import List
+from typing import Iterable, List, Sequence, Set, Tuple
 
 import asyncpg
 from fastapi import HTTPException, status
@@ -8,12 +7,17 @@ from fastapi import HTTPException, status
 from app.db_session import db
 from app.models.device import Device, DeviceCreate, DeviceUpdate
 from app.models.user import AccessLevel, User
+from app.pkg.clock import utcnow
+from app.pkg.pagination import Keyset, Page, PageRequest
+from app.pkg.row_mapper import RowMapper
+
+device_mapper = RowMapper(Device)
 
 
 class DeviceRepo:
     @staticmethod
     async def create_device(device_data: DeviceCreate) -> uuid.UUID:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 INSERT INTO public.device (
                     name, ip, port, zone_id,
@@ -44,9 +48,45 @@ class DeviceRepo:
                     detail=f"Database error: {e}"
                 )
 
+    @staticmethod
+    async def create_devices(devices: Sequence[Tuple[uuid.UUID, DeviceCreate]]) -> List[Device]:
+        """
+        Вставка пачки устройств одним INSERT ... SELECT FROM unnest. device_id задает
+        вызывающий, чтобы сопоставить созданные записи со строками загрузки.
+        """
+        query = """
+            INSERT INTO public.device (
+                device_id, name, ip, port, zone_id,
+                location_description, is_online
+            )
+            SELECT t.*, FALSE
+            FROM unnest($1::uuid[], $2::varchar[], $3::inet[], $4::int[], $5::uuid[], $6::varchar[]) AS t
+            RETURNING *;
+        """
+        async with db.connection() as conn:
+            rows = await conn.fetch(
+                query,
+                [device_id for device_id, _ in devices],
+                [data.name for _, data in devices],
+                [data.ip for _, data in devices],
+                [data.port for _, data in devices],
+                [data.zone_id for _, data in devices],
+                [data.location_description for _, data in devices]
+            )
+        return device_mapper.many(rows)
+
+    @staticmethod
+    async def select_existing_ids(device_ids: Iterable[uuid.UUID]) -> Set[uuid.UUID]:
+        """Какие из device_ids существуют - одним запросом на всю пачку."""
+        async with db.connection() as conn:
+            rows = await conn.fetch(
+                "SELECT device_id FROM public.device WHERE device_id = ANY($1::uuid[]);", list(device_ids)
+            )
+        return {row["device_id"] for row in rows}
+
     @staticmethod
     async def select_device(device_id: uuid.UUID) -> Device:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 SELECT * FROM public.device
                 WHERE device_id = $1;
@@ -57,22 +97,11 @@ class DeviceRepo:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Device not found"
                 )
-            return Device(
-                device_id=device['device_id'],
-                name=device['name'],
-                ip=device['ip'],
-                port=device['port'],
-                zone_id=device['zone_id'],
-                location_description=device['location_description'],
-                is_online=device['is_online'],
-                last_heartbeat=device['last_heartbeat'],
-                created_at=device['created_at'],
-                updated_at=device['updated_at']
-            )
+            return device_mapper.one(device)
 
     @staticmethod
     async def select_device_by_ip_port(ip_config: dict) -> Device:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 SELECT * FROM public.device
                 WHERE ip = $1 AND port = $2;
@@ -83,46 +112,39 @@ class DeviceRepo:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Device not found"
                 )
-            return Device(
-                device_id=device['device_id'],
-                name=device['name'],
-                ip=device['ip'],
-                port=device['port'],
-                zone_id=device['zone_id'],
-                location_description=device['location_description'],
-                is_online=device['is_online'],
-                last_heartbeat=device['last_heartbeat'],
-                created_at=device['created_at'],
-                updated_at=device['updated_at']
-            )
+            return device_mapper.one(device)
 
     @staticmethod
-    async def select_devices() -> List[Device]:
-        async with db.pool.acquire() as conn:
+    async def select_devices(use_primary: bool = False) -> List[Device]:
+        async with db.reader(use_primary).acquire() as conn:
             query = """
                 SELECT d.*, z.name as zone_name
                 FROM public.device d
                 LEFT JOIN public.zone z ON d.zone_id = z.zone_id;
             """
             devices = await conn.fetch(query)
-            return [
-                Device(
-                    device_id=device['device_id'],
-                    name=device['name'],
-                    ip=device['ip'],
-                    port=device['port'],
-                    zone_id=device['zone_id'],
-                    location_description=device['location_description'],
-                    is_online=device['is_online'],
-                    last_heartbeat=device['last_heartbeat'],
-                    created_at=device['created_at'],
-                    updated_at=device['updated_at']
-                ) for device in devices
-            ]
+            return device_mapper.many(devices)
+
+    @staticmethod
+    async def select_devices_page(page: PageRequest, use_primary: bool = False) -> Page[Device]:
+        """Страница списка устройств для API; select_devices - полный список для реестра и мониторинга."""
+        keyset = Keyset(page, id_column="d.device_id", created_column="d.created_at", descending=False)
+        after_cursor, cursor_params = keyset.condition(1)
+        async with db.reader(use_primary).acquire() as conn:
+            query = f"""
+                SELECT d.*, z.name as zone_name
+                FROM public.device d
+                LEFT JOIN public.zone z ON d.zone_id = z.zone_id
+                {f"WHERE {after_cursor}" if after_cursor else ""}
+                {keyset.order_by}
+                LIMIT ${1 + len(cursor_params)};
+            """
+            devices = await conn.fetch(query, *cursor_params, page.fetch_limit)
+            return keyset.build(device_mapper.many(devices), id_attr="device_id")
 
     @staticmethod
     async def update_device(device_data: DeviceUpdate) -> Device:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             updates = []
             params = []
 
@@ -132,7 +154,7 @@ class DeviceRepo:
                 'port': device_data.port,
                 'zone_id': device_data.zone_id,
                 'location_description': device_data.location_description,
-                'updated_at': datetime.now()
+                'updated_at': utcnow()
             }
 
             for field, value in fields_to_update.items():
@@ -155,18 +177,7 @@ class DeviceRepo:
 
             try:
                 updated_device = await conn.fetchrow(query, device_data.device_id, *params)
-                return Device(
-                    device_id=updated_device['device_id'],
-                    name=updated_device['name'],
-                    ip=updated_device['ip'],
-                    port=updated_device['port'],
-                    zone_id=updated_device['zone_id'],
-                    location_description=updated_device['location_description'],
-                    is_online=updated_device['is_online'],
-                    last_heartbeat=updated_device['last_heartbeat'],
-                    created_at=updated_device['created_at'],
-                    updated_at=updated_device['updated_at']
-                )
+                return device_mapper.one(updated_device)
             except asyncpg.ForeignKeyViolationError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -180,7 +191,7 @@ class DeviceRepo:
 
     @staticmethod
     async def update_device_status(device_id: uuid.UUID, is_online: bool) -> None:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             await conn.execute(
                 """
                 UPDATE public.device
@@ -193,9 +204,26 @@ class DeviceRepo:
                 device_id
             )
 
+    @staticmethod
+    async def update_devices_status(statuses: List[Tuple[uuid.UUID, bool]]) -> None:
+        """Записывает статусы нескольких устройств одним UPDATE."""
+        async with db.connection() as conn:
+            await conn.execute(
+                """
+                UPDATE public.device AS d
+                SET
+                    is_online = s.is_online,
+                    last_heartbeat = CASE WHEN s.is_online THEN NOW() ELSE d.last_heartbeat END
+                FROM unnest($1::uuid[], $2::bool[]) AS s(device_id, is_online)
+                WHERE d.device_id = s.device_id;
+                """,
+                [device_id for device_id, _ in statuses],
+                [is_online for _, is_online in statuses]
+            )
+
     @staticmethod
     async def delete_device(device_id: uuid.UUID) -> bool:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             try:
                 result = await conn.execute(
                     "DELETE FROM public.device WHERE device_id = $1 RETURNING 1;",
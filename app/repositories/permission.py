@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
 import asyncpg
 from fastapi import HTTPException, status
@@ -8,59 +8,167 @@ import logging  # Для логирования ошибок
 
 from app.db_session import db
 from app.models.permission import Permission, PermissionCreate, PermissionUpdate
+from app.pkg.pagination import Keyset, Page, PageRequest
+from app.pkg.clock import naive_utc
+from app.pkg.schedule import schedule_columns
+from app.pkg.row_mapper import RowMapper
 
 logger = logging.getLogger(__name__)
 
+permission_mapper = RowMapper(Permission)
+
 
 class PermissionRepo:
     @staticmethod
     async def create(data: PermissionCreate, assigned_by_user_id: uuid.UUID) -> Permission:
         q = """
-            INSERT INTO public.permission (user_id, target_type, target_id, assigned_by, valid_from, valid_to, created_at, updated_at)
-            VALUES ($1, $2, $3, $4, $5, $6, NOW(), NOW())
-            RETURNING permission_id, user_id, target_type, target_id, assigned_by, valid_from, valid_to, created_at, updated_at;
+            INSERT INTO public.permission (
+                user_id, target_type, target_id, assigned_by, valid_from, valid_to,
+                schedule, schedule_bitmap, schedule_tz, created_at, updated_at
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, NOW(), NOW())
+            RETURNING permission_id, user_id, target_type, target_id, assigned_by, valid_from, valid_to,
+                      schedule, schedule_bitmap, created_at, updated_at;
+        """
+        async with db.connection() as conn:
+            try:
+                row = await conn.fetchrow(
+                    q, data.user_id, data.target_type, data.target_id,
+                    assigned_by_user_id, naive_utc(data.valid_from), naive_utc(data.valid_to),
+                    *schedule_columns(data.schedule)
+                )
+                if not row:
+                    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create permission")
+                return permission_mapper.one(row)
+            except asyncpg.ForeignKeyViolationError as e:
+                logger.error(f"Permission creation FK violation: {e}")
+                if "fk_user" in str(e).lower() and "user_id" in str(e).lower():  # Проверяем user_id
+                    detail = f"User with id {data.user_id} not found."
+                elif "fk_assigner" in str(e).lower():
+                    detail = f"Assigner user with id {assigned_by_user_id} not found."
+                else:  # Ошибка с target_id (fk на device или zone неявно) или другой FK
+                    detail = "Invalid user_id, target_id (device/zone), or assigner_id."
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+            except asyncpg.UniqueViolationError as e:
+                logger.warning(f"Permission creation unique violation: {e}")
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This permission (user-target combination) may already exist.")
+            except Exception as e:
+                logger.exception("Error creating permission in DB")
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {str(e)}")
+
+    @staticmethod
+    async def create_many(
+        items: Sequence[Tuple[uuid.UUID, PermissionCreate]], assigned_by_user_id: uuid.UUID
+    ) -> List[Permission]:
+        """
+        Вставка пачки прав одним INSERT ... SELECT FROM unnest. permission_id задает
+        вызывающий, чтобы сопоставить созданные права со строками загрузки.
+        """
+        q = """
+            INSERT INTO public.permission (
+                permission_id, user_id, target_type, target_id, valid_from, valid_to,
+                schedule, schedule_bitmap, schedule_tz, assigned_by, created_at, updated_at
+            )
+            SELECT t.*, $10::uuid, NOW(), NOW()
+            FROM unnest(
+                $1::uuid[], $2::uuid[], $3::varchar[], $4::uuid[], $5::timestamp[], $6::timestamp[],
+                $7::jsonb[], $8::bytea[], $9::varchar[]
+            ) AS t
+            RETURNING permission_id, user_id, target_type, target_id, assigned_by, valid_from, valid_to,
+                      schedule, schedule_bitmap, created_at, updated_at;
         """
-        try:
-            row = await db.pool.fetchrow(
-                q, data.user_id, data.target_type, data.target_id,
-                assigned_by_user_id, data.valid_from, data.valid_to
+        schedules = [schedule_columns(data.schedule) for _, data in items]
+        async with db.connection() as conn:
+            rows = await conn.fetch(
+                q,
+                [permission_id for permission_id, _ in items],
+                [data.user_id for _, data in items],
+                [data.target_type for _, data in items],
+                [data.target_id for _, data in items],
+                [naive_utc(data.valid_from) for _, data in items],
+                [naive_utc(data.valid_to) for _, data in items],
+                [schedule for schedule, _, _ in schedules],
+                [bitmap for _, bitmap, _ in schedules],
+                [tz for _, _, tz in schedules],
+                assigned_by_user_id
             )
-            if not row:
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create permission")
-            return Permission.model_validate(row)
-        except asyncpg.ForeignKeyViolationError as e:
-            logger.error(f"Permission creation FK violation: {e}")
-            if "fk_user" in str(e).lower() and "user_id" in str(e).lower():  # Проверяем user_id
-                detail = f"User with id {data.user_id} not found."
-            elif "fk_assigner" in str(e).lower():
-                detail = f"Assigner user with id {assigned_by_user_id} not found."
-            else:  # Ошибка с target_id (fk на device или zone неявно) или другой FK
-                detail = "Invalid user_id, target_id (device/zone), or assigner_id."
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
-        except asyncpg.UniqueViolationError as e:
-            logger.warning(f"Permission creation unique violation: {e}")
-            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="This permission (user-target combination) may already exist.")
-        except Exception as e:
-            logger.exception("Error creating permission in DB")
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {str(e)}")
+        return permission_mapper.many(rows)
 
     @staticmethod
     async def get_by_id(permission_id: uuid.UUID) -> Optional[Permission]:
         q = "SELECT * FROM public.permission WHERE permission_id = $1;"
-        row = await db.pool.fetchrow(q, permission_id)
-        return Permission.model_validate(row) if row else None
+        async with db.connection() as conn:
+            row = await conn.fetchrow(q, permission_id)
+        return permission_mapper.one(row)
+
+    @staticmethod
+    async def get_for_user(user_id: uuid.UUID, page: PageRequest) -> Page[Permission]:
+        keyset = Keyset(page, id_column="permission_id")
+        after_cursor, cursor_params = keyset.condition(2)
+        q = f"""
+            SELECT * FROM public.permission
+            WHERE user_id = $1 {f"AND {after_cursor}" if after_cursor else ""}
+            {keyset.order_by}
+            LIMIT ${2 + len(cursor_params)};
+        """
+        async with db.connection() as conn:
+            rows = await conn.fetch(q, user_id, *cursor_params, page.fetch_limit)
+        return keyset.build(permission_mapper.many(rows), id_attr="permission_id")
+
+    @staticmethod
+    async def get_all(page: PageRequest, use_primary: bool = False) -> Page[Permission]:
+        keyset = Keyset(page, id_column="permission_id")
+        after_cursor, cursor_params = keyset.condition(1)
+        q = f"""
+            SELECT * FROM public.permission
+            {f"WHERE {after_cursor}" if after_cursor else ""}
+            {keyset.order_by}
+            LIMIT ${1 + len(cursor_params)};
+        """
+        rows = await db.reader(use_primary).fetch(q, *cursor_params, page.fetch_limit)
+        return keyset.build(permission_mapper.many(rows), id_attr="permission_id")
 
     @staticmethod
-    async def get_for_user(user_id: uuid.UUID) -> List[Permission]:
-        q = "SELECT * FROM public.permission WHERE user_id = $1 ORDER BY created_at DESC;"
-        rows = await db.pool.fetch(q, user_id)
-        return [Permission.model_validate(row) for row in rows]
+    async def select_not_expired() -> List[Permission]:
+        """Все действующие и будущие права - источник для PermissionIndex."""
+        q = """
+            SELECT * FROM public.permission
+            WHERE valid_to IS NULL OR valid_to >= NOW() AT TIME ZONE 'utc';
+        """
+        rows = await db.pool.fetch(q)
+        return permission_mapper.many(rows)
 
     @staticmethod
-    async def get_all(limit: int = 100, offset: int = 0) -> List[Permission]:
-        q = "SELECT * FROM public.permission ORDER BY created_at DESC LIMIT $1 OFFSET $2;"
-        rows = await db.pool.fetch(q, limit, offset)
-        return [Permission.model_validate(row) for row in rows]
+    async def select_by_ids(permission_ids: Sequence[uuid.UUID]) -> List[Permission]:
+        """Права по списку id с основного сервера - обновление PermissionIndex по уведомлениям."""
+        q = "SELECT * FROM public.permission WHERE permission_id = ANY($1::uuid[]);"
+        rows = await db.pool.fetch(q, permission_ids)
+        return permission_mapper.many(rows)
+
+    @staticmethod
+    async def select_permitted_device_ids(user_id: uuid.UUID) -> List[uuid.UUID]:
+        """
+        Устройства с действующим (по сроку, без учета расписания) правом пользователя -
+        напрямую или через зону. Запасной путь для PermissionIndex.granted_targets.
+        """
+        q = """
+            WITH grants AS (
+                SELECT target_type, target_id
+                FROM public.permission
+                WHERE user_id = $1
+                  AND (valid_from IS NULL OR valid_from <= NOW() AT TIME ZONE 'utc')
+                  AND (valid_to IS NULL OR valid_to >= NOW() AT TIME ZONE 'utc')
+            )
+            SELECT target_id AS device_id FROM grants WHERE target_type = 'DEVICE'
+            UNION
+            SELECT d.device_id
+            FROM grants g
+            JOIN public.device d ON d.zone_id = g.target_id
+            WHERE g.target_type = 'ZONE';
+        """
+        async with db.connection() as conn:
+            rows = await conn.fetch(q, user_id)
+        return [row["device_id"] for row in rows]
 
     @staticmethod
     async def check_active_permission(user_id: uuid.UUID, target_type: str, target_id: uuid.UUID) -> bool:
@@ -73,33 +181,45 @@ class PermissionRepo:
                   AND target_id = $3
                   AND (valid_from IS NULL OR valid_from <= NOW() AT TIME ZONE 'utc')
                   AND (valid_to IS NULL OR valid_to >= NOW() AT TIME ZONE 'utc')
-                -- AND (schedule IS NULL OR check_schedule(schedule)) -- Если будет логика расписаний
+                  -- Расписание: бит текущей минуты недели в поясе права (migrations/0006_permission_schedule.sql)
+                  AND (schedule_bitmap IS NULL OR
+                       get_bit(schedule_bitmap, public.minute_of_week(NOW() AT TIME ZONE schedule_tz)) = 1)
             );
         """
-        has_permission = await db.pool.fetchval(q, user_id, target_type, target_id)
+        async with db.connection() as conn:
+            has_permission = await conn.fetchval(q, user_id, target_type, target_id)
         return bool(has_permission)
 
     @staticmethod
     async def update(permission_id: uuid.UUID, data: PermissionUpdate, assigned_by_user_id: uuid.UUID) -> Optional[Permission]:
-        # Обновляем только valid_from, valid_to и assigned_by (кто последний менял)
+        # Обновляем только valid_from, valid_to, расписание и assigned_by (кто последний менял)
         q = """
             UPDATE public.permission
             SET valid_from = COALESCE($1, valid_from),
                 valid_to = $2, -- null можно передавать для сброса
                 assigned_by = $3,
+                -- расписание меняется, только если передано в запросе (null - снять)
+                schedule = CASE WHEN $5 THEN $6::jsonb ELSE schedule END,
+                schedule_bitmap = CASE WHEN $5 THEN $7::bytea ELSE schedule_bitmap END,
+                schedule_tz = CASE WHEN $5 THEN $8::varchar ELSE schedule_tz END,
                 updated_at = NOW()
             WHERE permission_id = $4
             RETURNING *;
         """
-        try:
-            row = await db.pool.fetchrow(q, data.valid_from, data.valid_to, assigned_by_user_id, permission_id)
-            return Permission.model_validate(row) if row else None
-        except Exception as e:
-            logger.exception(f"Error updating permission {permission_id}")
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error during permission update: {str(e)}")
+        async with db.connection() as conn:
+            try:
+                row = await conn.fetchrow(
+                    q, naive_utc(data.valid_from), naive_utc(data.valid_to), assigned_by_user_id, permission_id,
+                    "schedule" in data.model_fields_set, *schedule_columns(data.schedule)
+                )
+                return permission_mapper.one(row)
+            except Exception as e:
+                logger.exception(f"Error updating permission {permission_id}")
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error during permission update: {str(e)}")
 
     @staticmethod
     async def delete(permission_id: uuid.UUID) -> bool:
         q = "DELETE FROM public.permission WHERE permission_id = $1 RETURNING permission_id;"
-        result = await db.pool.fetchval(q, permission_id)
+        async with db.connection() as conn:
+            result = await conn.fetchval(q, permission_id)
         return result is not None
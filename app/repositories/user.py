@@ -1,6 +1,6 @@
 import uuid
-from datetime import datetime, timedelta
-from typing import List
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
 
 import asyncpg
 import pytz
@@ -11,8 +11,14 @@ from httpx import AsyncClient, Timeout, _exceptions
 from app.config import settings
 from app.db_session import db
 from app.models.user import (AccessLevel, User, UserCreate, UserDelete,
-                             UserLogin, UserUpdate)
+                             UserLogin, UserResponse, UserUpdate)
+from app.pkg.clock import utcnow
 from app.pkg.hasher import Hasher
+from app.pkg.pagination import Keyset, Page, PageRequest
+from app.pkg.row_mapper import RowMapper
+
+user_mapper = RowMapper(User)
+user_response_mapper = RowMapper(UserResponse)
 
 
 class UserRepo:
@@ -24,7 +30,9 @@ class UserRepo:
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Cannot create users with same access level or higher"
                 )
-        async with db.pool.acquire() as conn:
+        # Хешируем до захвата соединения, чтобы не держать его во время bcrypt
+        password_hash = await Hasher.get_password_hash_async(user_data.password)
+        async with db.connection() as conn:
             query = """
                 INSERT INTO public.user (
                     login,
@@ -48,14 +56,14 @@ class UserRepo:
             """
             params = (
                 user_data.login,
-                Hasher.get_password_hash(user_data.password),
+                password_hash,
                 user_data.full_name,
                 user_data.phone,
                 user_data.access_level,
                 user_data.employee_id,
                 user_data.department,
                 user_data.is_active,
-                datetime.now()
+                utcnow()
             )
             try:
                 user_id = await conn.fetchval(query, *params)
@@ -71,12 +79,55 @@ class UserRepo:
                     detail=f"Database error: {e}"
                 )
 
+    @staticmethod
+    async def create_users(users: Sequence[UserCreate], password_hashes: Sequence[str]) -> Dict[str, uuid.UUID]:
+        """
+        Вставка пачки пользователей одним INSERT ... SELECT FROM unnest (пароли уже захешированы).
+        Возвращает login -> user_id только для вставленных: занятые логины пропускаются.
+        """
+        query = """
+            INSERT INTO public.user (
+                login, password, full_name, phone, access_level,
+                employee_id, department, is_active, created_at
+            )
+            SELECT t.*, NOW()
+            FROM unnest(
+                $1::varchar[], $2::varchar[], $3::varchar[], $4::varchar[],
+                $5::int[], $6::varchar[], $7::varchar[], $8::bool[]
+            ) AS t
+            ON CONFLICT (login) DO NOTHING
+            RETURNING login, user_id;
+        """
+        async with db.connection() as conn:
+            rows = await conn.fetch(
+                query,
+                [user.login for user in users],
+                list(password_hashes),
+                [user.full_name for user in users],
+                [user.phone for user in users],
+                [int(user.access_level) for user in users],
+                [user.employee_id for user in users],
+                [user.department for user in users],
+                [user.is_active for user in users]
+            )
+        return {row["login"]: row["user_id"] for row in rows}
+
+    @staticmethod
+    async def select_access_levels(user_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, int]:
+        """Уровни доступа существующих пользователей из user_ids одним запросом."""
+        async with db.connection() as conn:
+            rows = await conn.fetch(
+                "SELECT user_id, access_level FROM public.user WHERE user_id = ANY($1::uuid[]);",
+                list(user_ids)
+            )
+        return {row["user_id"]: row["access_level"] for row in rows}
+
     @staticmethod
     async def select_user(login: str | None = None, user_id: uuid.UUID | str | None = None) -> User:
         if not any([login, user_id]):
             raise ValueError("Either login or user_id must be provided")
 
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 SELECT
                     *
@@ -97,19 +148,7 @@ class UserRepo:
                         detail="User not found"
                     )
 
-                return User(
-                    user_id=str(user['user_id']),
-                    login=user['login'],
-                    password=user['password'],
-                    full_name=user['full_name'],
-                    phone=user['phone'],
-                    access_level=user['access_level'],
-                    employee_id=user['employee_id'],
-                    department=user['department'],
-                    is_active=user['is_active'],
-                    created_at=user['created_at'],
-                    updated_at=user['updated_at']
-                )
+                return user_mapper.one(user)
 
             except asyncpg.PostgresError as e:
                 raise HTTPException(
@@ -118,51 +157,45 @@ class UserRepo:
                 )
 
     @staticmethod
-    async def select_users() -> List[User]:
-        async with db.pool.acquire() as conn:
-            query = '''
+    async def select_users(page: PageRequest, use_primary: bool = False) -> Page[User]:
+        keyset = Keyset(page, id_column="user_id", descending=False)
+        after_cursor, cursor_params = keyset.condition(1)
+        async with db.reader(use_primary).acquire() as conn:
+            query = f'''
                 SELECT
                     *
-                FROM public.user;
+                FROM public.user
+                {f"WHERE {after_cursor}" if after_cursor else ""}
+                {keyset.order_by}
+                LIMIT ${1 + len(cursor_params)};
             '''
-            users = await conn.fetch(query)
-            return [
-                User(
-                    user_id=str(user['user_id']),
-                    login=user['login'],
-                    password=user['password'],
-                    full_name=user['full_name'],
-                    phone=user['phone'],
-                    access_level=user['access_level'],
-                    employee_id=user['employee_id'],
-                    department=user['department'],
-                    is_active=user['is_active'],
-                    created_at=user['created_at'],
-                    updated_at=user['updated_at']
-                ) for user in users
-            ]
+            users = await conn.fetch(query, *cursor_params, page.fetch_limit)
+            return keyset.build(user_mapper.many(users), id_attr="user_id")
 
     @staticmethod
-    async def update_user(user_data: UserUpdate, selected_user: User, current_user: User) -> User:
+    async def update_user(
+        user_data: UserUpdate, password_hash: Optional[str], selected_user: User, current_user: User
+    ) -> User:
+        """password_hash - уже посчитанный хеш нового пароля (None - пароль не меняется)."""
         if selected_user.access_level >= current_user.access_level and current_user.access_level != AccessLevel.ROOT:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Cannot update user with same access level or higher"
             )
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             updates = []
             params = []
 
             fields_to_update = {
                 'login': user_data.login,
-                'password': Hasher.get_password_hash(user_data.password) if user_data.password else None,
+                'password': password_hash,
                 'full_name': user_data.full_name,
                 'phone': user_data.phone,
                 'access_level': user_data.access_level,
                 'employee_id': user_data.employee_id,
                 'department': user_data.department,
                 'is_active': user_data.is_active,
-                'updated_at': datetime.now()
+                'updated_at': utcnow()
             }
 
             for field, value in fields_to_update.items():
@@ -194,19 +227,7 @@ class UserRepo:
                         detail=f"User with id {user_data.user_id} not found"
                     )
 
-                return User(
-                    user_id=updated_user['user_id'],
-                    login=updated_user['login'],
-                    password=updated_user['password'],
-                    full_name=updated_user['full_name'],
-                    phone=updated_user['phone'],
-                    access_level=updated_user['access_level'],
-                    employee_id=updated_user['employee_id'],
-                    department=updated_user['department'],
-                    is_active=updated_user['is_active'],
-                    created_at=updated_user['created_at'],
-                    updated_at=updated_user['updated_at']
-                )
+                return user_mapper.one(updated_user)
 
             except asyncpg.UniqueViolationError:
                 raise HTTPException(
@@ -231,7 +252,7 @@ class UserRepo:
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Self-deletion is not allowed"
             )
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             async with conn.transaction():
                 try:
                     await conn.execute(
@@ -1,6 +1,5 @@
 import uuid
-from datetime import datetime
-from typing import List
+from typing import Iterable, List, Set
 
 import asyncpg
 from fastapi import HTTPException, status
@@ -8,12 +7,17 @@ from fastapi import HTTPException, status
 from app.db_session import db
 from app.models.user import AccessLevel, User
 from app.models.zone import Zone, ZoneCreate, ZoneUpdate
+from app.pkg.clock import utcnow
+from app.pkg.pagination import Keyset, Page, PageRequest
+from app.pkg.row_mapper import RowMapper
+
+zone_mapper = RowMapper(Zone)
 
 
 class ZoneRepo:
     @staticmethod
     async def create_zone(zone_data: ZoneCreate) -> uuid.UUID:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 INSERT INTO public.zone (
                     name,
@@ -39,7 +43,7 @@ class ZoneRepo:
 
     @staticmethod
     async def select_zone(zone_id: uuid.UUID) -> Zone:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             query = """
                 SELECT * FROM public.zone
                 WHERE zone_id = $1;
@@ -50,39 +54,39 @@ class ZoneRepo:
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Zone not found"
                 )
-            return Zone(
-                zone_id=zone['zone_id'],
-                name=zone['name'],
-                description=zone['description'],
-                created_at=zone['created_at'],
-                updated_at=zone['updated_at']
-            )
+            return zone_mapper.one(zone)
 
     @staticmethod
-    async def select_zones() -> List[Zone]:
-        async with db.pool.acquire() as conn:
-            query = "SELECT * FROM public.zone;"
-            zones = await conn.fetch(query)
-            return [
-                Zone(
-                    zone_id=zone['zone_id'],
-                    name=zone['name'],
-                    description=zone['description'],
-                    created_at=zone['created_at'],
-                    updated_at=zone['updated_at']
-                ) for zone in zones
-            ]
+    async def select_existing_ids(zone_ids: Iterable[uuid.UUID]) -> Set[uuid.UUID]:
+        """Какие из zone_ids существуют - одним запросом на всю пачку."""
+        async with db.connection() as conn:
+            rows = await conn.fetch("SELECT zone_id FROM public.zone WHERE zone_id = ANY($1::uuid[]);", list(zone_ids))
+        return {row["zone_id"] for row in rows}
+
+    @staticmethod
+    async def select_zones(page: PageRequest, use_primary: bool = False) -> Page[Zone]:
+        keyset = Keyset(page, id_column="zone_id", descending=False)
+        after_cursor, cursor_params = keyset.condition(1)
+        async with db.reader(use_primary).acquire() as conn:
+            query = f"""
+                SELECT * FROM public.zone
+                {f"WHERE {after_cursor}" if after_cursor else ""}
+                {keyset.order_by}
+                LIMIT ${1 + len(cursor_params)};
+            """
+            zones = await conn.fetch(query, *cursor_params, page.fetch_limit)
+            return keyset.build(zone_mapper.many(zones), id_attr="zone_id")
 
     @staticmethod
     async def update_zone(zone_data: ZoneUpdate) -> Zone:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             updates = []
             params = []
 
             fields_to_update = {
                 'name': zone_data.name,
                 'description': zone_data.description,
-                'updated_at': datetime.now()
+                'updated_at': utcnow()
             }
 
             for field, value in fields_to_update.items():
@@ -105,13 +109,7 @@ class ZoneRepo:
 
             try:
                 updated_zone = await conn.fetchrow(query, zone_data.zone_id, *params)
-                return Zone(
-                    zone_id=updated_zone['zone_id'],
-                    name=updated_zone['name'],
-                    description=updated_zone['description'],
-                    created_at=updated_zone['created_at'],
-                    updated_at=updated_zone['updated_at']
-                )
+                return zone_mapper.one(updated_zone)
             except asyncpg.UniqueViolationError:
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
@@ -125,7 +123,7 @@ class ZoneRepo:
 
     @staticmethod
     async def delete_zone(zone_id: uuid.UUID) -> bool:
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             try:
                 result = await conn.execute(
                     "DELETE FROM public.zone WHERE zone_id = $1 RETURNING 1;",
@@ -1,13 +1,17 @@
 from typing import List, Optional
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
 
-from app.depends import AccessLogServiceDependency
+from app.depends import AccessLogServiceDependency, PageRequestDependency
 from app.models.user import User
-from app.models.access_log import AccessLogResponse
+from app.models.access_log import AccessLogResponse, AccessStatsRow, StatsDimension
 from app.pkg.auth import get_current_user
+from app.pkg.clock import utcnow
+from app.pkg.export import EXPORT_FORMATS, ExportFormat
+from app.pkg.pagination import Page
 
 router = APIRouter(
     prefix="/api/v1/access-log",
@@ -16,28 +20,85 @@ router = APIRouter(
 )
 
 
-@router.get("/select", response_model=List[AccessLogResponse])
+@router.get("/select", response_model=Page[AccessLogResponse])
 async def select_access_logs(
     service: AccessLogServiceDependency,
+    page: PageRequestDependency,
     current_user: User = Depends(get_current_user),
     device_id: Optional[UUID] = Query(None, description="Фильтр по ID устройства"),
     user_id_filter: Optional[UUID] = Query(None, alias="userId", description="Фильтр по ID пользователя"),
     start_time: Optional[datetime] = Query(None, description="Начало периода (ISO формат)"),
-    end_time: Optional[datetime] = Query(None, description="Конец периода (ISO формат)"),
-    limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    end_time: Optional[datetime] = Query(None, description="Конец периода (ISO формат)")
 ):
     """
     Получить записи из журнала доступа.
-    Менеджеры должны указать device_id или получат ошибку (если не реализована логика просмотра по всем их устройствам).
-    Админы могут смотреть все логи или фильтровать по device_id / user_id.
+    Менеджеры без device_id получают записи по всем устройствам, на которые у них есть права
+    (напрямую или через зону). Набор устройств берется из кеша прав воркера и согласован
+    с БД в конечном счете: права, выданные или отозванные через другой воркер, учитываются
+    не позже чем через in_memory.resync_interval. Админы могут смотреть все логи или фильтровать по device_id / user_id.
+    Постранично, от новых к старым: следующая страница - cursor=next_cursor.
     """
     return await service.get_access_logs(
         current_user=current_user,
         device_id=device_id,
         user_id_filter=user_id_filter,
-        limit=limit,
-        offset=offset,
+        page=page,
         start_time=start_time,
         end_time=end_time
     )
+
+
+@router.get("/stats", response_model=List[AccessStatsRow])
+async def access_stats(
+    service: AccessLogServiceDependency,
+    current_user: User = Depends(get_current_user),
+    start_time: Optional[datetime] = Query(None, description="Начало периода (ISO формат), по умолчанию - сутки назад"),
+    end_time: Optional[datetime] = Query(None, description="Конец периода (ISO формат), по умолчанию - сейчас"),
+    group_by: List[StatsDimension] = Query([], description="Группировка: device, zone, hour, day, event_type"),
+    device_id: Optional[UUID] = Query(None, description="Фильтр по ID устройства"),
+    zone_id: Optional[UUID] = Query(None, description="Фильтр по ID зоны")
+):
+    """
+    Число предоставленных/отклоненных доступов за период с группировкой (например,
+    group_by=zone&group_by=hour). Считается по почасовым агрегатам, поэтому период
+    округляется до часа и запрос не зависит от объема журнала.
+    """
+    end_time = end_time or utcnow()
+    return await service.get_access_stats(
+        current_user=current_user,
+        start_time=start_time or end_time - timedelta(days=1),
+        end_time=end_time,
+        group_by=group_by,
+        device_id=device_id,
+        zone_id=zone_id
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_access_logs(
+    service: AccessLogServiceDependency,
+    current_user: User = Depends(get_current_user),
+    export_format: ExportFormat = Query("ndjson", alias="format", description="ndjson или csv"),
+    device_id: Optional[UUID] = Query(None, description="Фильтр по ID устройства"),
+    user_id_filter: Optional[UUID] = Query(None, alias="userId", description="Фильтр по ID пользователя"),
+    start_time: Optional[datetime] = Query(None, description="Начало периода (ISO формат)"),
+    end_time: Optional[datetime] = Query(None, description="Конец периода (ISO формат)")
+):
+    """
+    Выгрузка журнала доступа целиком (NDJSON или CSV) с теми же фильтрами и правами, что /select.
+    Ответ отдается потоком по мере чтения из БД, от старых записей к новым.
+    """
+    chunks = await service.export_access_logs(
+        current_user=current_user,
+        device_id=device_id,
+        user_id_filter=user_id_filter,
+        start_time=start_time,
+        end_time=end_time
+    )
+    media_type, encode = EXPORT_FORMATS[export_format]
+    filename = f"access_log_{datetime.now():%Y%m%d_%H%M%S}.{export_format}"
+    return StreamingResponse(
+        encode(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
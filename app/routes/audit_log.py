@@ -3,11 +3,14 @@ from uuid import UUID
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
 
-from app.depends import AuditLogServiceDependency
+from app.depends import AuditLogServiceDependency, PageRequestDependency
 from app.models.user import User
 from app.models.audit_log import AuditLogResponse
 from app.pkg.auth import get_current_user
+from app.pkg.export import EXPORT_FORMATS, ExportFormat
+from app.pkg.pagination import Page
 
 router = APIRouter(
     prefix="/api/v1/audit-log",
@@ -16,9 +19,10 @@ router = APIRouter(
 )
 
 
-@router.get("/select", response_model=List[AuditLogResponse])
+@router.get("/select", response_model=Page[AuditLogResponse])
 async def select_audit_logs(
     service: AuditLogServiceDependency,
+    page: PageRequestDependency,
     current_user: User = Depends(get_current_user),
     user_id_filter: Optional[UUID] = Query(None, alias="userId", description="Фильтр по ID пользователя, совершившего действие"),
     entity_type_filter: Optional[str] = Query(None, alias="entityType", description="Фильтр по типу сущности"),
@@ -26,11 +30,12 @@ async def select_audit_logs(
     action_filter: Optional[str] = Query(None, alias="action", description="Фильтр по действию (частичное совпадение)"),
     start_time: Optional[datetime] = Query(None, description="Начало периода (ISO формат)"),
     end_time: Optional[datetime] = Query(None, description="Конец периода (ISO формат)"),
-    limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    data_filters: List[str] = Query([], alias="data", description="Фильтр по action_data: путь=значение, например login=ivan или changes.access_level=3")
 ):
     """
     Получить записи из журнала аудита (только для Admin/Root).
+    Постранично, от новых к старым: следующая страница - cursor=next_cursor.
+    Фильтры data (можно несколько, объединяются через AND) ищут по значениям в action_data.
     """
     return await service.get_audit_logs(
         current_user=current_user,
@@ -38,8 +43,44 @@ async def select_audit_logs(
         entity_type_filter=entity_type_filter,
         entity_id_filter=entity_id_filter,
         action_filter=action_filter,
-        limit=limit,
-        offset=offset,
+        page=page,
         start_time=start_time,
-        end_time=end_time
+        end_time=end_time,
+        data_filters=data_filters
+    )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_audit_logs(
+    service: AuditLogServiceDependency,
+    current_user: User = Depends(get_current_user),
+    export_format: ExportFormat = Query("ndjson", alias="format", description="ndjson или csv"),
+    user_id_filter: Optional[UUID] = Query(None, alias="userId", description="Фильтр по ID пользователя, совершившего действие"),
+    entity_type_filter: Optional[str] = Query(None, alias="entityType", description="Фильтр по типу сущности"),
+    entity_id_filter: Optional[UUID] = Query(None, alias="entityId", description="Фильтр по ID сущности"),
+    action_filter: Optional[str] = Query(None, alias="action", description="Фильтр по действию (частичное совпадение)"),
+    start_time: Optional[datetime] = Query(None, description="Начало периода (ISO формат)"),
+    end_time: Optional[datetime] = Query(None, description="Конец периода (ISO формат)"),
+    data_filters: List[str] = Query([], alias="data", description="Фильтр по action_data: путь=значение, например login=ivan или changes.access_level=3")
+):
+    """
+    Выгрузка журнала аудита целиком (NDJSON или CSV, только для Admin/Root) с теми же фильтрами, что /select.
+    Ответ отдается потоком по мере чтения из БД, от старых записей к новым.
+    """
+    chunks = await service.export_audit_logs(
+        current_user=current_user,
+        user_id_filter=user_id_filter,
+        entity_type_filter=entity_type_filter,
+        entity_id_filter=entity_id_filter,
+        action_filter=action_filter,
+        start_time=start_time,
+        end_time=end_time,
+        data_filters=data_filters
+    )
+    media_type, encode = EXPORT_FORMATS[export_format]
+    filename = f"audit_log_{datetime.now():%Y%m%d_%H%M%S}.{export_format}"
+    return StreamingResponse(
+        encode(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
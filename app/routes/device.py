@@ -1,14 +1,16 @@
 from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Request, Header  # Добавлен Path
+from fastapi import APIRouter, Depends, Request, Header, Query  # Добавлен Path
 from starlette import status
 
-from app.depends import DeviceServiceDependency
+from app.depends import DeviceServiceDependency, PageRequestDependency
 from app.models.device import (Device, DeviceCreate, DeviceDelete, DeviceUpdate,
                                DeviceWakeupResponse)  # Добавлена DeviceWakeupResponse
 from app.models.user import User
 from app.pkg.auth import get_current_user
+from app.pkg.bulk import BULK_REQUEST_BODY, BulkReport, read_bulk
+from app.pkg.pagination import Page
 
 router = APIRouter(
     prefix='/api/v1/device',
@@ -25,6 +27,17 @@ async def create_device(
     return await device_service.create_device(device_data, current_user)
 
 
+@router.post("/bulk", response_model=BulkReport, openapi_extra=BULK_REQUEST_BODY)
+async def bulk_create_devices(
+    request: Request,
+    device_service: DeviceServiceDependency,
+    current_user: User = Depends(get_current_user)
+):
+    """Создать устройства пачкой: JSON-массив, NDJSON или CSV (поля DeviceCreate); отчет по каждой строке."""
+    batch = await read_bulk(request, DeviceCreate)
+    return await device_service.bulk_create_devices(batch, current_user)
+
+
 @router.post("/update", response_model=Device)  # Можно path("/update/{device_id}") и брать device_id из пути
 async def update_device(
     device_service: DeviceServiceDependency,
@@ -43,12 +56,13 @@ async def delete_device(
     return await device_service.delete_device(device_data, current_user)
 
 
-@router.get("/select", response_model=List[Device])
+@router.get("/select", response_model=Page[Device])
 async def select_all_devices(
     device_service: DeviceServiceDependency,
+    page: PageRequestDependency,
     current_user: User = Depends(get_current_user)
 ):
-    return await device_service.select_all_devices(current_user)
+    return await device_service.select_all_devices(current_user, page)
 
 
 @router.get("/select/{device_id}", response_model=Device)  # Новый роут для получения одного устройства
@@ -74,6 +88,7 @@ async def check_device_status(  # Возвращает dict, можно сдел
 async def device_wakeup_event(
     device_service: DeviceServiceDependency,
     request: Request,
+    timings: bool = Query(False, description="Вернуть длительность этапов обработки"),
 ):
     client_ip = request.client.host if request.client else None
     client_port = request.client.port if request.client else None
@@ -81,7 +96,7 @@ async def device_wakeup_event(
         "ip": client_ip,
         "port": client_port,
     }
-    return await device_service.handle_device_event_from_cv(ip_config)
+    return await device_service.handle_device_event_from_cv(ip_config, include_timings=timings)
 
 
 @router.post("/wakeup/nginx", response_model=DeviceWakeupResponse)
@@ -91,6 +106,7 @@ async def device_wakeup_event_nginx(
     x_forwarded_for: str = Header(None),
     x_forwarded_port: str = Header(None),
     x_real_port: str = Header(None),
+    timings: bool = Query(False, description="Вернуть длительность этапов обработки"),
 ):
     client_ip = (
         x_forwarded_for.split(",")[0].strip()
@@ -106,4 +122,4 @@ async def device_wakeup_event_nginx(
         "ip": client_ip,
         "port": client_port,
     }
-    return await device_service.handle_device_event_from_cv(ip_config)
+    return await device_service.handle_device_event_from_cv(ip_config, include_timings=timings)
@@ -0,0 +1,59 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.db_session import db
+from app.models.user import AccessLevel, User
+from app.pkg.auth import get_current_user
+from app.pkg.metrics import metrics
+from app.repositories.access_log import access_log_writer
+from app.repositories.audit_log import audit_log_writer
+
+router = APIRouter(
+    prefix="/api/v1/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(get_current_user)]
+)
+
+
+def _require_admin(current_user: User):
+    if current_user.access_level < AccessLevel.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient privileges")
+
+
+@router.get("/latency")
+async def get_latency_metrics(
+    current_user: User = Depends(get_current_user),
+    prefix: Optional[str] = Query(None, description="Фильтр по префиксу, например 'wakeup.'"),
+):
+    """Перцентили задержек по этапам (гистограммы в памяти процесса, с момента старта)."""
+    _require_admin(current_user)
+    return metrics.snapshot(prefix)
+
+
+@router.post("/latency/reset")
+async def reset_latency_metrics(
+    current_user: User = Depends(get_current_user),
+    prefix: Optional[str] = Query(None),
+):
+    """Сбросить гистограммы (например, перед замером после изменения настроек)."""
+    _require_admin(current_user)
+    metrics.reset(prefix)
+    return {"message": "Metrics reset"}
+
+
+@router.get("/db_pool")
+async def get_db_pool_stats(current_user: User = Depends(get_current_user)):
+    """Размер пула, свободные/занятые соединения, ожидающие acquire() и время ожидания."""
+    _require_admin(current_user)
+    return db.stats()
+
+
+@router.get("/writers")
+async def get_writer_stats(current_user: User = Depends(get_current_user)):
+    """
+    Очереди пакетной записи журналов: в очереди, записано, ошибки записи, отброшено
+    при переполнении. Задержка до записи - /latency?prefix=batch_writer.
+    """
+    _require_admin(current_user)
+    return [access_log_writer.stats(), audit_log_writer.stats()]
@@ -1,14 +1,16 @@
 from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 
-from app.depends import PermissionServiceDependency
+from app.depends import PageRequestDependency, PermissionServiceDependency
 from app.models.user import User
 from app.models.permission import (
     PermissionCreate, PermissionResponse, PermissionUpdate, PermissionDelete
 )
 from app.pkg.auth import get_current_user
+from app.pkg.bulk import BULK_REQUEST_BODY, BulkReport, read_bulk
+from app.pkg.pagination import Page
 
 router = APIRouter(
     prefix="/api/v1/permission",
@@ -27,6 +29,17 @@ async def grant_permission(
     return await service.create_permission(data, current_user)
 
 
+@router.post("/bulk", response_model=BulkReport, openapi_extra=BULK_REQUEST_BODY)
+async def bulk_grant_permissions(
+    request: Request,
+    service: PermissionServiceDependency,
+    current_user: User = Depends(get_current_user)
+):
+    """Выдать права пачкой: JSON-массив, NDJSON или CSV (поля PermissionCreate); отчет по каждой строке."""
+    batch = await read_bulk(request, PermissionCreate)
+    return await service.bulk_create_permissions(batch, current_user)
+
+
 @router.get("/get/{permission_id}", response_model=PermissionResponse)
 async def get_permission_by_id(
     permission_id: UUID,
@@ -37,25 +50,25 @@ async def get_permission_by_id(
     return await service.get_permission(permission_id, current_user)
 
 
-@router.get("/user/{user_id_to_view}", response_model=List[PermissionResponse])
+@router.get("/user/{user_id_to_view}", response_model=Page[PermissionResponse])
 async def get_permissions_for_user_route(  # Изменено имя функции
     user_id_to_view: UUID,
     service: PermissionServiceDependency,
+    page: PageRequestDependency,
     current_user: User = Depends(get_current_user)
 ):
-    """Получить все права доступа для указанного пользователя."""
-    return await service.get_permissions_for_user(user_id_to_view, current_user)
+    """Получить права доступа для указанного пользователя (постранично)."""
+    return await service.get_permissions_for_user(user_id_to_view, current_user, page)
 
 
-@router.get("/all", response_model=List[PermissionResponse])
+@router.get("/all", response_model=Page[PermissionResponse])
 async def get_all_permissions_route(  # Изменено имя функции
     service: PermissionServiceDependency,
-    current_user: User = Depends(get_current_user),
-    limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    page: PageRequestDependency,
+    current_user: User = Depends(get_current_user)
 ):
-    """Получить все права доступа в системе (только для Admin/Root)."""
-    return await service.get_all_permissions(current_user, limit, offset)
+    """Получить все права доступа в системе (только для Admin/Root), постранично."""
+    return await service.get_all_permissions(current_user, page)
 
 
 @router.patch("/update/{permission_id}", response_model=PermissionResponse)
@@ -65,7 +78,7 @@ async def update_permission_route(  # Изменено имя функции
     service: PermissionServiceDependency,
     current_user: User = Depends(get_current_user)
 ):
-    """Обновить сроки действия права доступа."""
+    """Обновить сроки действия и расписание права доступа."""
     return await service.update_permission(permission_id, data, current_user)
 
 
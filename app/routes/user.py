@@ -1,17 +1,20 @@
 import random  # Не используется
 from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse  # Не используется напрямую в этих роутах
 from fastapi.security import OAuth2PasswordRequestForm  # Не используется в этих роутах
 from starlette.status import (HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED,  # Не используются напрямую
                               HTTP_403_FORBIDDEN, HTTP_201_CREATED)  # Добавлен HTTP_201_CREATED
 
-from app.depends import UserServiceDependency
+from app.depends import PageRequestDependency, UserServiceDependency
 # from app.models.auth import AuthForm, Token, TokenData # Не используются в этих роутах
 from app.models.user import (AccessLevel, User, UserCreate, UserDelete,
                              UserLogin, UserResponse, UserUpdate)  # AccessLevel, UserLogin не используются
 from app.pkg.auth import get_current_user  # authenticate, refresh_account_token не используются
+from app.pkg.bulk import BULK_REQUEST_BODY, BulkReport, read_bulk
+from app.pkg.pagination import Page
+from app.repositories.user import user_response_mapper
 # from app.pkg.hasher import Hasher # Не используется в этих роутах
 
 router = APIRouter(
@@ -30,6 +33,17 @@ async def create_user(
     return await user_service.create_user(user_data, current_user)
 
 
+@router.post("/bulk", response_model=BulkReport, openapi_extra=BULK_REQUEST_BODY)
+async def bulk_create_users(
+    request: Request,
+    user_service: UserServiceDependency,
+    current_user: User = Depends(get_current_user)
+):
+    """Создать пользователей пачкой: JSON-массив, NDJSON или CSV (поля UserCreate); отчет по каждой строке."""
+    batch = await read_bulk(request, UserCreate)
+    return await user_service.bulk_create_users(batch, current_user)
+
+
 @router.post("/update", response_model=UserResponse)  # Можно path("/update/{user_id_to_update}")
 async def update_user(
     user_service: UserServiceDependency,
@@ -53,18 +67,17 @@ async def delete_user(
 async def me(
     current_user: User = Depends(get_current_user)
 ):
-    # FastAPI автоматически преобразует User в UserResponse, если поля совпадают
-    # или если UserResponse.model_validate(current_user) отработает
-    # Для явности можно сделать так:
-    return UserResponse.model_validate(current_user)
+    # User -> UserResponse без повторной валидации (пароль отбрасывается)
+    return user_response_mapper.from_model(current_user)
 
 
-@router.get("/select", response_model=List[UserResponse])
+@router.get("/select", response_model=Page[UserResponse])
 async def select_all_users(
     user_service: UserServiceDependency,
+    page: PageRequestDependency,
     current_user: User = Depends(get_current_user)
 ):
-    return await user_service.select_all_users(current_user)
+    return await user_service.select_all_users(current_user, page)
 
 
 @router.get("/select/{user_id_to_view}", response_model=UserResponse)  # Новый роут
@@ -79,4 +92,4 @@ async def select_user_by_id(
     # Пока заглушка:
     await user_service.user_repo.min_admin_access_level(current_user)  # Пример: только админ смотрит по ID
     user_internal = await user_service.user_repo.select_user(user_id=user_id_to_view)
-    return UserResponse.model_validate(user_internal)
+    return user_response_mapper.from_model(user_internal)
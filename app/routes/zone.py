@@ -4,10 +4,11 @@ from uuid import UUID  # Добавлено
 from fastapi import APIRouter, Depends, HTTPException
 from starlette import status
 
-from app.depends import ZoneServiceDependency
+from app.depends import PageRequestDependency, ZoneServiceDependency
 from app.models.user import User
 from app.models.zone import Zone, ZoneCreate, ZoneDelete, ZoneUpdate
 from app.pkg.auth import get_current_user
+from app.pkg.pagination import Page
 
 router = APIRouter(
     prefix='/api/v1/zone',
@@ -43,12 +44,13 @@ async def delete_zone(
     return await zone_service.delete_zone(zone_data, current_user)
 
 
-@router.get("/select", response_model=List[Zone])
+@router.get("/select", response_model=Page[Zone])
 async def select_all_zones(
     zone_service: ZoneServiceDependency,
+    page: PageRequestDependency,
     current_user: User = Depends(get_current_user)
 ):
-    return await zone_service.select_all_zones(current_user)
+    return await zone_service.select_all_zones(current_user, page)
 
 
 @router.get("/select/{zone_id}", response_model=Zone)  # Новый роут
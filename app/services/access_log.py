@@ -1,11 +1,14 @@
 import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from fastapi import HTTPException, status
 import logging
 
 from app.models.user import User, AccessLevel
-from app.models.access_log import AccessLogResponse
+from app.models.access_log import AccessLogResponse, AccessStatsRow, StatsDimension
+from app.pkg.export import RowChunks
+from app.pkg.pagination import Page, PageRequest
+from app.pkg.clock import naive_utc
 from app.repositories.user import UserRepo
 from app.repositories.access_log import AccessLogRepo
 from app.repositories.device import DeviceRepo  # Для проверки, к какой зоне относится устройство
@@ -30,19 +33,12 @@ class AccessLogService:
         self.permission_service = permission_service  # Сохраняем
         self.audit_repo = audit_repo
 
-    async def get_access_logs(
-        self,
-        current_user: User,
-        device_id: Optional[uuid.UUID] = None,
-        user_id_filter: Optional[uuid.UUID] = None,
-        limit: int = 100,
-        offset: int = 0,
-        start_time: Optional[datetime] = None,
-        end_time: Optional[datetime] = None
-    ) -> List[AccessLogResponse]:
-        # Права: Менеджер может смотреть логи по устройствам/зонам, на которые у него есть права.
-        # Админ/Рут могут смотреть все логи.
-
+    async def _check_view_access(self, current_user: User, device_id: Optional[uuid.UUID]) -> Optional[List[uuid.UUID]]:
+        """
+        Права: Менеджер может смотреть логи по устройствам/зонам, на которые у него есть права.
+        Админ/Рут могут смотреть все логи.
+        Возвращает устройства, которыми надо ограничить выборку (None - без ограничения).
+        """
         if current_user.access_level < AccessLevel.MANAGER:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient privileges to view access logs.")
 
@@ -50,23 +46,31 @@ class AccessLogService:
         if device_id:
             if current_user.access_level < AccessLevel.ADMIN:
                 # Проверяем, есть ли у менеджера права на это устройство или его зону
-                has_perm = await self.permission_service.check_user_permission_for_device(current_user, device_id)
+                # Расписание ограничивает проход, а не просмотр журнала - проверяем только срок права
+                has_perm = await self.permission_service.check_user_permission_for_device(
+                    current_user, device_id, ignore_schedule=True
+                )
                 if not has_perm:
-                    # Альтернативно, можно разрешить менеджеру видеть логи по всем его устройствам,
-                    # но тогда фильтрация должна быть сложнее (получить все его устройства/зоны)
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
                         detail=f"Manager does not have permission for device {device_id} or its zone to view logs."
                     )
         elif current_user.access_level < AccessLevel.ADMIN:
-            # Менеджер без указания device_id не может смотреть все логи подряд.
-            # Можно реализовать просмотр логов только по тем устройствам, к которым у него есть доступ,
-            # но это потребует доп. логики (сначала получить все доступные device_id, потом фильтровать логи).
-            # Пока упростим: менеджер должен указать device_id.
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Managers must specify a device_id to view access logs. Admins can view all."
-            )
+            # Менеджер без device_id видит логи всех своих устройств (прямые права и через зоны):
+            # один запрос с device_id = ANY(...) вместо запроса на каждое устройство
+            return await self.permission_service.get_permitted_device_ids(current_user)
+        return None
+
+    async def get_access_logs(
+        self,
+        current_user: User,
+        device_id: Optional[uuid.UUID] = None,
+        user_id_filter: Optional[uuid.UUID] = None,
+        page: Optional[PageRequest] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Page[AccessLogResponse]:
+        device_ids = await self._check_view_access(current_user, device_id)
 
         # Пользователь с правами MANAGER или выше может запрашивать логи
         # Фильтрация по user_id_filter также должна учитывать права current_user, если это не админ
@@ -76,8 +80,49 @@ class AccessLogService:
         return await self.access_log_repo.select_logs(
             device_id=device_id,
             user_id_param=user_id_filter,
-            limit=limit,
-            offset=offset,
+            page=page,
+            start_time=start_time,
+            end_time=end_time,
+            device_ids=device_ids
+        )
+
+    async def export_access_logs(
+        self,
+        current_user: User,
+        device_id: Optional[uuid.UUID] = None,
+        user_id_filter: Optional[uuid.UUID] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> RowChunks:
+        """Права как у get_access_logs; проверяются до начала выгрузки."""
+        device_ids = await self._check_view_access(current_user, device_id)
+        return self.access_log_repo.export_logs(
+            device_id=device_id,
+            user_id_param=user_id_filter,
+            start_time=start_time,
+            end_time=end_time,
+            device_ids=device_ids
+        )
+
+    async def get_access_stats(
+        self,
+        current_user: User,
+        start_time: datetime,
+        end_time: datetime,
+        group_by: Sequence[StatsDimension],
+        device_id: Optional[uuid.UUID] = None,
+        zone_id: Optional[uuid.UUID] = None
+    ) -> List[AccessStatsRow]:
+        """Счетчики доступа из почасовых агрегатов; права как у get_access_logs."""
+        device_ids = await self._check_view_access(current_user, device_id)
+        start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+        if start_time >= end_time:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_time must be before end_time")
+        return await self.access_log_repo.select_stats(
             start_time=start_time,
-            end_time=end_time
+            end_time=end_time,
+            group_by=group_by,
+            device_id=device_id,
+            zone_id=zone_id,
+            device_ids=device_ids
         )
@@ -1,11 +1,13 @@
 import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from fastapi import HTTPException, status
 import logging
 
 from app.models.user import User, AccessLevel
 from app.models.audit_log import AuditLogResponse
+from app.pkg.export import RowChunks
+from app.pkg.pagination import Page, PageRequest
 from app.repositories.user import UserRepo
 from app.repositories.audit_log import AuditLogRepo
 
@@ -24,11 +26,11 @@ class AuditLogService:
         entity_type_filter: Optional[str] = None,
         entity_id_filter: Optional[uuid.UUID] = None,
         action_filter: Optional[str] = None,
-        limit: int = 100,
-        offset: int = 0,
+        page: Optional[PageRequest] = None,
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
-    ) -> List[AuditLogResponse]:
+        data_filters: Sequence[str] = (),
+    ) -> Page[AuditLogResponse]:
         # Только админ и выше могут смотреть аудит лог
         await self.user_repo.min_admin_access_level(current_user)
 
@@ -37,8 +39,31 @@ class AuditLogService:
             entity_type_filter=entity_type_filter,
             entity_id_filter=entity_id_filter,
             action_filter=action_filter,
-            limit=limit,
-            offset=offset,
+            page=page,
             start_time=start_time,
-            end_time=end_time
+            end_time=end_time,
+            data_filters=data_filters
+        )
+
+    async def export_audit_logs(
+        self,
+        current_user: User,
+        user_id_filter: Optional[uuid.UUID] = None,
+        entity_type_filter: Optional[str] = None,
+        entity_id_filter: Optional[uuid.UUID] = None,
+        action_filter: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        data_filters: Sequence[str] = (),
+    ) -> RowChunks:
+        await self.user_repo.min_admin_access_level(current_user)
+
+        return self.audit_log_repo.export_logs(
+            user_id_filter=user_id_filter,
+            entity_type_filter=entity_type_filter,
+            entity_id_filter=entity_id_filter,
+            action_filter=action_filter,
+            start_time=start_time,
+            end_time=end_time,
+            data_filters=data_filters
         )
@@ -2,6 +2,7 @@ from uuid import UUID
 from typing import Optional, Any, Dict
 import logging
 
+from app.db_session import db
 from app.models.user import User
 from app.models.audit_log import AuditLogCreate
 from app.repositories.audit_log import AuditLogRepo  # Предполагаем, что AuditLogRepo будет импортирован в __init__.py репозиториев или через depends
@@ -51,8 +52,11 @@ class AuditLogger:
             action_data=action_data
         )
         try:
-            await audit_repo.create(log_entry)
+            await audit_repo.record(log_entry)  # Режим записи - settings.audit_log.durability
         except Exception as e:
+            if db.in_transaction():
+                # В единице работы (db.transaction) изменение без записи аудита не фиксируется
+                raise
             # Критично! Логирование аудита не должно прерывать основную операцию.
             # Но нужно залогировать саму ошибку логирования.
             logger.error(f"Failed to write audit log for user {user.user_id}, action {action}: {e}")
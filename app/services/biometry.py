@@ -6,7 +6,7 @@ import httpx
 from fastapi import HTTPException, UploadFile, status
 
 from app.config import settings
-# from app.db_session import db # Не используется
+from app.db_session import db
 from app.models.biometry import (BiometryDB, BiometryCreate, BiometryDelete,  # Изменено Biometry на BiometryDB
                                  BiometryUpdate, BiometryResponse)  # Добавлен BiometryResponse
 from app.models.user import AccessLevel, User
@@ -17,10 +17,11 @@ from app.services.audit_utils import AuditLogger  # Добавлено
 
 
 class BiometryService:
-    def __init__(self, user_repo: UserRepo, biometry_repo: BiometryRepo, audit_repo: AuditLogRepo):  # Добавлен audit_repo
+    def __init__(self, user_repo: UserRepo, biometry_repo: BiometryRepo, audit_repo: AuditLogRepo, cv_client: httpx.AsyncClient):  # Добавлен audit_repo
         self.user_repo = user_repo
         self.biometry_repo = biometry_repo
         self.audit_repo = audit_repo  # Сохраняем
+        self.cv_client = cv_client  # Общий клиент CV-сервиса (app.pkg.http_clients)
 
     async def create_biometry(self, biometry_data: BiometryCreate, face_photo: UploadFile, current_user: User) -> BiometryResponse:
         # Проверяем права на создание биометрии для biometry_data.user_id
@@ -51,19 +52,21 @@ class BiometryService:
         if not cv_response or not all(k in cv_response for k in ['encrypted_embedding', 'iv', 'secure_hash']):
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="CV model did not return expected data.")
 
-        created_biometry_db = await self.biometry_repo.create_biometry(
-            user_id=biometry_data.user_id,
-            # Данные из CV модели, Убедитесь, что CV модель возвращает байты или строки, которые можно преобразовать в байты
-            encrypted_embedding=bytes.fromhex(cv_response['encrypted_embedding']) if isinstance(cv_response['encrypted_embedding'], str) else cv_response['encrypted_embedding'],
-            iv=bytes.fromhex(cv_response['iv']) if isinstance(cv_response['iv'], str) else cv_response['iv'],
-            secure_hash=bytes.fromhex(cv_response['secure_hash']) if isinstance(cv_response['secure_hash'], str) else cv_response['secure_hash']
-        )
+        # Запрос к CV - до транзакции: соединение не держим на время внешнего вызова
+        async with db.transaction():
+            created_biometry_db = await self.biometry_repo.create_biometry(
+                user_id=biometry_data.user_id,
+                # Данные из CV модели, Убедитесь, что CV модель возвращает байты или строки, которые можно преобразовать в байты
+                encrypted_embedding=bytes.fromhex(cv_response['encrypted_embedding']) if isinstance(cv_response['encrypted_embedding'], str) else cv_response['encrypted_embedding'],
+                iv=bytes.fromhex(cv_response['iv']) if isinstance(cv_response['iv'], str) else cv_response['iv'],
+                secure_hash=bytes.fromhex(cv_response['secure_hash']) if isinstance(cv_response['secure_hash'], str) else cv_response['secure_hash']
+            )
 
-        await AuditLogger.log_action(
-            self.audit_repo, current_user, action="create_biometry",
-            entity_type="biometry", entity_id=created_biometry_db.biometry_id,
-            details={"user_id": str(biometry_data.user_id)}
-        )
+            await AuditLogger.log_action(
+                self.audit_repo, current_user, action="create_biometry",
+                entity_type="biometry", entity_id=created_biometry_db.biometry_id,
+                details={"user_id": str(biometry_data.user_id)}
+            )
 
         return BiometryResponse(
             biometry_id=created_biometry_db.biometry_id,
@@ -87,24 +90,26 @@ class BiometryService:
         if not cv_response or not all(k in cv_response for k in ['encrypted_embedding', 'iv', 'secure_hash']):
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="CV model did not return expected data for update.")
 
-        updated_biometry_db = await self.biometry_repo.update_biometry(
-            biometry_id=biometry_data.biometry_id,
-            encrypted_embedding=bytes.fromhex(cv_response['encrypted_embedding']) if isinstance(cv_response['encrypted_embedding'], str) else cv_response['encrypted_embedding'],
-            iv=bytes.fromhex(cv_response['iv']) if isinstance(cv_response['iv'], str) else cv_response['iv'],
-            secure_hash=bytes.fromhex(cv_response['secure_hash']) if isinstance(cv_response['secure_hash'], str) else cv_response['secure_hash']
-        )
+        async with db.transaction():
+            updated_biometry_db = await self.biometry_repo.update_biometry(
+                biometry_id=biometry_data.biometry_id,
+                encrypted_embedding=bytes.fromhex(cv_response['encrypted_embedding']) if isinstance(cv_response['encrypted_embedding'], str) else cv_response['encrypted_embedding'],
+                iv=bytes.fromhex(cv_response['iv']) if isinstance(cv_response['iv'], str) else cv_response['iv'],
+                secure_hash=bytes.fromhex(cv_response['secure_hash']) if isinstance(cv_response['secure_hash'], str) else cv_response['secure_hash']
+            )
 
-        await AuditLogger.log_action(
-            self.audit_repo, current_user, action="update_biometry",
-            entity_type="biometry", entity_id=biometry_data.biometry_id,
-            details={"user_id": str(target_user.user_id)}
-        )
+            await AuditLogger.log_action(
+                self.audit_repo, current_user, action="update_biometry",
+                entity_type="biometry", entity_id=biometry_data.biometry_id,
+                details={"user_id": str(target_user.user_id)}
+            )
         return BiometryResponse(
             biometry_id=updated_biometry_db.biometry_id,
             user_id=updated_biometry_db.user_id,
             created_at=updated_biometry_db.created_at
         )
 
+    @db.transactional
     async def delete_biometry(self, biometry_data: BiometryDelete, current_user: User):
         target_biometry_db = await self.biometry_repo.get_biometry(biometry_data.biometry_id)
         if not target_biometry_db:
@@ -189,22 +194,21 @@ class BiometryService:
                     face_photo.content_type
                 )
             }
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.cv.url}/process",
-                    files=files_payload,
-                    timeout=float(settings.cv.timeout)  # Убедимся что timeout это float
+            response = await self.cv_client.post(
+                f"{settings.cv.url}/process",
+                files=files_payload,
+                timeout=float(settings.cv.timeout)  # Убедимся что timeout это float
+            )
+            response.raise_for_status()
+            cv_data = response.json()
+            # Валидация ответа CV модели
+            if not isinstance(cv_data, dict) or \
+               not all(key in cv_data for key in ['encrypted_embedding', 'iv', 'secure_hash']):
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail="CV model returned an invalid response format. Missing required keys."
                 )
-                response.raise_for_status()
-                cv_data = response.json()
-                # Валидация ответа CV модели
-                if not isinstance(cv_data, dict) or \
-                   not all(key in cv_data for key in ['encrypted_embedding', 'iv', 'secure_hash']):
-                    raise HTTPException(
-                        status_code=status.HTTP_502_BAD_GATEWAY,
-                        detail="CV model returned an invalid response format. Missing required keys."
-                    )
-                return cv_data
+            return cv_data
         except httpx.TimeoutException:
             raise HTTPException(
                 status_code=status.HTTP_408_REQUEST_TIMEOUT,
@@ -7,7 +7,7 @@ import logging
 import httpx
 from fastapi import HTTPException, status
 
-# from app.db_session import db # Не используется
+from app.db_session import db
 from app.models.device import (Device, DeviceCreate, DeviceDelete, DeviceUpdate,
                                DeviceWakeupPayloadFromCV, DeviceWakeupResponse)  # Добавлены новые модели
 from app.models.user import AccessLevel, User
@@ -20,6 +20,11 @@ from app.repositories.access_log import AccessLogRepo  # Добавлено
 from app.services.audit_utils import AuditLogger  # Добавлено
 from app.services.permission import PermissionService  # Добавлено
 from app.config import settings  # Для URL CV-модели
+from app.pkg.bulk import BulkBatch, BulkReport
+from app.pkg.device_registry import device_registry
+from app.pkg.metrics import StageTimer
+from app.pkg.pagination import Page, PageRequest
+from app.services.device_monitor import probe_device_health
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +37,9 @@ class DeviceService:
         device_repo: DeviceRepo,
         audit_repo: AuditLogRepo,  # Добавлено
         access_log_repo: AccessLogRepo,  # Добавлено
-        permission_service: PermissionService  # Добавлено
+        permission_service: PermissionService,  # Добавлено
+        cv_client: httpx.AsyncClient,
+        device_client: httpx.AsyncClient
     ):
         self.user_repo = user_repo
         self.zone_repo = zone_repo
@@ -40,7 +47,10 @@ class DeviceService:
         self.audit_repo = audit_repo
         self.access_log_repo = access_log_repo
         self.permission_service = permission_service
+        self.cv_client = cv_client  # Общие клиенты с keep-alive (app.pkg.http_clients)
+        self.device_client = device_client
 
+    @db.transactional
     async def create_device(self, device_data: DeviceCreate, current_user: User) -> Device:
         await self.user_repo.min_manager_access_level(current_user)
 
@@ -51,6 +61,7 @@ class DeviceService:
 
         device_id = await self.device_repo.create_device(device_data)
         created_device = await self.device_repo.select_device(device_id=device_id)
+        db.after_commit(lambda: device_registry.put(created_device))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="create_device",
@@ -59,6 +70,36 @@ class DeviceService:
         )
         return created_device
 
+    @db.transactional
+    async def bulk_create_devices(self, batch: BulkBatch[DeviceCreate], current_user: User) -> BulkReport:
+        """Пакетное создание: зоны всей пачки проверяются одним запросом, вставка - одним INSERT."""
+        await self.user_repo.min_manager_access_level(current_user)
+
+        zones = await self.zone_repo.select_existing_ids({device_data.zone_id for _, device_data in batch.pending()})
+        rows = []
+        for row, device_data in batch.pending():
+            if device_data.zone_id not in zones:
+                batch.fail(row, f"Zone with id {device_data.zone_id} not found.")
+            else:
+                rows.append((row, uuid.uuid4(), device_data))
+        if not rows:
+            return batch.report()
+
+        created = await self.device_repo.create_devices([(device_id, device_data) for _, device_id, device_data in rows])
+        for row, device_id, _ in rows:
+            batch.succeed(row, device_id)
+        db.after_commit(lambda: [device_registry.put(device) for device in created])
+
+        await AuditLogger.log_action(
+            self.audit_repo, current_user, action="bulk_create_devices", entity_type="device",
+            details={
+                "created": len(created), "failed": len(batch.results) - len(created),
+                "device_ids": [str(device.device_id) for device in created]
+            }
+        )
+        return batch.report()
+
+    @db.transactional
     async def update_device(self, device_data: DeviceUpdate, current_user: User) -> Device:
         await self.user_repo.min_manager_access_level(current_user)
 
@@ -72,6 +113,7 @@ class DeviceService:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"New zone with id {device_data.zone_id} not found.")
 
         updated_device = await self.device_repo.update_device(device_data)
+        db.after_commit(lambda: device_registry.put(updated_device))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="update_device",
@@ -80,6 +122,7 @@ class DeviceService:
         )
         return updated_device
 
+    @db.transactional
     async def delete_device(self, device_data: DeviceDelete, current_user: User):
         await self.user_repo.min_manager_access_level(current_user)
 
@@ -90,6 +133,7 @@ class DeviceService:
         deleted = await self.device_repo.delete_device(device_data.device_id)
         if not deleted:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Device deletion failed.")
+        db.after_commit(lambda: device_registry.remove(device_data.device_id))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="delete_device",
@@ -98,12 +142,10 @@ class DeviceService:
         )
         return {"message": "Device deleted successfully"}
 
-    async def select_all_devices(self, current_user: User) -> List[Device]:
+    async def select_all_devices(self, current_user: User, page: PageRequest) -> Page[Device]:
         await self.user_repo.min_user_access_level(current_user)  # GUEST и выше могут смотреть устройства
-        devices = await self.device_repo.select_devices()
-        # await asyncio.gather(*[self._update_device_status_in_db(device) for device in devices]) # Обновление статуса в фоне
-        # Для роута select можно не обновлять статус каждого, чтобы не замедлять.
-        # Статус будет обновляться через check_device_status или wakeup.
+        devices = await self.device_repo.select_devices_page(page)
+        # Статус устройств обновляет фоновый DeviceHealthMonitor, здесь ничего не опрашиваем.
         return devices
 
     async def get_device_by_id(self, device_id: uuid.UUID, current_user: User) -> Device:  # Новый метод
@@ -121,27 +163,38 @@ class DeviceService:
 
     async def _check_and_update_device_online_status(self, device: Device) -> bool:
         """Проверяет статус устройства (ping) и обновляет его в БД, если он изменился."""
-        try:
-            async with httpx.AsyncClient(timeout=2.0) as client:
-                # Пример проверки: простой GET-запрос. Может быть ICMP ping или специфичный health-check эндпоинт
-                response = await client.get(f"http://{device.ip}:{device.port}/health")  # /health или /status
-                is_online_now = response.status_code == 200
-        except (httpx.RequestError, httpx.TimeoutException):
-            is_online_now = False
+        is_online_now = await probe_device_health(self.device_client, device, timeout=2.0)
 
         if device.is_online != is_online_now:
             await self.device_repo.update_device_status(device.device_id, is_online_now)
             # Не обновляем device.is_online здесь, т.к. select_device вернет актуальное значение из БД
         return is_online_now
 
-    async def handle_device_event_from_cv(self, ip_config: dict) -> DeviceWakeupResponse:
+    async def _resolve_device_by_address(self, ip_config: dict) -> Device:
+        """Ищет устройство в реестре, при промахе - в БД (и кладет результат в реестр)."""
+        device = device_registry.get_by_address(ip_config.get('ip'), ip_config.get('port'))
+        if device:
+            return device
+        try:
+            port = int(ip_config['port']) if ip_config.get('port') is not None else None
+        except (TypeError, ValueError):
+            port = None
+        device = await self.device_repo.select_device_by_ip_port(ip_config={"ip": ip_config.get('ip'), "port": port})
+        device_registry.put(device)
+        return device
+
+    async def handle_device_event_from_cv(self, ip_config: dict, include_timings: bool = False) -> DeviceWakeupResponse:
         """
         Обрабатывает "wakeup" событие от камеры.
         Камера (или ее шлюз) вызывает этот эндпоинт.
         Этот эндпоинт делает запрос к CV-модели.
+        Длительность каждого этапа пишется в гистограммы "wakeup.<этап>";
+        при include_timings разбивка по этапам возвращается в ответе.
         """
+        timer = StageTimer("wakeup")
         # 1. Получаем информацию об устройстве, которое вызвало wakeup
-        device_info = await self.device_repo.select_device_by_ip_port(ip_config=ip_config)
+        with timer.stage("device_resolve"):
+            device_info = await self._resolve_device_by_address(ip_config)
         if not device_info:
             # Этого не должно произойти, если device_id валидный
             logger.error(f"Wakeup event for non-existent device_id: {ip_config}")
@@ -150,16 +203,16 @@ class DeviceService:
         # 2. Отправляем запрос CV-модели, передавая device_id камеры.
         # CV-модель должна обработать событие с этой камеры и вернуть результат.
         # URL CV-модели может быть другим для этого типа запроса.
-        cv_payload_for_request = {"device_id": str(device_info['device_id'])}
+        cv_payload_for_request = {"device_id": str(device_info.device_id)}
         cv_event_data: Optional[DeviceWakeupPayloadFromCV] = None
         cv_request_error_str = None
 
-        try:
-            async with httpx.AsyncClient() as client:
+        with timer.stage("cv_call"):
+            try:
                 # Пример: CV-модель имеет специальный эндпоинт для событий с камер
                 # URL может быть f"{settings.cv.url}/camera_event" или аналогичный
                 cv_target_url = f"{settings.cv.url}/process_event"  # Уточните этот URL
-                response = await client.post(
+                response = await self.cv_client.post(
                     cv_target_url,
                     json=cv_payload_for_request,
                     timeout=float(settings.cv.timeout)
@@ -167,15 +220,15 @@ class DeviceService:
                 response.raise_for_status()
                 cv_event_data_raw = response.json()
                 cv_event_data = DeviceWakeupPayloadFromCV.model_validate(cv_event_data_raw)
-        except httpx.HTTPStatusError as e:
-            cv_request_error_str = f"CV model error {e.response.status_code}: {e.response.text[:200]}"
-            logger.warning(f"CV request failed for device {device_info['device_id']}: {cv_request_error_str}")
-        except (httpx.RequestError, httpx.TimeoutException) as e:
-            cv_request_error_str = f"CV model request failed: {str(e)}"
-            logger.warning(f"CV request error for device {device_info['device_id']}: {cv_request_error_str}")
-        except Exception as e:  # Pydantic ValidationError и др.
-            cv_request_error_str = f"Error processing CV model response: {str(e)}"
-            logger.error(f"Error with CV response for device {device_info['device_id']}: {cv_request_error_str}")
+            except httpx.HTTPStatusError as e:
+                cv_request_error_str = f"CV model error {e.response.status_code}: {e.response.text[:200]}"
+                logger.warning(f"CV request failed for device {device_info.device_id}: {cv_request_error_str}")
+            except (httpx.RequestError, httpx.TimeoutException) as e:
+                cv_request_error_str = f"CV model request failed: {str(e)}"
+                logger.warning(f"CV request error for device {device_info.device_id}: {cv_request_error_str}")
+            except Exception as e:  # Pydantic ValidationError и др.
+                cv_request_error_str = f"Error processing CV model response: {str(e)}"
+                logger.error(f"Error with CV response for device {device_info.device_id}: {cv_request_error_str}")
 
         # 3. Обработка ответа от CV-модели и логирование в AccessLog
         user_id_from_cv = cv_event_data.user_id if cv_event_data else None
@@ -189,21 +242,23 @@ class DeviceService:
 
         # 4. Проверка прав, если пользователь идентифицирован
         if user_id_from_cv:
-            user = await self.user_repo.select_user(user_id=user_id_from_cv)  # может кинуть 404
+            with timer.stage("user_lookup"):
+                user = await self.user_repo.select_user(user_id=user_id_from_cv)  # может кинуть 404
             if user:
                 if user.access_level == AccessLevel.ADMIN or user.access_level == AccessLevel.ROOT:
                     access_granted = True  # Админы/Руты имеют доступ везде
                 else:
                     # Проверяем права менеджера/пользователя
-                    has_permission = await self.permission_service.check_user_permission_for_device(user, device_info['device_id'])
+                    with timer.stage("permission_check"):
+                        has_permission = await self.permission_service.check_user_permission_for_device(user, device_info.device_id)
                     if has_permission:
                         access_granted = True
                     else:
                         final_event_type = "access_denied_no_permission"
-                        logger.info(f"Access denied for user {user_id_from_cv} to device {device_info['device_id']}: No permission.")
+                        logger.info(f"Access denied for user {user_id_from_cv} to device {device_info.device_id}: No permission.")
             else:  # Пользователь из CV не найден в нашей БД
                 final_event_type = "access_denied_unknown_user"
-                logger.warning(f"User {user_id_from_cv} from CV model not found in local DB for device {device_info['device_id']}.")
+                logger.warning(f"User {user_id_from_cv} from CV model not found in local DB for device {device_info.device_id}.")
         else:  # Пользователь не идентифицирован CV-моделью
             if cv_request_error_str:  # Если была ошибка связи с CV
                 final_event_type = "cv_error"
@@ -214,35 +269,38 @@ class DeviceService:
         # 5. Запись в AccessLog
         log_entry = AccessLogCreate(
             user_id=user_id_from_cv,
-            device_id=device_info['device_id'],
+            device_id=device_info.device_id,
             biometry_id=biometry_id_from_cv,
             event_type=final_event_type,
             confidence=confidence_from_cv,
             path_to_photo=photo_path_from_cv,
             access_granted=access_granted
         )
-        await self.access_log_repo.create(log_entry)
+        with timer.stage("access_log_write"):
+            await self.access_log_repo.enqueue(log_entry)  # Запись в фоне, не задерживает открытие двери
 
         # 6. Если доступ предоставлен, отправить команду на открытие двери (GET запрос)
         if access_granted:
-            try:
-                async with httpx.AsyncClient(timeout=3.0) as client:
+            with timer.stage("door_open"):
+                try:
                     # Пример команды: GET /open. URL и метод могут отличаться.
                     # IP и порт берем из device_info
                     open_url = f"http://{device_info.ip}:{device_info.port}/open_door"  # Уточните этот URL
-                    open_response = await client.get(open_url)
+                    open_response = await self.device_client.get(open_url, timeout=3.0)
                     open_response.raise_for_status()  # Проверка на ошибки от устройства
-                    logger.info(f"Door open command sent to device {device_info['device_id']} for user {user_id_from_cv}. Status: {open_response.status_code}")
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Failed to send open command to device {device_info['device_id']}. Device error {e.response.status_code}: {e.response.text[:100]}")
-                # Можно добавить запись в access_log о неудачной команде открытия, если нужно
-            except (httpx.RequestError, httpx.TimeoutException) as e:
-                logger.error(f"Failed to send open command to device {device_info['device_id']}. Network error: {str(e)}")
-
+                    logger.info(f"Door open command sent to device {device_info.device_id} for user {user_id_from_cv}. Status: {open_response.status_code}")
+                except httpx.HTTPStatusError as e:
+                    logger.error(f"Failed to send open command to device {device_info.device_id}. Device error {e.response.status_code}: {e.response.text[:100]}")
+                    # Можно добавить запись в access_log о неудачной команде открытия, если нужно
+                except (httpx.RequestError, httpx.TimeoutException) as e:
+                    logger.error(f"Failed to send open command to device {device_info.device_id}. Network error: {str(e)}")
+
+        timings = timer.finish()
         return DeviceWakeupResponse(
-            message=f"Event '{final_event_type}' processed for device {device_info['device_id']}.",
+            message=f"Event '{final_event_type}' processed for device {device_info.device_id}.",
             access_granted=access_granted,
             final_event_type=final_event_type,
-            processed_device_id=device_info['device_id'],
-            identified_user_id=user_id_from_cv
+            processed_device_id=device_info.device_id,
+            identified_user_id=user_id_from_cv,
+            timings_ms=timings if include_timings else None
         )
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import random
+from typing import List, Optional, Tuple
+import uuid
+
+import httpx
+
+from app.config import settings
+from app.models.device import Device
+from app.pkg.device_registry import device_registry
+from app.repositories.device import DeviceRepo
+
+logger = logging.getLogger(__name__)
+
+
+async def probe_device_health(client: httpx.AsyncClient, device: Device, timeout: float) -> bool:
+    """GET /health устройства; любой сетевой сбой или не-200 ответ считается offline."""
+    try:
+        response = await client.get(f"http://{device.ip}:{device.port}/health", timeout=timeout)
+        return response.status_code == 200
+    except (httpx.RequestError, httpx.TimeoutException):
+        return False
+
+
+class DeviceHealthMonitor:
+    """
+    Фоновый опрос /health всех устройств (запускается в lifespan).
+
+    Устройства опрашиваются параллельно, но не более concurrency одновременно;
+    все изменения is_online/last_heartbeat записываются одним UPDATE за цикл.
+    Интервал между циклами случайно смещается на ±jitter, чтобы воркеры не опрашивали камеры синхронно.
+    """
+
+    def __init__(self, device_repo: DeviceRepo, client: httpx.AsyncClient):
+        self.device_repo = device_repo
+        self.client = client
+        self.config = settings.device_monitor
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self.config.enabled:
+            self._task = asyncio.create_task(self._run(), name="device-health-monitor")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            delay = self.config.interval * (1 + random.uniform(-self.config.jitter, self.config.jitter))
+            await asyncio.sleep(max(delay, 0.0))
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Device health check cycle failed")
+
+    async def run_once(self) -> int:
+        """Один цикл опроса. Возвращает число устройств, у которых сменился статус."""
+        devices = await self.device_repo.select_devices(use_primary=True)  # Статусы сравниваем с актуальными
+        semaphore = asyncio.Semaphore(self.config.concurrency)
+
+        async def probe(device: Device) -> bool:
+            async with semaphore:
+                return await probe_device_health(self.client, device, self.config.timeout)
+
+        results = await asyncio.gather(*[probe(device) for device in devices])
+
+        statuses: List[Tuple[uuid.UUID, bool]] = []
+        changed = 0
+        for device, is_online in zip(devices, results):
+            if device.is_online != is_online:
+                changed += 1
+                statuses.append((device.device_id, is_online))
+                if device_registry.get(device.device_id):
+                    device_registry.put(device.model_copy(update={"is_online": is_online}))
+            elif is_online:
+                statuses.append((device.device_id, is_online))  # Обновляем last_heartbeat
+
+        if statuses:
+            await self.device_repo.update_devices_status(statuses)
+        if changed:
+            logger.info(f"Device health check: {changed} of {len(devices)} devices changed status")
+        return changed
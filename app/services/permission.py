@@ -3,6 +3,7 @@ from typing import List
 from fastapi import HTTPException, status
 import logging
 
+from app.db_session import db
 from app.models.user import User, AccessLevel
 from app.models.permission import Permission, PermissionCreate, PermissionUpdate, PermissionDelete
 from app.repositories.user import UserRepo
@@ -11,6 +12,10 @@ from app.repositories.device import DeviceRepo
 from app.repositories.zone import ZoneRepo
 from app.services.audit_utils import AuditLogger  # Добавлено
 from app.repositories.audit_log import AuditLogRepo  # Добавлено
+from app.pkg.bulk import BulkBatch, BulkReport
+from app.pkg.device_registry import device_registry
+from app.pkg.pagination import Page, PageRequest
+from app.pkg.permission_index import permission_index
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +35,7 @@ class PermissionService:
         self.zone_repo = zone_repo
         self.audit_repo = audit_repo  # Добавлено
 
+    @db.transactional
     async def create_permission(self, data: PermissionCreate, current_user: User) -> Permission:
         await self.user_repo.min_manager_access_level(current_user)  # Менеджер и выше
 
@@ -58,6 +64,7 @@ class PermissionService:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid target_type.")
 
         permission = await self.permission_repo.create(data, current_user.user_id)
+        db.after_commit(lambda: permission_index.put(permission))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="create_permission",
@@ -65,11 +72,59 @@ class PermissionService:
             details={
                 "granted_to_user_id": str(data.user_id),
                 "target_type": data.target_type,
-                "target_id": str(data.target_id)
+                "target_id": str(data.target_id),
+                "schedule": data.schedule.model_dump(mode="json") if data.schedule else None
             }
         )
         return permission
 
+    @db.transactional
+    async def bulk_create_permissions(self, batch: BulkBatch[PermissionCreate], current_user: User) -> BulkReport:
+        """
+        Пакетная выдача прав: пользователи, устройства и зоны всей пачки проверяются
+        тремя запросами (а не по запросу на строку), вставка - одним INSERT.
+        """
+        await self.user_repo.min_manager_access_level(current_user)
+
+        pending = batch.pending()
+        user_levels = await self.user_repo.select_access_levels({data.user_id for _, data in pending})
+        devices = await self.device_repo.select_existing_ids(
+            {data.target_id for _, data in pending if data.target_type == 'DEVICE'}
+        )
+        zones = await self.zone_repo.select_existing_ids(
+            {data.target_id for _, data in pending if data.target_type == 'ZONE'}
+        )
+        targets = {'DEVICE': devices, 'ZONE': zones}
+
+        rows = []
+        for row, data in pending:
+            if data.user_id not in user_levels:
+                batch.fail(row, f"User with id {data.user_id} not found.")
+            elif current_user.access_level != AccessLevel.ROOT and user_levels[data.user_id] >= current_user.access_level:
+                batch.fail(row, "Cannot grant permissions to a user with an equal or higher access level.")
+            elif data.target_id not in targets[data.target_type]:
+                batch.fail(row, f"{data.target_type.capitalize()} with id {data.target_id} not found.")
+            else:
+                rows.append((row, uuid.uuid4(), data))
+        if not rows:
+            return batch.report()
+
+        created = await self.permission_repo.create_many(
+            [(permission_id, data) for _, permission_id, data in rows], current_user.user_id
+        )
+        for row, permission_id, _ in rows:
+            batch.succeed(row, permission_id)
+        db.after_commit(lambda: [permission_index.put(permission) for permission in created])
+
+        await AuditLogger.log_action(
+            self.audit_repo, current_user, action="bulk_create_permissions", entity_type="permission",
+            details={
+                "created": len(created), "failed": len(batch.results) - len(created),
+                "permission_ids": [str(permission.permission_id) for permission in created]
+            }
+        )
+        return batch.report()
+
     async def get_permission(self, permission_id: uuid.UUID, current_user: User) -> Permission:
         await self.user_repo.min_manager_access_level(current_user)
         permission = await self.permission_repo.get_by_id(permission_id)
@@ -84,7 +139,7 @@ class PermissionService:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient privileges to view this permission.")
         return permission
 
-    async def get_permissions_for_user(self, user_id_to_view: uuid.UUID, current_user: User) -> List[Permission]:
+    async def get_permissions_for_user(self, user_id_to_view: uuid.UUID, current_user: User, page: PageRequest) -> Page[Permission]:
         await self.user_repo.min_manager_access_level(current_user)
 
         user_to_view = await self.user_repo.select_user(user_id=user_id_to_view)
@@ -94,12 +149,13 @@ class PermissionService:
         if current_user.access_level < AccessLevel.ADMIN and user_to_view.access_level >= current_user.access_level and current_user.user_id != user_id_to_view:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient privileges to view permissions of this user.")
 
-        return await self.permission_repo.get_for_user(user_id_to_view)
+        return await self.permission_repo.get_for_user(user_id_to_view, page)
 
-    async def get_all_permissions(self, current_user: User, limit: int = 100, offset: int = 0) -> List[Permission]:
+    async def get_all_permissions(self, current_user: User, page: PageRequest) -> Page[Permission]:
         await self.user_repo.min_admin_access_level(current_user)  # Только админ/рут видят все права
-        return await self.permission_repo.get_all(limit, offset)
+        return await self.permission_repo.get_all(page)
 
+    @db.transactional
     async def update_permission(self, permission_id: uuid.UUID, data: PermissionUpdate, current_user: User) -> Permission:
         await self.user_repo.min_manager_access_level(current_user)
 
@@ -115,6 +171,7 @@ class PermissionService:
         updated_permission = await self.permission_repo.update(permission_id, data, current_user.user_id)
         if not updated_permission:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Permission not found or could not be updated")
+        db.after_commit(lambda: permission_index.put(updated_permission))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="update_permission",
@@ -123,6 +180,7 @@ class PermissionService:
         )
         return updated_permission
 
+    @db.transactional
     async def delete_permission(self, permission_id: uuid.UUID, current_user: User):
         await self.user_repo.min_manager_access_level(current_user)
 
@@ -138,6 +196,7 @@ class PermissionService:
         deleted = await self.permission_repo.delete(permission_id)
         if not deleted:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not delete permission")
+        db.after_commit(lambda: permission_index.remove(permission_id))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="delete_permission",
@@ -145,17 +204,33 @@ class PermissionService:
         )
         return {"message": "Permission deleted successfully"}
 
-    async def check_user_permission_for_device(self, user: User, device_id: uuid.UUID) -> bool:
-        """Проверяет, есть ли у пользователя прямое разрешение на устройство или разрешение на зону, к которой принадлежит устройство."""
-        # 1. Проверка прямого разрешения на устройство
-        has_direct_permission = await self.permission_repo.check_active_permission(user.user_id, 'DEVICE', device_id)
-        if has_direct_permission:
-            return True
-
-        # 2. Проверка разрешения на зону устройства
-        device = await self.device_repo.select_device(device_id=device_id)  # может бросить 404, если устройства нет
-        if device and device.zone_id:
-            has_zone_permission = await self.permission_repo.check_active_permission(user.user_id, 'ZONE', device.zone_id)
-            if has_zone_permission:
-                return True
-        return False
+    async def check_user_permission_for_device(
+        self, user: User, device_id: uuid.UUID, ignore_schedule: bool = False
+    ) -> bool:
+        """
+        Проверяет, есть ли у пользователя прямое разрешение на устройство или разрешение на зону, к которой принадлежит устройство.
+        ignore_schedule=True - для видимости данных (журналы): расписание ограничивает проход, а не просмотр.
+        """
+        # Зона берется из реестра устройств, права - из индекса в памяти: запросов к БД нет.
+        # Изменения прав из других воркеров индекс получает через LISTEN permission_changed
+        # (см. InMemoryStateConfig о задержке без него)
+        device = device_registry.get(device_id)
+        if not device:
+            device = await self.device_repo.select_device(device_id=device_id)  # может бросить 404, если устройства нет
+            device_registry.put(device)
+        return permission_index.is_granted(user.user_id, device_id, device.zone_id, ignore_schedule=ignore_schedule)
+
+    async def get_permitted_device_ids(self, user: User) -> List[uuid.UUID]:
+        """
+        Все устройства, доступные пользователю напрямую или через зону - для видимости журналов,
+        поэтому без учета расписания. Обычно из индекса прав и реестра устройств (без БД);
+        они сверяются с БД раз в in_memory.resync_interval, и права, выданные на другом
+        воркере, появляются с этой задержкой. Пока индекс не загружен или в нем ничего
+        не нашлось (например, право только что выдано на другом воркере) - запрос в БД.
+        """
+        if permission_index.loaded and device_registry.loaded:
+            device_ids, zone_ids = permission_index.granted_targets(user.user_id, ignore_schedule=True)
+            device_ids.update(device_registry.in_zones(zone_ids))
+            if device_ids:
+                return list(device_ids)
+        return await self.permission_repo.select_permitted_device_ids(user.user_id)
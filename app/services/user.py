@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 from datetime import datetime, timedelta
 from typing import List
@@ -8,13 +9,17 @@ from fastapi.responses import JSONResponse
 # from httpx import AsyncClient, Timeout, _exceptions # Не используется здесь
 
 from app.config import settings
-from app.db_session import db  # Не используется здесь напрямую, все через репозиторий
+from app.db_session import db
 from app.models.user import (AccessLevel, User, UserCreate, UserDelete,
                              UserLogin, UserUpdate, UserResponse)  # Добавлен UserResponse
+from app.pkg.auth import evict_cached_user
+from app.pkg.bulk import BulkBatch, BulkReport
 from app.pkg.hasher import Hasher
-from app.repositories.user import UserRepo
+from app.pkg.pagination import Page, PageRequest
+from app.repositories.user import UserRepo, user_response_mapper
 from app.repositories.audit_log import AuditLogRepo  # Добавлено
 from app.services.audit_utils import AuditLogger  # Добавлено
+from app.pkg.permission_index import permission_index
 
 
 class UserService:
@@ -22,6 +27,7 @@ class UserService:
         self.user_repo = user_repo
         self.audit_repo = audit_repo  # Сохраняем
 
+    @db.transactional
     async def create_user(self, user_data: UserCreate, current_user: User) -> UserResponse:
         await self.user_repo.min_admin_access_level(current_user)
 
@@ -41,10 +47,51 @@ class UserService:
             details={"login": user_data.login, "access_level": user_data.access_level}
         )
         # Возвращаем UserResponse, а не User, т.к. пароль не должен утекать
-        return UserResponse.model_validate(created_user_full)
+        return user_response_mapper.from_model(created_user_full)
 
+    async def bulk_create_users(self, batch: BulkBatch[UserCreate], current_user: User) -> BulkReport:
+        """
+        Пакетное создание: проверки по всей пачке, bcrypt параллельно в пуле хешера
+        (до захвата соединения), одна вставка и одна запись аудита в одной транзакции.
+        """
+        await self.user_repo.min_admin_access_level(current_user)
+
+        logins = set()
+        for row, user_data in batch.pending():
+            # Как в UserRepo.create_user: только уровни ниже собственного
+            if user_data.access_level >= current_user.access_level:
+                batch.fail(row, "Cannot create users with same access level or higher")
+            elif user_data.login in logins:
+                batch.fail(row, f"Duplicate login {user_data.login} in upload")
+            else:
+                logins.add(user_data.login)
+
+        rows = batch.pending()
+        if not rows:
+            return batch.report()
+        password_hashes = await asyncio.gather(
+            *[Hasher.get_password_hash_async(user_data.password) for _, user_data in rows]
+        )
+
+        async with db.transaction():
+            created = await self.user_repo.create_users([user_data for _, user_data in rows], password_hashes)
+            for row, user_data in rows:
+                if user_data.login in created:
+                    batch.succeed(row, created[user_data.login])
+                else:
+                    batch.fail(row, f"User {user_data.login} already exists")
+            await AuditLogger.log_action(
+                self.audit_repo, current_user, action="bulk_create_users", entity_type="user",
+                details={"created": len(created), "failed": len(batch.results) - len(created), "logins": list(created)}
+            )
+        return batch.report()
+
+    @db.transactional
     async def update_user(self, user_data: UserUpdate, current_user: User) -> UserResponse:
         await self.user_repo.min_admin_access_level(current_user)
+        # bcrypt - до первого запроса: единица работы берет соединение и открывает транзакцию
+        # только при первом db.connection(), поэтому хеш не считается при занятом соединении
+        password_hash = await Hasher.get_password_hash_async(user_data.password) if user_data.password else None
 
         selected_user = await self.user_repo.select_user(user_id=user_data.user_id)
         if not selected_user:  # user_repo.select_user уже бросает 404, но для ясности
@@ -66,15 +113,17 @@ class UserService:
                 detail="Cannot set user access level higher than your own."
             )
 
-        updated_user_internal = await self.user_repo.update_user(user_data, selected_user, current_user)
+        updated_user_internal = await self.user_repo.update_user(user_data, password_hash, selected_user, current_user)
+        db.after_commit(lambda: evict_cached_user(user_data.user_id))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="update_user",
             entity_type="user", entity_id=user_data.user_id,
             details={"changes": user_data.model_dump(exclude_unset=True, exclude={'password'})}  # Пароль не логируем
         )
-        return UserResponse.model_validate(updated_user_internal)
+        return user_response_mapper.from_model(updated_user_internal)
 
+    @db.transactional
     async def delete_user(self, user_data: UserDelete, current_user: User):
         await self.user_repo.min_admin_access_level(current_user)
 
@@ -97,6 +146,8 @@ class UserService:
         deleted = await self.user_repo.delete_user(selected_user, current_user)
         if not deleted:  # На случай если delete_user вернет False без исключения
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User deletion failed.")
+        db.after_commit(lambda: permission_index.remove_user(user_data.user_id))  # Права удалены каскадно
+        db.after_commit(lambda: evict_cached_user(user_data.user_id))
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="delete_user",
@@ -116,7 +167,7 @@ class UserService:
                 detail='User account is inactive.'
             )
 
-        check_verify = Hasher.verify_password(user_login.password, selected_user.password)
+        check_verify = await Hasher.verify_password_async(user_login.password, selected_user.password)
         if check_verify:
             return selected_user.user_id
         else:
@@ -127,11 +178,14 @@ class UserService:
                 detail='Incorrect login or password.'
             )
 
-    async def select_all_users(self, current_user: User) -> List[UserResponse]:
+    async def select_all_users(self, current_user: User, page: PageRequest) -> Page[UserResponse]:
         await self.user_repo.min_admin_access_level(current_user)
-        users_internal = await self.user_repo.select_users()
+        users_internal = await self.user_repo.select_users(page)
         # Преобразуем User в UserResponse
-        return [UserResponse.model_validate(user) for user in users_internal]
+        return Page(
+            items=user_response_mapper.many(user.__dict__ for user in users_internal.items),
+            next_cursor=users_internal.next_cursor
+        )
 
     async def root_create(self):
         # Этот метод вызывается при старте, current_user нет. Логировать можно, но user_id будет системным.
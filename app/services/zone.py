@@ -1,13 +1,15 @@
 from fastapi import HTTPException, status
 import uuid  # Добавлено
 from typing import List
-# from app.db_session import db # Не используется
+from app.db_session import db
 from app.models.user import AccessLevel, User
 from app.models.zone import Zone, ZoneCreate, ZoneDelete, ZoneUpdate
 from app.repositories.user import UserRepo
 from app.repositories.zone import ZoneRepo
 from app.repositories.audit_log import AuditLogRepo  # Добавлено
 from app.services.audit_utils import AuditLogger  # Добавлено
+from app.pkg.device_registry import device_registry
+from app.pkg.pagination import Page, PageRequest
 
 
 class ZoneService:
@@ -16,6 +18,7 @@ class ZoneService:
         self.zone_repo = zone_repo
         self.audit_repo = audit_repo  # Сохраняем
 
+    @db.transactional
     async def create_zone(self, zone_data: ZoneCreate, current_user: User) -> Zone:
         await self.user_repo.min_manager_access_level(current_user)
         zone_id = await self.zone_repo.create_zone(zone_data)
@@ -28,6 +31,7 @@ class ZoneService:
         )
         return created_zone
 
+    @db.transactional
     async def update_zone(self, zone_data: ZoneUpdate, current_user: User) -> Zone:
         await self.user_repo.min_manager_access_level(current_user)
         # Проверяем, что зона существует перед обновлением
@@ -44,6 +48,7 @@ class ZoneService:
         )
         return updated_zone
 
+    @db.transactional
     async def delete_zone(self, zone_data: ZoneDelete, current_user: User):
         await self.user_repo.min_manager_access_level(current_user)
         # Проверяем, что зона существует перед удалением
@@ -54,6 +59,7 @@ class ZoneService:
         deleted = await self.zone_repo.delete_zone(zone_data.zone_id)
         if not deleted:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Zone deletion failed.")
+        db.after_commit(lambda: device_registry.remove_zone(zone_data.zone_id))  # Устройства зоны удалены каскадно
 
         await AuditLogger.log_action(
             self.audit_repo, current_user, action="delete_zone",
@@ -62,9 +68,9 @@ class ZoneService:
         )
         return {"message": "Zone deleted successfully"}
 
-    async def select_all_zones(self, current_user: User) -> List[Zone]:
+    async def select_all_zones(self, current_user: User, page: PageRequest) -> Page[Zone]:
         await self.user_repo.min_user_access_level(current_user)  # GUEST и выше могут смотреть зоны
-        return await self.zone_repo.select_zones()
+        return await self.zone_repo.select_zones(page)
 
     async def get_zone_by_id(self, zone_id: uuid.UUID, current_user: User) -> Zone:  # Новый метод
         await self.user_repo.min_user_access_level(current_user)
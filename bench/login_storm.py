@@ -0,0 +1,58 @@
+"""
+Задержка /device/wakeup под потоком логинов: сравнение режимов хеширования паролей.
+
+Для каждого значения settings.hasher.executor запускает bench.wakeup с одинаковой
+нагрузкой на wakeup и login-concurrency параллельными логинами и печатает
+p50/p95/p99 wakeup и число логинов в секунду.
+
+    python -m bench.login_storm --rate 50 --duration 15 --login-concurrency 20
+    python -m bench.login_storm --modes inline process --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+def run_mode(mode: str, args) -> dict:
+    out = os.path.join(tempfile.gettempdir(), f"login-storm-{mode}.json")
+    command = [
+        sys.executable, "-m", "bench.wakeup",
+        "--rate", str(args.rate), "--duration", str(args.duration), "--warmup", str(args.warmup),
+        "--login-concurrency", str(args.login_concurrency), "--json-out", out,
+        "--backend-env", f"HASHER__EXECUTOR={mode}",
+    ]
+    if args.hash_workers:
+        command += ["--backend-env", f"HASHER__WORKERS={args.hash_workers}"]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL if not args.verbose else None)
+    with open(out) as f:
+        return json.load(f)
+
+
+def main(args) -> int:
+    print(f"{'executor':<10} {'p50':>9} {'p95':>9} {'p99':>9} {'wakeup rps':>11} {'login rps':>10}")
+    for mode in args.modes:
+        result = run_mode(mode, args)
+        latency = result["latency_ms"]
+        print(
+            f"{mode:<10} {latency['p50']:>9} {latency['p95']:>9} {latency['p99']:>9} "
+            f"{result['throughput_rps']:>11} {result['logins_rps']:>10}"
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--login-concurrency", type=int, default=20)
+    parser.add_argument("--hash-workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,156 @@
+"""
+Дифференциальная проверка PermissionIndex против SQL-пути.
+
+На случайных данных (пользователи, зоны, устройства, права с окнами действия в
+прошлом/настоящем/будущем) сравнивает решения индекса в памяти с решениями
+PermissionRepo.check_active_permission, затем применяет случайные изменения и
+удаления прав через репозиторий + инкрементальные обновления индекса и сравнивает снова.
+
+Запуск (нужна локальная БД со схемой из init.sql):
+    python -m bench.permission_index_diff --checks 5000 --seed 42
+Созданные данные удаляются по завершении.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import uuid
+from datetime import timedelta
+
+from app.config import settings
+from app.db_session import db
+from app.models.permission import PermissionCreate, PermissionUpdate
+from app.pkg.device_registry import DeviceRegistry
+from app.pkg.permission_index import PermissionIndex, utcnow
+from app.repositories.device import DeviceRepo
+from app.repositories.permission import PermissionRepo
+
+
+def random_window(rnd: random.Random):
+    """Окно действия с границами не ближе минуты к текущему моменту."""
+    now = utcnow()
+    minutes = lambda: timedelta(minutes=rnd.randint(1, 60 * 24 * 30))
+    kind = rnd.choice(["active", "active_open", "expired", "future", "no_from"])
+    if kind == "active":
+        return now - minutes(), now + minutes()
+    if kind == "active_open":
+        return now - minutes(), None
+    if kind == "expired":
+        end = now - minutes()
+        return end - minutes(), end
+    if kind == "future":
+        start = now + minutes()
+        return start, rnd.choice([None, start + minutes()])
+    return None, rnd.choice([None, now + minutes(), now - minutes()])
+
+
+async def seed(conn, rnd: random.Random, users: int, zones: int, devices: int):
+    tag = uuid.uuid4().hex[:8]
+    user_ids = [
+        await conn.fetchval(
+            "INSERT INTO public.user (login, password, access_level) VALUES ($1, 'x', 1) RETURNING user_id;",
+            f"diff-{tag}-{i}"
+        ) for i in range(users)
+    ]
+    zone_ids = [
+        await conn.fetchval("INSERT INTO public.zone (name) VALUES ($1) RETURNING zone_id;", f"diff-{tag}-{i}")
+        for i in range(zones)
+    ]
+    device_ids = [
+        await conn.fetchval(
+            "INSERT INTO public.device (name, ip, port, zone_id) VALUES ($1, $2, $3, $4) RETURNING device_id;",
+            f"diff-{tag}-{i}", f"10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}",
+            rnd.randint(1, 65535), rnd.choice(zone_ids)
+        ) for i in range(devices)
+    ]
+    return user_ids, zone_ids, device_ids
+
+
+async def sql_decision(user_id, device_id, zone_id) -> bool:
+    if await PermissionRepo.check_active_permission(user_id, 'DEVICE', device_id):
+        return True
+    return await PermissionRepo.check_active_permission(user_id, 'ZONE', zone_id)
+
+
+async def compare(index: PermissionIndex, registry: DeviceRegistry, rnd, user_ids, device_ids, checks: int) -> int:
+    mismatches = 0
+    for _ in range(checks):
+        user_id, device_id = rnd.choice(user_ids), rnd.choice(device_ids)
+        zone_id = registry.get(device_id).zone_id
+        expected = await sql_decision(user_id, device_id, zone_id)
+        actual = index.is_granted(user_id, device_id, zone_id)
+        if expected != actual:
+            mismatches += 1
+            print(f"MISMATCH user={user_id} device={device_id}: sql={expected} index={actual}", file=sys.stderr)
+    return mismatches
+
+
+async def main(args) -> int:
+    rnd = random.Random(args.seed)
+    await db.connect(args.dsn)
+    if not db.pool:
+        print("Could not connect to database", file=sys.stderr)
+        return 2
+
+    async with db.pool.acquire() as conn:
+        user_ids, zone_ids, device_ids = await seed(conn, rnd, args.users, args.zones, args.devices)
+    try:
+        assigner = user_ids[0]
+        permission_ids = []
+        for _ in range(args.permissions):
+            target_type = rnd.choice(['DEVICE', 'ZONE'])
+            valid_from, valid_to = random_window(rnd)
+            permission = await PermissionRepo.create(
+                PermissionCreate(
+                    user_id=rnd.choice(user_ids),
+                    target_type=target_type,
+                    target_id=rnd.choice(device_ids if target_type == 'DEVICE' else zone_ids),
+                    valid_from=valid_from,
+                    valid_to=valid_to,
+                ),
+                assigner
+            )
+            permission_ids.append(permission.permission_id)
+
+        registry = DeviceRegistry()
+        registry.load(await DeviceRepo.select_devices(use_primary=True))
+        index = PermissionIndex()
+        index.load(await PermissionRepo.select_not_expired())
+
+        mismatches = await compare(index, registry, rnd, user_ids, device_ids, args.checks)
+        print(f"initial: {args.checks} checks, {mismatches} mismatches")
+
+        # Инкрементальные изменения: перенос окон и отзыв прав
+        for permission_id in rnd.sample(permission_ids, k=len(permission_ids) // 3):
+            if rnd.random() < 0.5:
+                valid_from, valid_to = random_window(rnd)
+                updated = await PermissionRepo.update(
+                    permission_id, PermissionUpdate(valid_from=valid_from, valid_to=valid_to), assigner
+                )
+                index.put(updated)
+            else:
+                await PermissionRepo.delete(permission_id)
+                index.remove(permission_id)
+
+        incremental = await compare(index, registry, rnd, user_ids, device_ids, args.checks)
+        print(f"after incremental updates: {args.checks} checks, {incremental} mismatches")
+        return 1 if mismatches or incremental else 0
+    finally:
+        async with db.pool.acquire() as conn:
+            await conn.execute("DELETE FROM public.permission WHERE user_id = ANY($1::uuid[]);", user_ids)
+            await conn.execute("DELETE FROM public.device WHERE device_id = ANY($1::uuid[]);", device_ids)
+            await conn.execute("DELETE FROM public.zone WHERE zone_id = ANY($1::uuid[]);", zone_ids)
+            await conn.execute("DELETE FROM public.user WHERE user_id = ANY($1::uuid[]);", user_ids)
+        await db.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=settings.db.db_dsn)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--zones", type=int, default=5)
+    parser.add_argument("--devices", type=int, default=40)
+    parser.add_argument("--permissions", type=int, default=300)
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=None)
+    sys.exit(asyncio.run(main(parser.parse_args())))
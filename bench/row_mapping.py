@@ -0,0 +1,98 @@
+"""
+Микробенчмарк сборки моделей из строк asyncpg: ручной конструктор (как раньше в
+UserRepo), model_validate(dict(row)) (как раньше в AccessLogRepo) и RowMapper.
+
+Строки генерируются запросом (generate_series) в форме public.user и public.access_log,
+в таблицы ничего не пишется. Нужна только доступная БД:
+    python -m bench.row_mapping --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import asyncpg
+
+from app.config import settings
+from app.models.access_log import AccessLog
+from app.models.user import User, UserResponse
+from app.pkg.row_mapper import RowMapper
+
+USER_ROWS = """
+    SELECT gen_random_uuid() AS user_id, 'user' || i AS login, repeat('x', 60) AS password,
+           'Full Name ' || i AS full_name, NULL::varchar AS phone, i % 5 AS access_level,
+           NULL::varchar AS employee_id, 'dept' AS department, true AS is_active,
+           now()::timestamp AS created_at, NULL::timestamp AS updated_at
+    FROM generate_series(1, $1) AS i;
+"""
+
+ACCESS_LOG_ROWS = """
+    SELECT gen_random_uuid() AS access_log_id, gen_random_uuid() AS user_id, gen_random_uuid() AS device_id,
+           NULL::uuid AS biometry_id, 'face_recognized'::varchar AS event_type, 0.97::float AS confidence,
+           '/photos/' || i || '.jpg' AS path_to_photo, (i % 3 = 0) AS access_granted,
+           now()::timestamp AS created_at
+    FROM generate_series(1, $1) AS i;
+"""
+
+
+def user_constructor(rows):
+    return [
+        User(
+            user_id=str(user['user_id']),
+            login=user['login'],
+            password=user['password'],
+            full_name=user['full_name'],
+            phone=user['phone'],
+            access_level=user['access_level'],
+            employee_id=user['employee_id'],
+            department=user['department'],
+            is_active=user['is_active'],
+            created_at=user['created_at'],
+            updated_at=user['updated_at']
+        ) for user in rows
+    ]
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def main(args) -> int:
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        user_rows = await conn.fetch(USER_ROWS, args.rows)
+        log_rows = await conn.fetch(ACCESS_LOG_ROWS, args.rows)
+    finally:
+        await conn.close()
+
+    user_mapper, response_mapper, log_mapper = RowMapper(User), RowMapper(UserResponse), RowMapper(AccessLog)
+    users = user_mapper.many(user_rows)
+    assert users[0] == user_constructor(user_rows[:1])[0]
+
+    cases = [
+        ("user: User(...) per field", lambda: user_constructor(user_rows)),
+        ("user: model_validate(dict(row))", lambda: [User.model_validate(dict(r)) for r in user_rows]),
+        ("user: RowMapper.many", lambda: user_mapper.many(user_rows)),
+        ("user -> UserResponse.model_validate", lambda: [UserResponse.model_validate(u) for u in users]),
+        ("user -> RowMapper.from_model", lambda: [response_mapper.from_model(u) for u in users]),
+        ("user -> RowMapper.many(__dict__)", lambda: response_mapper.many([u.__dict__ for u in users])),
+        ("access_log: model_validate(dict(row))", lambda: [AccessLog.model_validate(dict(r)) for r in log_rows]),
+        ("access_log: RowMapper.many", lambda: log_mapper.many(log_rows)),
+    ]
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for name, func in cases:
+        print(f"  {name:<40} {timed(func, args.repeat):8.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=settings.db.db_dsn)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,93 @@
+"""
+Цепочка "создать зону -> перечитать -> записать аудит" (как ZoneService.create_zone)
+при отдельном соединении на каждый вызов репозитория и в одной единице работы
+(db.transaction()): операций в секунду, p50/p95 и захватов пула на операцию
+при concurrency параллельных операций на пуле из pool-size соединений.
+
+Пишет в public.zone и public.audit_log, созданные строки удаляет в конце:
+    python -m bench.unit_of_work --ops 2000 --concurrency 50 --pool-size 10
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+from app.config import settings
+from app.db_session import db
+from app.models.audit_log import AuditLogCreate
+from app.models.zone import ZoneCreate
+from app.pkg.metrics import metrics
+from app.repositories.audit_log import AuditLogRepo
+from app.repositories.zone import ZoneRepo
+
+BENCH_ACTION = "bench_uow"
+
+
+async def create_zone(user_id: uuid.UUID, name: str) -> None:
+    zone_id = await ZoneRepo.create_zone(ZoneCreate(name=name))
+    await ZoneRepo.select_zone(zone_id=zone_id)
+    await AuditLogRepo.record(AuditLogCreate(
+        user_id=user_id, action=BENCH_ACTION, entity_type="zone", entity_id=zone_id, action_data={"name": name}
+    ))
+
+
+async def create_zone_in_unit(user_id: uuid.UUID, name: str) -> None:
+    async with db.transaction():
+        await create_zone(user_id, name)
+
+
+async def run(func, user_id: uuid.UUID, args, prefix: str) -> dict:
+    acquires = metrics.histogram("db.pool.acquire_wait")
+    acquired_before = acquires.snapshot()["count"]
+    latencies = []
+    counter = iter(range(args.ops))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await func(user_id, f"{prefix}-{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "ops_per_s": args.ops / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "acquires_per_op": (acquires.snapshot()["count"] - acquired_before) / args.ops,
+    }
+
+
+async def main(args) -> int:
+    config = settings.db.model_copy(update={"pool_size": args.pool_size, "max_overflow": 0, "echo": False})
+    await db.connect(args.dsn, config)
+    try:
+        user_id = await db.pool.fetchval("SELECT user_id FROM public.user ORDER BY created_at LIMIT 1;")
+        prefix = f"bench-uow-{uuid.uuid4().hex[:8]}"
+        cases = [("separate connections", create_zone), ("unit of work", create_zone_in_unit)]
+        print(f"{args.ops} ops, concurrency {args.concurrency}, pool {args.pool_size}")
+        print(f"  {'mode':<22} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'acquires/op':>12}")
+        for name, func in cases:
+            result = await run(func, user_id, args, f"{prefix}-{len(name)}")
+            print(
+                f"  {name:<22} {result['ops_per_s']:>8.0f} {result['p50']:>8.2f} "
+                f"{result['p95']:>8.2f} {result['acquires_per_op']:>12.1f}"
+            )
+        await db.pool.execute("DELETE FROM public.audit_log WHERE action = $1;", BENCH_ACTION)
+        await db.pool.execute("DELETE FROM public.zone WHERE name LIKE $1;", f"{prefix}-%")
+    finally:
+        await db.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=settings.db.db_dsn)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    sys.exit(asyncio.run(main(parser.parse_args())))
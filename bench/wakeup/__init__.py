@@ -0,0 +1 @@
+"""Нагрузочный тест /device/wakeup с локальными заглушками CV и контроллеров дверей."""
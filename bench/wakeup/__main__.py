@@ -0,0 +1,345 @@
+"""
+Нагрузочный тест /api/v1/device/wakeup против локального Postgres.
+
+Драйвер:
+  1. создает в БД зону, devices устройств (127.0.0.1:<device-base-port + i>),
+     пользователей и права на зону для доли granted-ratio из них;
+  2. поднимает заглушки CV и контроллеров дверей (bench.wakeup.stubs) и бэкенд
+     (uvicorn main:app) отдельными процессами;
+  3. шлет /wakeup/nginx с X-Forwarded-For/X-Forwarded-Port случайного устройства
+     с постоянной частотой rate (открытая модель нагрузки: задержка считается от
+     запланированного момента отправки, поэтому очередь перед бэкендом не прячется);
+  4. раз в 100 мс снимает pg_stat_activity, в конце - /api/v1/metrics/db_pool (ожидание acquire);
+  5. печатает пропускную способность, p50/p95/p99, разбивку по этапам из
+     /api/v1/metrics/latency и пиковое число соединений; созданные данные удаляет.
+
+Пример:
+    python -m bench.wakeup --rate 200 --duration 30 --devices 300 --cv-latency-ms 40
+    python -m bench.wakeup --rate 200 --json-out baseline.json
+    python -m bench.wakeup --rate 200 --baseline baseline.json --tolerance 0.2  # код 1 при регрессии
+    python -m bench.wakeup --login-concurrency 20 --backend-env HASHER__EXECUTOR=inline  # под потоком логинов
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+import asyncpg
+import httpx
+
+from app.config import settings
+from bench.wakeup.stubs import LatencyProfile, StubConfig
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return round(sorted_values[idx], 3)
+
+
+async def seed(conn, args, tag: str) -> dict:
+    zone_id = await conn.fetchval("INSERT INTO public.zone (name) VALUES ($1) RETURNING zone_id;", f"bench-{tag}")
+    device_ids = [
+        row['device_id'] for row in await conn.fetch(
+            """
+            INSERT INTO public.device (name, ip, port, zone_id)
+            SELECT 'bench-' || $1 || '-' || i, '127.0.0.1', $2 + i, $3
+            FROM generate_series(0, $4 - 1) AS i
+            RETURNING device_id;
+            """,
+            tag, args.device_base_port, zone_id, args.devices
+        )
+    ]
+    user_ids = [
+        row['user_id'] for row in await conn.fetch(
+            """
+            INSERT INTO public.user (login, password, access_level)
+            SELECT 'bench-' || $1 || '-' || i, 'x', 1
+            FROM generate_series(0, $2 - 1) AS i
+            RETURNING user_id;
+            """,
+            tag, args.users
+        )
+    ]
+    granted = user_ids[:int(len(user_ids) * args.granted_ratio)]
+    await conn.execute(
+        """
+        INSERT INTO public.permission (user_id, target_type, target_id, assigned_by)
+        SELECT unnest($1::uuid[]), 'ZONE', $2, $3;
+        """,
+        granted, zone_id, user_ids[0]
+    )
+    return {"zone_id": zone_id, "device_ids": device_ids, "user_ids": user_ids}
+
+
+async def cleanup(conn, seeded: dict) -> None:
+    await conn.execute("DELETE FROM public.access_log WHERE device_id = ANY($1::uuid[]);", seeded["device_ids"])
+    await conn.execute("DELETE FROM public.permission WHERE user_id = ANY($1::uuid[]);", seeded["user_ids"])
+    await conn.execute("DELETE FROM public.zone WHERE zone_id = $1;", seeded["zone_id"])  # device - каскадом
+    await conn.execute("DELETE FROM public.user WHERE user_id = ANY($1::uuid[]);", seeded["user_ids"])
+
+
+async def wait_ready(url: str, processes: List[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.RequestError:
+                if any(process.poll() is not None for process in processes):
+                    raise RuntimeError(f"Subprocess exited before {url} became ready")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+                await asyncio.sleep(0.2)
+
+
+async def sample_pool(conn, stop: asyncio.Event, samples: list) -> None:
+    """Соединения к БД (кроме собственного) по состояниям: active / idle / idle in transaction."""
+    while not stop.is_set():
+        rows = await conn.fetch(
+            """
+            SELECT coalesce(state, 'unknown') AS state, count(*) AS n
+            FROM pg_stat_activity
+            WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+            GROUP BY 1;
+            """
+        )
+        samples.append({row['state']: row['n'] for row in rows})
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def drive(client: httpx.AsyncClient, url: str, args, rate: float, duration: float, record: bool):
+    """Открытая модель: запрос i отправляется в момент start + i / rate независимо от ответов."""
+    rnd = random.Random(args.seed)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    events: Counter = Counter()
+    total = int(rate * duration)
+    start = time.perf_counter()
+
+    async def one(scheduled: float) -> None:
+        port = args.device_base_port + rnd.randrange(args.devices)
+        try:
+            response = await client.post(
+                url, headers={"X-Forwarded-For": "127.0.0.1", "X-Forwarded-Port": str(port)}
+            )
+            key = response.status_code
+            if response.status_code == 200:
+                events[response.json()["final_event_type"]] += 1
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        if record:
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            statuses[key] += 1
+
+    tasks = []
+    for i in range(total):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    return latencies, statuses, events, elapsed
+
+
+async def login_storm(client: httpx.AsyncClient, stop: asyncio.Event, concurrency: int, counts: Counter) -> None:
+    """concurrency параллельных циклов POST /auth/login (bcrypt на каждый запрос)."""
+    credentials = {"login": settings.root.login, "password": settings.root.password}
+
+    async def loop() -> None:
+        while not stop.is_set():
+            try:
+                response = await client.post("/api/v1/auth/login", json=credentials)
+                counts[response.status_code] += 1
+            except httpx.HTTPError as e:
+                counts[type(e).__name__] += 1
+
+    await asyncio.gather(*[loop() for _ in range(concurrency)])
+
+
+async def run(args) -> int:
+    tag = uuid.uuid4().hex[:8]
+    conn = await asyncpg.connect(settings.db.db_dsn)
+    seeded = await seed(conn, args, tag)
+    processes: List[subprocess.Popen] = []
+    try:
+        stub_config = StubConfig(
+            cv_port=args.cv_port,
+            device_ports=[args.device_base_port + i for i in range(args.devices)],
+            users=[str(user_id) for user_id in seeded["user_ids"]],
+            unknown_rate=args.unknown_rate,
+            cv=LatencyProfile(
+                latency_ms=args.cv_latency_ms, sigma=args.cv_sigma, slow_rate=args.cv_slow_rate,
+                slow_ms=args.cv_slow_ms, error_rate=args.cv_error_rate
+            ),
+            door=LatencyProfile(
+                latency_ms=args.door_latency_ms, sigma=args.door_sigma, error_rate=args.door_error_rate
+            ),
+            seed=args.seed,
+        )
+        config_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        with config_file:
+            config_file.write(stub_config.model_dump_json())
+        processes.append(subprocess.Popen([sys.executable, "-m", "bench.wakeup.stubs", "--config", config_file.name]))
+
+        backend_url = args.backend_url
+        if backend_url is None:
+            backend_url = f"http://127.0.0.1:{args.backend_port}"
+            env = dict(os.environ, BACKEND_CONFIG__CV__URL=f"http://127.0.0.1:{args.cv_port}")
+            for item in args.backend_env:
+                key, _, value = item.partition("=")
+                env[f"BACKEND_CONFIG__{key}"] = value
+            backend_log = open(args.backend_log, "w")
+            print(f"backend log: {args.backend_log}")
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                 "--port", str(args.backend_port), "--workers", str(args.workers), "--log-level", "warning"],
+                env=env, stdout=backend_log, stderr=subprocess.STDOUT
+            ))
+        await wait_ready(f"http://127.0.0.1:{args.cv_port}/docs", processes)
+        await wait_ready(f"{backend_url}/docs", processes)
+
+        limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+        async with httpx.AsyncClient(base_url=backend_url, limits=limits, timeout=args.timeout) as client:
+            token = (await client.post(
+                "/api/v1/auth/login", json={"login": settings.root.login, "password": settings.root.password}
+            )).json().get("access_token")
+            auth = {"Authorization": f"Bearer {token}"}
+
+            wakeup_url = "/api/v1/device/wakeup/nginx"
+            if args.warmup:
+                await drive(client, wakeup_url, args, args.rate, args.warmup, record=False)
+            await client.post("/api/v1/metrics/latency/reset", headers=auth, params={"prefix": "wakeup."})
+
+            stop = asyncio.Event()
+            samples: list = []
+            logins: Counter = Counter()
+            sampler = asyncio.create_task(sample_pool(conn, stop, samples))
+            storm = asyncio.create_task(login_storm(client, stop, args.login_concurrency, logins))
+            latencies, statuses, events, elapsed = await drive(client, wakeup_url, args, args.rate, args.duration, True)
+            stop.set()
+            await sampler
+            await storm
+
+            stages = (await client.get("/api/v1/metrics/latency", headers=auth, params={"prefix": "wakeup."})).json()
+            pool = (await client.get("/api/v1/metrics/db_pool", headers=auth)).json()
+
+        latencies.sort()
+        ok = statuses.get(200, 0)
+        result = {
+            "target_rate": args.rate,
+            "requests": len(latencies),
+            "ok": ok,
+            "statuses": {str(k): v for k, v in statuses.items()},
+            "events": dict(events),
+            "throughput_rps": round(ok / elapsed, 1),
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": round(latencies[-1], 3) if latencies else None,
+            },
+            "db_connections": {
+                "peak_total": max((sum(s.values()) for s in samples), default=0),
+                "peak_active": max((s.get("active", 0) for s in samples), default=0),
+                "peak_idle_in_transaction": max((s.get("idle in transaction", 0) for s in samples), default=0),
+                "pool_max_size": pool.get("max_size"),
+                "acquire_wait": pool.get("acquire_wait"),
+            },
+            "stages": stages if isinstance(stages, dict) else {},
+            "logins": {str(k): v for k, v in logins.items()},
+            "logins_rps": round(sum(logins.values()) / elapsed, 1),
+        }
+        print_report(result)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(result, f, indent=2)
+        if args.baseline:
+            return compare_with_baseline(result, args.baseline, args.tolerance)
+        return 0
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+        await cleanup(conn, seeded)
+        await conn.close()
+
+
+def print_report(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"requests: {result['requests']}  ok: {result['ok']}  statuses: {result['statuses']}")
+    print(f"events: {result['events']}")
+    print(f"throughput: {result['throughput_rps']} rps (target {result['target_rate']})")
+    print(f"latency ms: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    print(f"db connections: {result['db_connections']}")
+    if result["logins"]:
+        print(f"logins: {result['logins']} ({result['logins_rps']} rps)")
+    for name, stage in result["stages"].items():
+        print(f"  {name:<28} n={stage['count']:<7} p50={stage['p50_ms']} p95={stage['p95_ms']} p99={stage['p99_ms']}")
+
+
+def compare_with_baseline(result: dict, baseline_path: str, tolerance: float) -> int:
+    """Код 1, если p95/p99 выросли или пропускная способность упала больше чем на tolerance."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for key in ("p95", "p99"):
+        before, after = baseline["latency_ms"][key], result["latency_ms"][key]
+        if before and after and after > before * (1 + tolerance):
+            regressions.append(f"{key}: {before} -> {after} ms")
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput: {baseline['throughput_rps']} -> {result['throughput_rps']} rps")
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=100.0, help="запросов в секунду")
+    parser.add_argument("--duration", type=float, default=20.0, help="секунд замера")
+    parser.add_argument("--warmup", type=float, default=3.0, help="секунд прогрева (не учитываются)")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--granted-ratio", type=float, default=0.7, help="доля пользователей с правом на зону")
+    parser.add_argument("--unknown-rate", type=float, default=0.1, help="доля событий без распознанного лица")
+    parser.add_argument("--cv-latency-ms", type=float, default=30.0)
+    parser.add_argument("--cv-sigma", type=float, default=0.3)
+    parser.add_argument("--cv-slow-rate", type=float, default=0.0)
+    parser.add_argument("--cv-slow-ms", type=float, default=1000.0)
+    parser.add_argument("--cv-error-rate", type=float, default=0.0)
+    parser.add_argument("--door-latency-ms", type=float, default=5.0)
+    parser.add_argument("--door-sigma", type=float, default=0.3)
+    parser.add_argument("--door-error-rate", type=float, default=0.0)
+    parser.add_argument("--cv-port", type=int, default=18080)
+    parser.add_argument("--device-base-port", type=int, default=19000)
+    parser.add_argument("--backend-port", type=int, default=18000)
+    parser.add_argument("--backend-url", default=None, help="уже запущенный бэкенд (его CV URL должен указывать на заглушку)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--backend-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="настройка бэкенда без префикса BACKEND_CONFIG__, например HASHER__EXECUTOR=inline")
+    parser.add_argument("--login-concurrency", type=int, default=0, help="параллельных циклов /auth/login во время замера")
+    parser.add_argument("--backend-log", default=os.path.join(tempfile.gettempdir(), "wakeup-bench-backend.log"))
+    parser.add_argument("--max-connections", type=int, default=1000, help="соединений у генератора нагрузки")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json-out", default=None, help="сохранить результат (как baseline)")
+    parser.add_argument("--baseline", default=None, help="сравнить с сохраненным результатом")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,119 @@
+"""
+Локальные заглушки внешних сервисов для нагрузочного теста /device/wakeup.
+
+- CV-сервис: POST /process_event - возвращает случайного пользователя из конфига
+  (или face_not_recognized с вероятностью unknown_rate);
+- контроллеры дверей: GET /open_door и GET /health на каждом порту из device_ports
+  (одно устройство - один порт на 127.0.0.1, как отдельные камеры на объекте).
+
+Задержка каждого ответа - логнормальная с медианой latency_ms и разбросом sigma,
+плюс редкие "медленные" ответы (slow_rate, slow_ms); error_rate - доля ответов 500.
+
+Запускается драйвером (python -m bench.wakeup) отдельным процессом:
+    python -m bench.wakeup.stubs --config stubs.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+
+class LatencyProfile(BaseModel):
+    latency_ms: float = 20.0  # Медиана
+    sigma: float = 0.3  # Разброс логнормального распределения (0 - постоянная задержка)
+    slow_rate: float = 0.0  # Доля "медленных" ответов
+    slow_ms: float = 1000.0
+    error_rate: float = 0.0  # Доля ответов 500
+
+    def delay(self, rnd: random.Random) -> float:
+        if self.slow_rate and rnd.random() < self.slow_rate:
+            return self.slow_ms / 1000
+        if self.sigma:
+            return rnd.lognormvariate(0.0, self.sigma) * self.latency_ms / 1000
+        return self.latency_ms / 1000
+
+    def fails(self, rnd: random.Random) -> bool:
+        return bool(self.error_rate) and rnd.random() < self.error_rate
+
+
+class StubConfig(BaseModel):
+    cv_port: int
+    device_ports: List[int]
+    users: List[str] = Field(default_factory=list)  # user_id, которых "узнает" CV
+    unknown_rate: float = 0.1  # Доля событий без распознанного лица
+    cv: LatencyProfile = Field(default_factory=LatencyProfile)
+    door: LatencyProfile = Field(default_factory=lambda: LatencyProfile(latency_ms=5.0))
+    seed: Optional[int] = None
+
+
+def create_cv_app(config: StubConfig, rnd: random.Random) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/process_event")
+    async def process_event(request: Request):
+        await request.body()
+        await asyncio.sleep(config.cv.delay(rnd))
+        if config.cv.fails(rnd):
+            return JSONResponse({"detail": "stub cv error"}, status_code=500)
+        if not config.users or rnd.random() < config.unknown_rate:
+            return {"event_type": "face_not_recognized"}
+        return {
+            "event_type": "face_recognized",
+            "user_id": rnd.choice(config.users),
+            "confidence": round(rnd.uniform(0.8, 1.0), 3),
+        }
+
+    return app
+
+
+def create_device_app(config: StubConfig, rnd: random.Random) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/open_door")
+    async def open_door():
+        await asyncio.sleep(config.door.delay(rnd))
+        if config.door.fails(rnd):
+            return JSONResponse({"detail": "stub door error"}, status_code=500)
+        return {"status": "opened"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def bind(port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+async def serve(config: StubConfig) -> None:
+    rnd = random.Random(config.seed)
+    cv_server = uvicorn.Server(uvicorn.Config(create_cv_app(config, rnd), log_level="warning"))
+    device_server = uvicorn.Server(uvicorn.Config(create_device_app(config, rnd), log_level="warning"))
+    # Все "устройства" обслуживает одно приложение, слушающее сразу на всех портах
+    device_sockets = [bind(port) for port in config.device_ports]
+    await asyncio.gather(
+        cv_server.serve(sockets=[bind(config.cv_port)]),
+        device_server.serve(sockets=device_sockets),
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", required=True, help="JSON с полями StubConfig")
+    args = parser.parse_args()
+    with open(args.config) as f:
+        asyncio.run(serve(StubConfig.model_validate(json.load(f))))
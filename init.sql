@@ -108,7 +108,7 @@ CREATE TABLE IF NOT EXISTS public.access_log
     CONSTRAINT fk_biometry FOREIGN KEY (biometry_id) 
         REFERENCES public.biometry(biometry_id)
 );
-ALTER TABLE public.access_log ADD COLUMN access_granted BOOLEAN DEFAULT FALSE;
+ALTER TABLE public.access_log ADD COLUMN IF NOT EXISTS access_granted BOOLEAN DEFAULT FALSE;
 
 
 -- Системный журнал
@@ -127,7 +127,7 @@ CREATE TABLE IF NOT EXISTS public.audit_log
 );
 
 -- Индексы (оптимизированы)
-CREATE INDEX idx_biometry_user ON public.biometry(user_id);
-CREATE INDEX idx_device_zone ON public.device(zone_id);
-CREATE INDEX idx_permission_target ON public.permission(target_type, target_id);
-CREATE INDEX idx_access_log_device_time ON public.access_log(device_id, created_at);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_biometry_user ON public.biometry(user_id);
+CREATE INDEX IF NOT EXISTS idx_device_zone ON public.device(zone_id);
+CREATE INDEX IF NOT EXISTS idx_permission_target ON public.permission(target_type, target_id);
+CREATE INDEX IF NOT EXISTS idx_access_log_device_time ON public.access_log(device_id, created_at);
\ No newline at end of file
@@ -1,5 +1,8 @@
+import asyncio
 import logging
+import uuid
 from contextlib import asynccontextmanager
+from typing import Set
 
 import uvicorn
 from fastapi import FastAPI
@@ -19,11 +22,60 @@ from app.routes import (
     biometry as biometry_router,
     permission as permission_router,  # Новый
     access_log as access_log_router,  # Новый
-    audit_log as audit_log_router    # Новый
+    audit_log as audit_log_router,    # Новый
+    metrics as metrics_router
 )
 from app.services.user import UserService  # Для root_create
 from app.repositories.user import UserRepo  # Для root_create
-from app.repositories.audit_log import AuditLogRepo  # Для root_create
+from app.repositories.audit_log import AuditLogRepo, audit_log_writer  # AuditLogRepo - для root_create
+from app.repositories.device import DeviceRepo
+from app.repositories.permission import PermissionRepo
+from app.repositories.access_log import access_log_partitions, access_log_writer
+from app.pkg.device_registry import device_registry
+from app.pkg.permission_index import permission_index
+from app.pkg.http_clients import http_clients
+from app.pkg.hasher import start_hash_executor, shutdown_hash_executor
+from app.pkg.migrator import run_migrations
+from app.pkg.pg_listener import ChangeListener
+from app.services.device_monitor import DeviceHealthMonitor
+
+logger = logging.getLogger(__name__)
+
+
+async def reload_permission_index():
+    index_version = permission_index.version
+    permission_index.load(await PermissionRepo.select_not_expired(), version=index_version)
+
+
+async def apply_permission_changes(permission_ids: Set[str]):
+    """Уведомления permission_changed: перечитать права из БД; права, которых там нет, убрать из индекса."""
+    ids = {uuid.UUID(permission_id) for permission_id in permission_ids}
+    permissions = await PermissionRepo.select_by_ids(list(ids))
+    for permission in permissions:
+        permission_index.put(permission)
+    for permission_id in ids - {permission.permission_id for permission in permissions}:
+        permission_index.remove(permission_id)
+
+
+# Отзыв права в одном воркере сразу доходит до индексов остальных (migrations/0007_permission_notify.sql)
+permission_listener = ChangeListener(
+    "permission_changed",
+    apply=apply_permission_changes,
+    resync=reload_permission_index,
+    reconnect_delay=settings.in_memory.listen_reconnect_delay,
+)
+
+
+async def resync_in_memory_state(interval: float):
+    """Периодически сверяет реестр устройств и индекс прав с БД (изменения других воркеров)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            registry_version = device_registry.version
+            device_registry.load(await DeviceRepo.select_devices(use_primary=True), version=registry_version)
+            await reload_permission_index()
+        except Exception:
+            logger.exception("In-memory state resync failed")
 
 
 def create_lifespan(user_service: UserService):
@@ -31,12 +83,43 @@ def create_lifespan(user_service: UserService):
     async def lifespan(app: FastAPI):
         # Подключение к БД
         await db.connect(settings.db.db_dsn)
+        if settings.migrations.run_on_startup:
+            await run_migrations(db.pool)
+        await access_log_partitions.run_once()  # Секции на текущий период должны быть до первой записи
+        access_log_partitions.start()
+        access_log_writer.start()
+        if settings.audit_log.durability == "async":
+            audit_log_writer.start()
+        http_clients.start()
+        await start_hash_executor()
 
         # Создание root-пользователя
         await user_service.root_create()
 
+        # Реестр устройств и индекс прав для /device/wakeup; LISTEN - до загрузки индекса
+        if settings.in_memory.listen_permissions:
+            await permission_listener.start(settings.db.db_dsn)
+        device_registry.load(await DeviceRepo.select_devices(use_primary=True))
+        permission_index.load(await PermissionRepo.select_not_expired())
+        resync_task = asyncio.create_task(resync_in_memory_state(settings.in_memory.resync_interval))
+
+        # Фоновый опрос /health устройств
+        device_monitor = DeviceHealthMonitor(DeviceRepo(), http_clients.device)
+        device_monitor.start()
+
         yield
 
+        resync_task.cancel()
+        await permission_listener.stop()
+        await device_monitor.stop()
+        await access_log_partitions.stop()
+
+        # Дописываем накопленные события журналов доступа и аудита до закрытия пула
+        await access_log_writer.close()
+        await audit_log_writer.close()
+        await http_clients.close()
+        shutdown_hash_executor()
+
         # Отключение от БД
         await db.disconnect()
 
@@ -77,6 +160,7 @@ app.include_router(permission_router.router)   # Новый
 app.include_router(access_log_router.router)  # Новый
 app.include_router(audit_log_router.router)
 app.include_router(openvpn_roter.router)
+app.include_router(metrics_router.router)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,25 @@
+-- migrate: no-transaction
+-- Индексы под горячие фильтры. CONCURRENTLY - без блокировки записи в таблицы,
+-- поэтому файл выполняется вне транзакции, по одному выражению.
+
+-- PermissionRepo.check_active_permission: user_id + target_type + target_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_permission_user_target
+    ON public.permission(user_id, target_type, target_id);
+
+-- DeviceRepo.select_device_by_ip_port
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_device_ip_port
+    ON public.device(ip, port);
+
+-- AccessLogRepo.select_logs: фильтр по user_id и/или периоду, ORDER BY created_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_access_log_user_time
+    ON public.access_log(user_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_access_log_time
+    ON public.access_log(created_at);
+
+-- AuditLogRepo.select_logs: период, пользователь, сущность
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_log_time
+    ON public.audit_log(created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_log_user_time
+    ON public.audit_log(user_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_log_entity
+    ON public.audit_log(entity_type, entity_id);
@@ -0,0 +1,51 @@
+-- Секционирование public.access_log по created_at (RANGE).
+-- Данные не копируются: старая таблица подключается секцией access_log_legacy
+-- с границей до конца текущего месяца (или последней записи, если она позже).
+-- Следующие секции создает и старые удаляет PartitionManager (app/pkg/partitions.py).
+DO $$
+DECLARE
+    boundary TIMESTAMP;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'public.access_log'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    SELECT date_trunc('month', GREATEST(now()::timestamp, COALESCE(max(created_at), now()::timestamp))) + INTERVAL '1 month'
+    INTO boundary
+    FROM public.access_log;
+
+    ALTER TABLE public.access_log RENAME TO access_log_legacy;
+    -- Первичный ключ секции задает родительская таблица (access_log_id, created_at)
+    ALTER TABLE public.access_log_legacy DROP CONSTRAINT access_log_pkey;
+    ALTER INDEX IF EXISTS public.idx_access_log_device_time RENAME TO idx_access_log_legacy_device_time;
+    ALTER INDEX IF EXISTS public.idx_access_log_user_time RENAME TO idx_access_log_legacy_user_time;
+    ALTER INDEX IF EXISTS public.idx_access_log_time RENAME TO idx_access_log_legacy_time;
+
+    CREATE TABLE public.access_log
+    (
+        LIKE public.access_log_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+        -- Ключ секционирования обязан входить в первичный ключ
+        CONSTRAINT access_log_pkey PRIMARY KEY (access_log_id, created_at),
+        CONSTRAINT fk_user FOREIGN KEY (user_id)
+            REFERENCES public.user(user_id) ON DELETE SET NULL,
+        CONSTRAINT fk_device FOREIGN KEY (device_id)
+            REFERENCES public.device(device_id),
+        CONSTRAINT fk_biometry FOREIGN KEY (biometry_id)
+            REFERENCES public.biometry(biometry_id)
+    ) PARTITION BY RANGE (created_at);
+
+    -- Индексы секционированной таблицы; совпадающие индексы старой таблицы подключаются без перестроения
+    CREATE INDEX idx_access_log_device_time ON public.access_log(device_id, created_at);
+    CREATE INDEX idx_access_log_user_time ON public.access_log(user_id, created_at);
+    CREATE INDEX idx_access_log_time ON public.access_log(created_at);
+
+    EXECUTE format(
+        'ALTER TABLE public.access_log ATTACH PARTITION public.access_log_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        boundary
+    );
+    EXECUTE format(
+        'CREATE TABLE public.%I PARTITION OF public.access_log FOR VALUES FROM (%L) TO (%L)',
+        'access_log_p' || to_char(boundary, 'YYYYMMDD'), boundary, boundary + INTERVAL '1 month'
+    );
+END
+$$;
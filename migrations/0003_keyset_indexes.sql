@@ -0,0 +1,19 @@
+-- migrate: no-transaction
+-- Индексы под keyset-пагинацию списков: ORDER BY created_at, id и условие (created_at, id) > курсор.
+-- Журналам хватает индексов по created_at из 0001/0002.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_created
+    ON public.user(created_at, user_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_zone_created
+    ON public.zone(created_at, zone_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_device_created
+    ON public.device(created_at, device_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_permission_created
+    ON public.permission(created_at, permission_id);
+
+-- PermissionRepo.get_for_user
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_permission_user_created
+    ON public.permission(user_id, created_at, permission_id);
@@ -0,0 +1,20 @@
+-- Почасовые агрегаты журнала доступа для дашбордов (/access-log/stats).
+-- Пополняется в той же транзакции, что и запись пачки событий (AccessLogRepo.create_many),
+-- и переживает удаление старых секций access_log.
+CREATE TABLE IF NOT EXISTS public.access_log_hourly
+(
+    device_id uuid NOT NULL,
+    hour TIMESTAMP NOT NULL,
+    event_type VARCHAR(32) NOT NULL,
+    access_granted BOOLEAN NOT NULL,
+    count BIGINT NOT NULL,
+    CONSTRAINT access_log_hourly_pkey PRIMARY KEY (device_id, hour, event_type, access_granted)
+);
+CREATE INDEX IF NOT EXISTS idx_access_log_hourly_hour ON public.access_log_hourly(hour);
+
+-- Заполнение по уже записанным событиям
+INSERT INTO public.access_log_hourly (device_id, hour, event_type, access_granted, count)
+SELECT device_id, date_trunc('hour', created_at), event_type, COALESCE(access_granted, FALSE), count(*)
+FROM public.access_log
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (device_id, hour, event_type, access_granted) DO UPDATE SET count = EXCLUDED.count;
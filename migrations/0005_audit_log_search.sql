@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- Поиск по журналу аудита (AuditLogRepo._filters) без полного просмотра таблицы.
+-- Триграммный индекс для action ILIKE - в 0008_audit_log_action_trgm.sql (нужен pg_trgm).
+
+-- Структурные фильтры action_data @> '{"login": "..."}' (app.pkg.jsonb_filter)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_log_action_data
+    ON public.audit_log USING gin (action_data jsonb_path_ops);
@@ -0,0 +1,18 @@
+-- Недельные расписания прав. schedule (JSONB) - расписание как его передал клиент,
+-- schedule_bitmap - оно же, скомпилированное при записи (app.pkg.schedule): бит на минуту
+-- недели в поясе schedule_tz. Проверка в запросе - один get_bit, без разбора JSON.
+ALTER TABLE public.permission
+    ADD COLUMN IF NOT EXISTS schedule_bitmap BYTEA,
+    ADD COLUMN IF NOT EXISTS schedule_tz VARCHAR(64);
+
+ALTER TABLE public.permission DROP CONSTRAINT IF EXISTS permission_schedule_bitmap_check;
+ALTER TABLE public.permission ADD CONSTRAINT permission_schedule_bitmap_check
+    CHECK (schedule_bitmap IS NULL OR (octet_length(schedule_bitmap) = 1260 AND schedule_tz IS NOT NULL));
+
+-- Минута недели местного времени: 0 - понедельник 00:00, 10079 - воскресенье 23:59.
+-- Простая IMMUTABLE SQL-функция встраивается планировщиком в запрос.
+CREATE OR REPLACE FUNCTION public.minute_of_week(ts TIMESTAMP) RETURNS INTEGER
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+        SELECT (extract(isodow FROM ts)::int - 1) * 1440 + extract(hour FROM ts)::int * 60 + extract(minute FROM ts)::int
+    $$;
@@ -0,0 +1,21 @@
+-- Уведомление воркеров об изменении прав: NOTIFY permission_changed с permission_id.
+-- Воркеры слушают канал (app.pkg.pg_listener) и обновляют PermissionIndex. Уведомления
+-- доставляются только после COMMIT; каскадное удаление прав вместе с пользователем
+-- тоже вызывает триггер.
+CREATE OR REPLACE FUNCTION public.notify_permission_change() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('permission_changed', OLD.permission_id::text);
+        ELSE
+            PERFORM pg_notify('permission_changed', NEW.permission_id::text);
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+
+DROP TRIGGER IF EXISTS permission_notify ON public.permission;
+CREATE TRIGGER permission_notify
+    AFTER INSERT OR UPDATE OR DELETE ON public.permission
+    FOR EACH ROW EXECUTE FUNCTION public.notify_permission_change();
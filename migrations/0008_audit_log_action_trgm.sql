@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- migrate: requires-extension pg_trgm
+-- action ILIKE '%...%': btree не помогает, триграммный GIN - да (от 3 символов в образце).
+-- pg_trgm - из contrib; на сервере без него миграция пропускается, ILIKE работает без индекса.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_log_action_trgm
+    ON public.audit_log USING gin (action gin_trgm_ops);